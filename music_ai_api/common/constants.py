@@ -1,6 +1,9 @@
+import os
 from concurrent.futures import ThreadPoolExecutor
 from music21 import duration
 
+from common.runtime_config import thread_budget
+
 all_durations = duration.typeFromNumDict
 excluded_durations = {'breve', 'longa', 'maxima', 'duplex-maxima', 'zero'}
 valid_durations = {
@@ -16,10 +19,72 @@ INSTRUMENT_NAMES = {
 }
 
 ROUND_PRECISION = 4
+DURATION_TABLE_CACHE_SIZE = 64
 SEQ_LENGTH = 50
 PITCH_VOCAB_SIZE = 128
 DURATION_VOCAB_SIZE = len(valid_durations)
 
 FILE_NOT_FOUND = "Файл не знайдено"
 
-EXECUTOR = ThreadPoolExecutor(max_workers=5)
\ No newline at end of file
+CATEGORICAL_DATASET_PATH = "common/dataset_categorical.parquet"
+DURATION_VOCABULARY_PATH = "common/duration_vocabulary.json"
+
+# Рушій інференсу LSTM: "compiled" (граф, трасований один раз), "predict" (model.predict)
+# або "tflite" (модель, експортована generation/lstm_export.py, зокрема квантизована).
+LSTM_INFERENCE_ENGINE = os.getenv("LSTM_INFERENCE_ENGINE", "compiled")
+LSTM_TFLITE_MODEL_PATH = os.getenv("LSTM_TFLITE_MODEL_PATH", "models/ckpt_best.model_lstm_attention_categorical.tflite")
+LSTM_TFLITE_NUM_THREADS = int(os.getenv("LSTM_TFLITE_NUM_THREADS", "0")) or None
+
+# Мікробатчинг кроків декодування між одночасними запитами /v2/lstm/generate
+LSTM_BATCHING_ENABLED = os.getenv("LSTM_BATCHING_ENABLED", "1") == "1"
+LSTM_BATCH_MAX_SIZE = int(os.getenv("LSTM_BATCH_MAX_SIZE", "32"))
+LSTM_BATCH_MAX_WAIT_MS = float(os.getenv("LSTM_BATCH_MAX_WAIT_MS", "5"))
+
+# Скільки нот потокова генерація може випередити клієнта, перш ніж призупинитися
+LSTM_STREAM_BUFFER_NOTES = int(os.getenv("LSTM_STREAM_BUFFER_NOTES", "32"))
+
+# Кількість окремих процесів для прямих проходів моделей кожного сімейства.
+# 0 — модель виконується в процесі API. Планувальник батчів LSTM тримає в пулі
+# по одному батчу на процес
+LSTM_POOL_WORKERS = int(os.getenv("LSTM_POOL_WORKERS", "0"))
+FFN_POOL_WORKERS = int(os.getenv("FFN_POOL_WORKERS", "0"))
+
+# Кеш результатів детермінованих запитів (генерація з seed, гармонізація того самого файлу).
+# Дисковий рівень вмикається, якщо задано RESULT_CACHE_DIR
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR") or None
+RESULT_CACHE_DISK_MAX_BYTES = int(os.getenv("RESULT_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Скільки може тривати генерація чи гармонізація, перш ніж її буде скасовано (0 — без обмеження),
+# і як часто перевіряти, чи клієнт ще чекає на відповідь
+GENERATION_DEADLINE_SECONDS = float(os.getenv("GENERATION_DEADLINE_SECONDS", "120"))
+DISCONNECT_POLL_INTERVAL_SECONDS = float(os.getenv("DISCONNECT_POLL_INTERVAL_SECONDS", "0.5"))
+
+# Скільки вікон мелодії гармонізується одним прямим проходом; довші мелодії діляться на кілька батчів
+FFN_MAX_BATCH_WINDOWS = int(os.getenv("FFN_MAX_BATCH_WINDOWS", "256"))
+
+# Рушій інференсу мережі гармонізації: "torchscript" (BatchNorm злито з лінійними шарами,
+# dropout прибрано, див. generation/ffn_generator/ffn_export.py) або "eager" (ForwardNetwork як є);
+# FFN_QUANTIZATION=int8 вмикає динамічну int8-квантизацію лінійних шарів
+FFN_INFERENCE_ENGINE = os.getenv("FFN_INFERENCE_ENGINE", "torchscript")
+FFN_QUANTIZATION = os.getenv("FFN_QUANTIZATION", "none")
+FFN_TORCHSCRIPT_MODEL_PATH = os.getenv("FFN_TORCHSCRIPT_MODEL_PATH") or None
+
+# Максимальний розмір MIDI-файлу для гармонізації
+MIDI_UPLOAD_MAX_BYTES = int(os.getenv("MIDI_UPLOAD_MAX_BYTES", str(2 * 1024 * 1024)))
+
+# Пакетна гармонізація (/ffn/harmonize/batch): максимальна кількість MIDI-файлів у запиті
+# (разом із вмістом zip-архівів) і максимальний розмір одного архіву
+FFN_BATCH_MAX_FILES = int(os.getenv("FFN_BATCH_MAX_FILES", "64"))
+FFN_BATCH_MAX_ARCHIVE_BYTES = int(os.getenv("FFN_BATCH_MAX_ARCHIVE_BYTES", str(32 * 1024 * 1024)))
+
+# Асинхронні завдання (/v2/lstm/jobs, /ffn/jobs): кількість потоків, що одночасно ведуть завдання
+# (обчислення завдань виконуються в EXECUTOR і планувальнику батчів, тож у бюджет потоків вони не додаються),
+# максимальна кількість завдань в очікуванні та час зберігання завершених завдань
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "32"))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+
+# Розмір виконавця задає бюджет потоків (EXECUTOR_WORKERS, див. common/runtime_config.py)
+EXECUTOR = ThreadPoolExecutor(max_workers=thread_budget.executor_workers)
\ No newline at end of file
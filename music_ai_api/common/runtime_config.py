@@ -0,0 +1,181 @@
+"""
+Єдиний бюджет потоків CPU для процесу API та процесів моделей.
+
+TensorFlow, PyTorch, BLAS і EXECUTOR за замовчуванням розраховують кожен на всі ядра,
+тож під одночасним навантаженням LSTM і FFN потоків стає в рази більше, ніж ядер.
+Модуль не імпортує numpy і фреймворки: BLAS читає змінні середовища під час
+завантаження бібліотеки, а TensorFlow приймає налаштування потоків лише до першої
+операції, тому configure_process() викликається в main.py до решти імпортів.
+"""
+import os
+import sys
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+BLAS_THREAD_VARIABLES = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+)
+
+
+def parse_cpu_list(value: str) -> list[int]:
+    """"0-3,6" → [0, 1, 2, 3, 6]."""
+    cpus = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(cpus))
+
+
+def available_cpus() -> list[int]:
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name) or default)
+
+
+class ThreadBudget:
+    """Кількість потоків кожного рівня паралелізму, виведена з одного бюджету ядер."""
+
+    def __init__(
+        self,
+        cpus: list[int],
+        cpu_budget: int,
+        executor_workers: int,
+        tf_intra_op_threads: int,
+        tf_inter_op_threads: int,
+        torch_threads: int,
+        torch_interop_threads: int,
+        blas_threads: int,
+        pool_worker_threads: int,
+        pin_pool_workers: bool,
+        pin_process: bool
+    ):
+        self.cpus = cpus
+        self.cpu_budget = cpu_budget
+        self.executor_workers = executor_workers
+        self.tf_intra_op_threads = tf_intra_op_threads
+        self.tf_inter_op_threads = tf_inter_op_threads
+        self.torch_threads = torch_threads
+        self.torch_interop_threads = torch_interop_threads
+        self.blas_threads = blas_threads
+        self.pool_worker_threads = pool_worker_threads
+        self.pin_pool_workers = pin_pool_workers
+        self.pin_process = pin_process
+
+    def pool_worker_cpus(self, slot: int) -> list[int] | None:
+        """
+        Ядра процесу моделі з порядковим номером slot: послідовні групи по
+        pool_worker_threads ядер, що по колу розподіляються між процесами.
+        None — процес не закріплюється.
+        """
+        if not self.pin_pool_workers:
+            return None
+        start = slot * self.pool_worker_threads
+        return [self.cpus[(start + offset) % len(self.cpus)] for offset in range(self.pool_worker_threads)]
+
+    def __repr__(self) -> str:
+        return (
+            f"ThreadBudget(cpus={len(self.cpus)}, budget={self.cpu_budget}, executor={self.executor_workers}, "
+            f"tf={self.tf_intra_op_threads}/{self.tf_inter_op_threads}, "
+            f"torch={self.torch_threads}/{self.torch_interop_threads}, blas={self.blas_threads}, "
+            f"pool_worker={self.pool_worker_threads}, pin_pool_workers={self.pin_pool_workers})"
+        )
+
+
+def load_thread_budget() -> ThreadBudget:
+    """
+    Читає бюджет зі змінних середовища. Без явних значень:
+    - CPU_THREAD_BUDGET — кількість доступних ядер (з урахуванням CPU_AFFINITY);
+    - пул між-операційних потоків TensorFlow спільний для процесу й отримує половину бюджету;
+    - PyTorch створює окремий пул на кожен потік, що викликає модель, тому друга половина
+      ділиться між EXECUTOR_WORKERS потоками виконавця;
+    - BLAS — 1 потік: операції numpy в обробці запитів малі, а паралельність дають запити;
+    - процес моделі отримує бюджет / EXECUTOR_WORKERS потоків, бо одночасно модель
+      викликають не більше EXECUTOR_WORKERS потоків.
+    """
+    affinity = os.getenv('CPU_AFFINITY')
+    cpus = parse_cpu_list(affinity) if affinity else available_cpus()
+    cpu_budget = _env_int('CPU_THREAD_BUDGET', len(cpus))
+    executor_workers = _env_int('EXECUTOR_WORKERS', 5)
+    return ThreadBudget(
+        cpus=cpus,
+        cpu_budget=cpu_budget,
+        executor_workers=executor_workers,
+        tf_intra_op_threads=_env_int('TF_INTRA_OP_THREADS', max(1, cpu_budget // 2)),
+        tf_inter_op_threads=_env_int('TF_INTER_OP_THREADS', min(2, cpu_budget)),
+        torch_threads=_env_int('TORCH_NUM_THREADS', max(1, cpu_budget // (2 * executor_workers))),
+        torch_interop_threads=_env_int('TORCH_INTEROP_THREADS', 1),
+        blas_threads=_env_int('BLAS_NUM_THREADS', 1),
+        pool_worker_threads=_env_int('MODEL_POOL_WORKER_THREADS', max(1, cpu_budget // executor_workers)),
+        pin_pool_workers=os.getenv('MODEL_POOL_PIN_WORKERS', '0') == '1',
+        pin_process=bool(affinity)
+    )
+
+
+thread_budget = load_thread_budget()
+
+
+def set_cpu_affinity(cpus: list[int] | None) -> None:
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+
+
+def limit_blas_threads(threads: int) -> None:
+    """Діє лише до завантаження numpy/BLAS; явно задані змінні середовища не змінюються."""
+    for variable in BLAS_THREAD_VARIABLES:
+        os.environ.setdefault(variable, str(threads))
+
+
+def configure_torch(threads: int, interop_threads: int) -> None:
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # Пул між-операційних потоків уже запущено; його розмір змінити не можна
+        logger.warning("Кількість між-операційних потоків PyTorch уже задано")
+
+
+def configure_tensorflow(intra_op_threads: int, inter_op_threads: int) -> None:
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError:
+        logger.warning("TensorFlow уже ініціалізовано, налаштування потоків не застосовано")
+
+
+def configure_process(budget: ThreadBudget = thread_budget) -> None:
+    """Налаштовує процес API: спершу ядра й BLAS, потім обидва фреймворки."""
+    if budget.pin_process:
+        set_cpu_affinity(budget.cpus)
+    limit_blas_threads(budget.blas_threads)
+    configure_torch(budget.torch_threads, budget.torch_interop_threads)
+    configure_tensorflow(budget.tf_intra_op_threads, budget.tf_inter_op_threads)
+    logger.info(f"Бюджет потоків CPU: {budget}")
+
+
+def configure_pool_worker(threads: int, cpus: list[int] | None) -> None:
+    """
+    Налаштовує процес моделі перед завантаженням моделі. Фреймворк налаштовується, лише
+    якщо його вже імпортовано (модуль завантажувача), щоб процес FFN не тягнув TensorFlow.
+    """
+    set_cpu_affinity(cpus)
+    if 'torch' in sys.modules:
+        configure_torch(threads, 1)
+    if 'tensorflow' in sys.modules:
+        configure_tensorflow(threads, 1)
@@ -0,0 +1,62 @@
+import pytest
+
+from common.runtime_config import load_thread_budget, parse_cpu_list
+
+BUDGET_VARIABLES = (
+    'CPU_AFFINITY', 'CPU_THREAD_BUDGET', 'EXECUTOR_WORKERS', 'TF_INTRA_OP_THREADS', 'TF_INTER_OP_THREADS',
+    'TORCH_NUM_THREADS', 'TORCH_INTEROP_THREADS', 'BLAS_NUM_THREADS', 'MODEL_POOL_WORKER_THREADS',
+    'MODEL_POOL_PIN_WORKERS',
+)
+
+
+@pytest.fixture
+def env(monkeypatch):
+    for variable in BUDGET_VARIABLES:
+        monkeypatch.delenv(variable, raising=False)
+    return monkeypatch
+
+
+def test_cpu_list_ranges():
+    assert parse_cpu_list('0-3,6, 8-9') == [0, 1, 2, 3, 6, 8, 9]
+    assert parse_cpu_list('2,2,1') == [1, 2]
+
+
+def test_budget_is_split_between_frameworks_and_executor(env):
+    env.setenv('CPU_AFFINITY', '0-15')
+    env.setenv('EXECUTOR_WORKERS', '4')
+
+    budget = load_thread_budget()
+
+    assert budget.cpu_budget == 16
+    assert budget.tf_intra_op_threads == 8
+    assert budget.torch_threads == 2
+    assert budget.blas_threads == 1
+    assert budget.pool_worker_threads == 4
+    assert budget.pin_process
+
+
+def test_explicit_settings_override_derived_ones(env):
+    env.setenv('CPU_THREAD_BUDGET', '2')
+    env.setenv('TORCH_NUM_THREADS', '3')
+
+    budget = load_thread_budget()
+
+    assert budget.torch_threads == 3
+    assert budget.tf_intra_op_threads == 1
+    assert budget.executor_workers == 5
+    assert budget.pool_worker_threads == 1
+    assert not budget.pin_process
+
+
+def test_pinned_pool_workers_get_consecutive_cpu_groups(env):
+    env.setenv('CPU_AFFINITY', '0-5')
+    env.setenv('MODEL_POOL_WORKER_THREADS', '4')
+    env.setenv('MODEL_POOL_PIN_WORKERS', '1')
+
+    budget = load_thread_budget()
+
+    assert budget.pool_worker_cpus(0) == [0, 1, 2, 3]
+    assert budget.pool_worker_cpus(1) == [4, 5, 0, 1]
+
+    env.setenv('MODEL_POOL_PIN_WORKERS', '0')
+    assert load_thread_budget().pool_worker_cpus(0) is None
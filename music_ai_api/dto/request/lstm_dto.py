@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, field_validator, model_validator
 
 
 class RawNotes(BaseModel):
@@ -11,6 +11,11 @@ class GenerateRequest(BaseModel):
     num_predictions: int
     temperature: float
     tempo: int
+    variations: int = 1
+    temperatures: list[float] | None = None
+    seed: int | None = None
+    top_k: int | None = None
+    top_p: float | None = None
 
     @field_validator('temperature')
     def validate_temperature(cls, v):
@@ -28,4 +33,46 @@ class GenerateRequest(BaseModel):
     def validate_tempo(cls, v):
         if not 0 < v <= 400:
             raise ValueError('Темп має бути додатним і не перевищувати 400')
-        return v
\ No newline at end of file
+        return v
+
+    @field_validator('variations')
+    def validate_variations(cls, v):
+        if not 1 <= v <= 16:
+            raise ValueError('Кількість варіацій має бути в діапазоні [1, 16]')
+        return v
+
+    @field_validator('temperatures')
+    def validate_temperatures(cls, v):
+        if v is not None and not all(0 < t <= 2 for t in v):
+            raise ValueError('Температура має бути в діапазоні (0, 2]')
+        return v
+
+    @field_validator('seed')
+    def validate_seed(cls, v):
+        if v is not None and v < 0:
+            raise ValueError('Зерно генератора має бути невід\'ємним')
+        return v
+
+    @field_validator('top_k')
+    def validate_top_k(cls, v):
+        if v is not None and not 0 < v <= 128:
+            raise ValueError('top_k має бути в діапазоні [1, 128]')
+        return v
+
+    @field_validator('top_p')
+    def validate_top_p(cls, v):
+        if v is not None and not 0 < v <= 1:
+            raise ValueError('top_p має бути в діапазоні (0, 1]')
+        return v
+
+    @model_validator(mode='after')
+    def validate_temperatures_count(self):
+        if self.temperatures is not None and len(self.temperatures) != self.variations:
+            raise ValueError('Кількість температур має дорівнювати кількості варіацій')
+        return self
+
+    def variation_temperatures(self) -> list[float]:
+        """Температура для кожної варіації."""
+        if self.temperatures is not None:
+            return self.temperatures
+        return [self.temperature] * self.variations
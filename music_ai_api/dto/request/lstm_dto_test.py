@@ -0,0 +1,36 @@
+import pytest
+from pydantic import ValidationError
+
+from dto.request.lstm_dto import GenerateRequest
+
+
+def make_request(**fields) -> GenerateRequest:
+    return GenerateRequest(**{'num_predictions': 16, 'temperature': 1.0, 'tempo': 120, **fields})
+
+
+def test_temperatures_must_match_variations():
+    with pytest.raises(ValidationError, match='Кількість температур'):
+        make_request(variations=2, temperatures=[0.5])
+    with pytest.raises(ValidationError, match='Кількість температур'):
+        make_request(temperatures=[0.5, 1.5])
+
+    assert make_request(variations=3, temperatures=[0.5, 1.0, 1.5]).variation_temperatures() == [0.5, 1.0, 1.5]
+
+
+def test_variations_must_be_in_range():
+    for variations in (0, 17):
+        with pytest.raises(ValidationError, match='Кількість варіацій'):
+            make_request(variations=variations)
+
+    assert make_request(variations=16).variations == 16
+
+
+def test_temperatures_must_be_in_range():
+    with pytest.raises(ValidationError, match='Температура'):
+        make_request(variations=2, temperatures=[0.5, 2.5])
+
+
+def test_variation_temperatures_default_to_request_temperature():
+    assert make_request(temperature=0.7).variation_temperatures() == [0.7]
+    assert make_request(temperature=0.7, variations=3).variation_temperatures() == [0.7, 0.7, 0.7]
+    assert make_request(temperature=0.7, temperatures=[1.3]).variation_temperatures() == [1.3]
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class HarmonizedFile(BaseModel):
+    filename: str
+    midi_file: str | None = None
+    error: str | None = None
+
+
+class BatchHarmonizeResponse(BaseModel):
+    message: str
+    files: list[HarmonizedFile]
@@ -3,4 +3,5 @@ from pydantic import BaseModel
 
 class GenerateResponse(BaseModel):
     message: str
-    midi_file: str
\ No newline at end of file
+    midi_file: str
+    midi_files: list[str] | None = None
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class JobProgress(BaseModel):
+    done: int
+    total: int
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    progress: JobProgress | None = None
+    result: dict | None = None
+    error: str | None = None
@@ -0,0 +1,198 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+
+from generation.cancellation import GenerationCancelled
+from generation.generation_session import GenerationSession, advance_sessions
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Як часто потік перевіряє батч, у якому всі сесії чекають на своїх споживачів
+PAUSED_POLL_SECONDS = 0.005
+
+
+class _Entry(NamedTuple):
+    session: GenerationSession
+    future: Future
+    on_note: Optional[Callable[[tuple], None]]
+    ready: Optional[Callable[[], bool]]
+
+
+class BatchScheduler:
+    """
+    Мікробатчинг кроків декодування для одночасних запитів генерації.
+
+    На кожному кроці активні сесії всіх запитів об'єднуються в один батч і проходять
+    через модель одним викликом. Кожна сесія зберігає власні температуру, темп і довжину,
+    тому після завершення вона виходить з батчу, а її місце займає нова. Сесії скасованих
+    запитів виходять з батчу перед наступним кроком.
+
+    Кожен із max_in_flight потоків планувальника веде власний батч, тож до пулу процесів
+    моделі одночасно йде стільки батчів, скільки в ньому процесів. Нові сесії бере
+    перший потік, що звернувся до черги; сесія залишається в його батчі до завершення.
+
+    Сесія, чий споживач не встигає за генерацією (ready повертає False), пропускає
+    кроки, не затримуючи інші сесії батчу.
+    """
+
+    def __init__(self, inference_model, max_batch_size: int, max_wait_ms: float, max_in_flight: int = 1):
+        """
+        Args:
+            inference_model: Об'єкт з методом predict(inputs) для батчу вікон
+            max_batch_size: Максимальна кількість сесій в одному прямому проході
+            max_wait_ms: Скільки чекати на інші запити, перш ніж почати новий батч
+            max_in_flight: Скільки батчів може одночасно виконуватися в моделі
+        """
+        if max_in_flight < 1:
+            raise ValueError("Планувальник потребує хоча б одного потоку")
+        self.inference_model = inference_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        self._pending = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def submit(
+        self,
+        session: GenerationSession,
+        on_note: Optional[Callable[[tuple], None]] = None,
+        ready: Optional[Callable[[], bool]] = None
+    ) -> Future:
+        """
+        Додає сесію до планувальника. Future завершується сесією, коли всі ноти згенеровано.
+        Args:
+            session: Сесія генерації
+            on_note: Викликається в потоці планувальника для кожної ноти сесії; не має блокувати
+            ready: Викликається перед кожним кроком; False — сесія пропускає цей крок
+        """
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Планувальник батчів зупинено")
+            if not self._threads:
+                self._threads = [
+                    threading.Thread(target=self._run, name=f"lstm-batch-scheduler-{index}", daemon=True)
+                    for index in range(self.max_in_flight)
+                ]
+                for thread in self._threads:
+                    thread.start()
+            self._pending.put(_Entry(session, future, on_note, ready))
+        return future
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._stopped = True
+            threads = self._threads
+        # Кожен потік припиняє читати чергу після першого сигналу зупинки
+        for thread in threads:
+            self._pending.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _collect(self, active: list, timeout: float | None) -> bool:
+        """Доповнює активний батч новими сесіями. Повертає False, якщо отримано сигнал зупинки."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while len(active) < self.max_batch_size:
+            try:
+                if deadline is None:
+                    item = self._pending.get_nowait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    item = self._pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return False
+            active.append(item)
+        return True
+
+    def _run(self) -> None:
+        active = []
+        running = True
+        stepped = True
+        while running or active:
+            if not active:
+                item = self._pending.get()
+                if item is None:
+                    break
+                active.append(item)
+                running = self._collect(active, self.max_wait)
+            elif running:
+                # Якщо всі сесії батчу чекали на споживачів, потік не крутиться вхолосту
+                running = self._collect(active, None if stepped else PAUSED_POLL_SECONDS)
+            elif not stepped:
+                time.sleep(PAUSED_POLL_SECONDS)
+            try:
+                active, stepped = self._step(active)
+            except Exception as e:
+                # Потік планувальника запускається один раз, тож помилка завершує лише поточні сесії
+                logger.error(f"Помилка планувальника батчів: {e}")
+                for entry in active:
+                    _settle(entry.future, error=e)
+                active, stepped = [], True
+
+    def _step(self, active: list) -> tuple[list, bool]:
+        """
+        Виконує один батчований крок декодування.
+        Returns:
+            tuple: Сесії, що ще не завершилися, і чи зробила крок хоча б одна сесія
+        """
+        remaining = []
+        for entry in active:
+            if entry.future.done():
+                # Future скасовано з боку очікувача: результат сесії більше нікому не потрібен
+                continue
+            if entry.session.cancelled:
+                _settle(entry.future, error=GenerationCancelled(entry.session.token.reason))
+            else:
+                remaining.append(entry)
+        stepping = [entry for entry in remaining if entry.ready is None or entry.ready()]
+        if not stepping:
+            return remaining, False
+
+        sessions = [entry.session for entry in stepping]
+        finished = set()
+        try:
+            batch = np.stack([session.input_notes for session in sessions])
+            predictions = self.inference_model.predict(batch)
+            notes = advance_sessions(sessions, predictions)
+        except Exception as e:
+            logger.error(f"Помилка батчованого кроку декодування: {e}")
+            for entry in stepping:
+                _settle(entry.future, error=e)
+                finished.add(id(entry))
+            notes = []
+
+        for entry, note in zip(stepping, notes):
+            try:
+                if entry.on_note is not None:
+                    entry.on_note(note)
+            except Exception as e:
+                # Помилка споживача однієї сесії не зупиняє решту батчу
+                _settle(entry.future, error=e)
+                finished.add(id(entry))
+                continue
+            if entry.session.done:
+                _settle(entry.future, entry.session)
+                finished.add(id(entry))
+        return [entry for entry in remaining if id(entry) not in finished], True
+
+def _settle(future: Future, session: GenerationSession | None = None, error: BaseException | None = None) -> None:
+    """Завершує future сесії, якщо його ще не скасував очікувач."""
+    try:
+        if error is None:
+            future.set_result(session)
+        else:
+            future.set_exception(error)
+    except InvalidStateError:
+        # Очікувач скасував future між перевіркою в _step і цим викликом
+        pass
@@ -0,0 +1,138 @@
+import threading
+
+import numpy as np
+import pytest
+
+from common.constants import SEQ_LENGTH, valid_durations
+from generation.batch_scheduler import BatchScheduler
+from generation.cancellation import CANCEL_DISCONNECTED, CancellationToken, GenerationCancelled
+from generation.generation_session import GenerationSession
+from generation.note_window import NoteWindow
+from utils.midi_utils_v2 import get_duration_table
+
+
+class RecordingModel:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, inputs):
+        self.batch_sizes.append(len(inputs))
+        batch = len(inputs)
+        return {
+            'pitch': np.zeros((batch, 128), dtype=np.float32),
+            'step': np.full((batch, 1), 0.25, dtype=np.float32),
+            'duration': np.zeros((batch, len(valid_durations)), dtype=np.float32),
+        }
+
+
+def make_session(num_predictions, temperature=1.0, tempo=120, token=None):
+    duration_table = get_duration_table(tempo, tuple(sorted(valid_durations.values())))
+    return GenerationSession(
+        NoteWindow(SEQ_LENGTH), num_predictions, temperature, tempo, duration_table, 60.0, token=token
+    )
+
+
+def test_sessions_with_different_lengths_share_batches():
+    model = RecordingModel()
+    scheduler = BatchScheduler(model, max_batch_size=2, max_wait_ms=50)
+    sessions = [make_session(3), make_session(5, temperature=0.5), make_session(2, tempo=90)]
+
+    futures = [scheduler.submit(session) for session in sessions]
+    results = [future.result(timeout=10) for future in futures]
+    scheduler.shutdown()
+
+    assert [len(session.generated_notes) for session in results] == [3, 5, 2]
+    assert max(model.batch_sizes) == 2
+    assert sum(model.batch_sizes) == 3 + 5 + 2
+    assert all(session.input_notes.shape == (SEQ_LENGTH, 3) for session in results)
+
+
+def test_cancelled_session_leaves_batch_before_next_step():
+    token = CancellationToken()
+    model = RecordingModel()
+    original_predict = model.predict
+
+    def predict(inputs):
+        if len(model.batch_sizes) == 2:
+            token.cancel(CANCEL_DISCONNECTED)
+        return original_predict(inputs)
+
+    model.predict = predict
+    scheduler = BatchScheduler(model, max_batch_size=2, max_wait_ms=50)
+    cancelled = make_session(100, token=token)
+    kept = make_session(6)
+
+    futures = [scheduler.submit(cancelled), scheduler.submit(kept)]
+    with pytest.raises(GenerationCancelled):
+        futures[0].result(timeout=10)
+    assert futures[1].result(timeout=10).done
+    scheduler.shutdown()
+
+    assert cancelled.count == 3
+    assert model.batch_sizes == [2, 2, 2, 1, 1, 1]
+
+
+def test_batches_run_concurrently_up_to_max_in_flight():
+    model = RecordingModel()
+    original_predict = model.predict
+    # Перший крок кожного батчу чекає на інший: без паралельних батчів бар'єр не відпуститься
+    barrier = threading.Barrier(2, timeout=10)
+    waited = threading.local()
+
+    def predict(inputs):
+        if not getattr(waited, 'done', False):
+            waited.done = True
+            barrier.wait()
+        return original_predict(inputs)
+
+    model.predict = predict
+    scheduler = BatchScheduler(model, max_batch_size=1, max_wait_ms=0, max_in_flight=2)
+
+    futures = [scheduler.submit(make_session(4)), scheduler.submit(make_session(4))]
+    assert all(future.result(timeout=10).done for future in futures)
+    scheduler.shutdown()
+
+    assert model.batch_sizes == [1] * 8
+
+
+def test_scheduler_survives_futures_cancelled_by_waiters():
+    model = RecordingModel()
+    original_predict = model.predict
+    abandoned = []
+
+    def predict(inputs):
+        # Очікувач скасовує future посеред декодування, як це робить asyncio.wrap_future
+        if not model.batch_sizes:
+            abandoned[0].cancel()
+        return original_predict(inputs)
+
+    model.predict = predict
+    scheduler = BatchScheduler(model, max_batch_size=2, max_wait_ms=50)
+    abandoned.append(scheduler.submit(make_session(4)))
+    kept = scheduler.submit(make_session(4))
+
+    assert kept.result(timeout=10).done
+    assert scheduler.submit(make_session(2)).result(timeout=10).done
+    scheduler.shutdown()
+
+    assert abandoned[0].cancelled()
+    assert model.batch_sizes[:2] == [2, 1]
+
+
+def test_paused_session_does_not_hold_back_the_batch():
+    model = RecordingModel()
+    scheduler = BatchScheduler(model, max_batch_size=2, max_wait_ms=50)
+    credits = threading.Semaphore(2)
+    received = []
+
+    paused = scheduler.submit(make_session(4), on_note=received.append, ready=lambda: credits.acquire(blocking=False))
+    kept = scheduler.submit(make_session(4))
+
+    assert kept.result(timeout=10).done
+    assert len(received) == 2 and not paused.done()
+    credits.release(2)
+    assert paused.result(timeout=10).done
+    scheduler.shutdown()
+
+    assert len(received) == 4
+    assert model.batch_sizes[:2] == [2, 2]
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+
+CANCEL_DISCONNECTED = 'disconnected'
+CANCEL_DEADLINE = 'deadline'
+
+# Коди відповіді для скасованих запитів: 499 (клієнт закрив з'єднання, як у nginx) і 504
+CANCEL_STATUS_CODES = {CANCEL_DISCONNECTED: 499, CANCEL_DEADLINE: 504}
+
+
+class GenerationCancelled(Exception):
+    """Генерацію зупинено до завершення (наприклад, клієнт відключився)."""
+
+    def __init__(self, reason: str, message: str | None = None):
+        super().__init__(message or f"Генерацію скасовано: {reason}")
+        self.reason = reason
+
+
+class CancellationToken:
+    """
+    Ознака скасування одного запиту, спільна для потоку обробника та циклу декодування.
+
+    Декодування перевіряє токен на кожному кроці й зупиняється, щойно клієнт відключився
+    або минув дедлайн запиту, звільняючи потік виконавця та місце в батчі.
+    """
+
+    def __init__(self, deadline_seconds: float | None = None):
+        """
+        Args:
+            deadline_seconds: Час на виконання запиту; None або 0 — без дедлайну
+        """
+        self._deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason: str) -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self._deadline is not None and time.monotonic() >= self._deadline:
+            self.cancel(CANCEL_DEADLINE)
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """
+        Raises:
+            GenerationCancelled: Якщо запит скасовано
+        """
+        if self.cancelled:
+            raise GenerationCancelled(self.reason)
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(request, token: CancellationToken, poll_interval: float):
+    """
+    Скасовує токен, щойно клієнт HTTP-запиту відключився.
+    Args:
+        request: Запит з асинхронним методом is_disconnected()
+        token: Токен запиту
+        poll_interval: Як часто перевіряти з'єднання, с
+    """
+    async def watch() -> None:
+        while not token.cancelled:
+            if await request.is_disconnected():
+                token.cancel(CANCEL_DISCONNECTED)
+                return
+            await asyncio.sleep(poll_interval)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield token
+    finally:
+        watcher.cancel()
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+from generation.cancellation import (
+    CANCEL_DEADLINE,
+    CANCEL_DISCONNECTED,
+    CancellationToken,
+    GenerationCancelled,
+    cancel_on_disconnect
+)
+
+
+def test_deadline_trips_token():
+    token = CancellationToken(deadline_seconds=0.01)
+    token.check()
+    time.sleep(0.02)
+    with pytest.raises(GenerationCancelled) as error:
+        token.check()
+    assert error.value.reason == CANCEL_DEADLINE
+
+
+def test_first_reason_wins():
+    token = CancellationToken()
+    assert not token.cancelled
+    token.cancel(CANCEL_DISCONNECTED)
+    token.cancel(CANCEL_DEADLINE)
+    assert token.reason == CANCEL_DISCONNECTED
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after):
+        self.polls = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self):
+        self.polls += 1
+        return self.polls > self.disconnect_after
+
+
+def test_disconnect_cancels_token():
+    async def run():
+        token = CancellationToken()
+        async with cancel_on_disconnect(FakeRequest(disconnect_after=2), token, poll_interval=0.001):
+            for _ in range(100):
+                if token.cancelled:
+                    break
+                await asyncio.sleep(0.005)
+        return token
+
+    assert asyncio.run(run()).reason == CANCEL_DISCONNECTED
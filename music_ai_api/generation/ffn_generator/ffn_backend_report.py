@@ -0,0 +1,171 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import torch
+
+import utils.ffn_utils.constants as constants
+from common.constants import CATEGORICAL_DATASET_PATH
+from generation.ffn_generator.ffn_export import (
+    ENGINE_EAGER,
+    ENGINE_TORCHSCRIPT,
+    QUANTIZATIONS,
+    default_torchscript_path,
+    export_torchscript,
+    load_inference_network
+)
+from generation.ffn_generator.forward_network import load_forward_network
+from generation.ffn_generator.network_harmony_generator import decode_positions
+from utils.ffn_models.voices import voices
+from utils.ffn_utils.data_midi_loader import load_soprano_melody
+from utils.metrics import rss_mb
+
+
+def load_windows(count: int, midi_paths: list[str] | None = None, seed: int = 0) -> np.ndarray:
+    """
+    Випадкові вікна мелодії сопрано (індекси нот) форми (count, SEQUENCE_LENGTH).
+    Мелодії беруться з MIDI-файлів або, якщо їх не задано, з висот нот датасету LSTM.
+    """
+    if midi_paths:
+        melodies = []
+        for path in midi_paths:
+            with open(path, 'rb') as f:
+                melodies.append(load_soprano_melody(f.read()))
+        melody = np.concatenate(melodies)
+    else:
+        soprano_range = voices['soprano'].range
+        pitches = pd.read_parquet(CATEGORICAL_DATASET_PATH)['pitch'].to_numpy(dtype=np.int64)
+        in_range = (pitches >= soprano_range.min_note) & (pitches <= soprano_range.max_note)
+        melody = np.where(in_range, pitches - soprano_range.min_note + 1, constants.SILENCE_INDEX).astype(np.uint8)
+
+    starts = np.random.default_rng(seed).integers(0, len(melody) - constants.SEQUENCE_LENGTH, count)
+    return np.stack([melody[start:start + constants.SEQUENCE_LENGTH] for start in starts])
+
+
+def measure_backend(
+    model_path: str,
+    engine: str,
+    quantization: str,
+    torchscript_path: str | None,
+    windows: np.ndarray,
+    batch_sizes: tuple,
+    repeats: int
+) -> dict:
+    """Виконується в окремому процесі, щоб пам'ять кожного варіанта вимірювалася окремо."""
+    rss_before = rss_mb()
+    network = load_inference_network(model_path, torch.device('cpu'), engine, quantization, torchscript_path)
+    inputs = torch.from_numpy(windows)
+    with torch.inference_mode():
+        outputs = [output.numpy() for output in network(inputs)]
+
+        latency = {}
+        for batch_size in batch_sizes:
+            batch = inputs[:batch_size]
+            network(batch)
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                network(batch)
+                timings.append((time.perf_counter() - started) * 1000)
+            latency[batch_size] = (float(np.percentile(timings, 50)), float(np.percentile(timings, 95)))
+
+    return {'outputs': outputs, 'latency': latency, 'rss_mb': rss_mb(), 'rss_delta_mb': rss_mb() - rss_before}
+
+
+def harmony_parity(windows: np.ndarray, reference: list, outputs: list) -> dict:
+    """
+    Розбіжність з eager-мережею.
+    Returns:
+        dict: Частка вікон з ідентичною гармонією, частка збігів нот кожного голосу
+        та максимальна абсолютна різниця логарифмів імовірностей
+    """
+    def harmony(voice_outputs):
+        positions = np.stack([windows] + [output.argmax(axis=1) for output in voice_outputs], axis=-1)
+        return decode_positions(positions)
+
+    expected = harmony(reference)
+    actual = harmony(outputs)
+    parity = {'windows_equal': float((expected == actual).all(axis=(1, 2)).mean())}
+    for voice_index, name in enumerate(('alto', 'tenor', 'bass'), start=1):
+        parity[f'{name}_equal'] = float((expected[..., voice_index] == actual[..., voice_index]).mean())
+    parity['max_abs_diff'] = max(float(np.abs(r - o).max()) for r, o in zip(reference, outputs))
+    return parity
+
+
+def build_report(
+    model_path: str,
+    torchscript_paths: dict,
+    windows: np.ndarray,
+    batch_sizes: tuple = (1, 32, 256),
+    repeats: int = 50
+) -> list[dict]:
+    """Вимірює eager-мережу і кожен TorchScript-варіант (назва квантизації → шлях до файлу)."""
+    backends = [('eager', ENGINE_EAGER, QUANTIZATIONS[0], None)] + [
+        (f'torchscript-{quantization}', ENGINE_TORCHSCRIPT, quantization, path)
+        for quantization, path in torchscript_paths.items()
+    ]
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for name, engine, quantization, path in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(
+                measure_backend, model_path, engine, quantization, path, windows, batch_sizes, repeats
+            ).result()
+        result['name'] = name
+        result['size_kb'] = os.path.getsize(path or model_path) / 1024
+        results.append(result)
+
+    reference = results[0]['outputs']
+    for result in results:
+        result['parity'] = harmony_parity(windows, reference, result['outputs'])
+    return results
+
+
+def format_report(results: list[dict]) -> str:
+    batch_sizes = list(results[0]['latency'])
+    header = ['бекенд', 'розмір, КБ', 'RSS (+модель), МБ'] + [f'батч {b}: p50/p95, мс' for b in batch_sizes] + [
+        'вікна без змін', 'альт', 'тенор', 'бас', 'макс. |Δ log p|'
+    ]
+    rows = []
+    for result in results:
+        parity = result['parity']
+        rows.append([
+            result['name'],
+            f"{result['size_kb']:.0f}",
+            f"{result['rss_mb']:.0f} (+{result['rss_delta_mb']:.0f})",
+            *[f'{p50:.2f}/{p95:.2f}' for p50, p95 in result['latency'].values()],
+            f"{parity['windows_equal']:.3f}",
+            f"{parity['alto_equal']:.4f}",
+            f"{parity['tenor_equal']:.4f}",
+            f"{parity['bass_equal']:.4f}",
+            f"{parity['max_abs_diff']:.2e}",
+        ])
+    lines = ['| ' + ' | '.join(header) + ' |', '|' + '---|' * len(header)]
+    lines += ['| ' + ' | '.join(row) + ' |' for row in rows]
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Порівняння TorchScript-варіантів мережі гармонізації з eager-мережею")
+    parser.add_argument('--model', default='models/best_model_new.pth')
+    parser.add_argument('--midi', nargs='*', help="MIDI-файли, з яких беруться мелодії (за замовчуванням — датасет LSTM)")
+    parser.add_argument('--windows', type=int, default=1024)
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        torchscript_paths = {}
+        for quantization in QUANTIZATIONS:
+            path = default_torchscript_path(args.model, quantization)
+            if not os.path.exists(path):
+                path = os.path.join(export_dir, os.path.basename(path))
+                export_torchscript(load_forward_network(args.model, torch.device('cpu')), path, quantization)
+            torchscript_paths[quantization] = path
+
+        results = build_report(args.model, torchscript_paths, load_windows(args.windows, args.midi), repeats=args.repeats)
+        print(format_report(results))
@@ -0,0 +1,169 @@
+import argparse
+import os
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+import utils.ffn_utils.constants as constants
+from common.constants import FFN_INFERENCE_ENGINE, FFN_QUANTIZATION, FFN_TORCHSCRIPT_MODEL_PATH
+from generation.ffn_generator.forward_network import (
+    ALTO_CLASSES,
+    BASS_CLASSES,
+    SOPRANO_CLASSES,
+    TENOR_CLASSES,
+    ForwardNetwork,
+    load_forward_network
+)
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+QUANTIZATION_NONE = 'none'
+QUANTIZATION_INT8 = 'int8'
+QUANTIZATIONS = (QUANTIZATION_NONE, QUANTIZATION_INT8)
+
+ENGINE_EAGER = 'eager'
+ENGINE_TORCHSCRIPT = 'torchscript'
+ENGINES = (ENGINE_EAGER, ENGINE_TORCHSCRIPT)
+
+
+def fold_batch_norm(linear: nn.Linear, batch_norm: nn.BatchNorm1d) -> nn.Linear:
+    """
+    Лінійний шар, що обчислює batch_norm(linear(x)) у режимі eval:
+    W' = W · γ/√(σ² + ε), b' = (b - μ) · γ/√(σ² + ε) + β.
+    """
+    scale = batch_norm.weight / torch.sqrt(batch_norm.running_var + batch_norm.eps)
+    folded = nn.Linear(linear.in_features, linear.out_features)
+    with torch.no_grad():
+        folded.weight.copy_(linear.weight * scale[:, None])
+        folded.bias.copy_((linear.bias - batch_norm.running_mean) * scale + batch_norm.bias)
+    return folded
+
+
+class InferenceForwardNetwork(nn.Module):
+    """
+    ForwardNetwork для інференсу: BatchNorm злито з попередніми лінійними шарами,
+    dropout прибрано. Виходи збігаються з ForwardNetwork у режимі eval.
+    """
+
+    def __init__(self, network: ForwardNetwork):
+        super(InferenceForwardNetwork, self).__init__()
+        self.sequence_length = constants.SEQUENCE_LENGTH
+        # TorchScript не читає глобальні змінні модуля, тому розміри класів — атрибути
+        self.soprano_classes = SOPRANO_CLASSES
+        self.alto_classes = ALTO_CLASSES
+        self.tenor_classes = TENOR_CLASSES
+        self.bass_classes = BASS_CLASSES
+
+        self.input = fold_batch_norm(network.input, network.bn1)
+        self.hidden1 = fold_batch_norm(network.hidden1, network.bn2)
+        self.hidden2 = network.hidden2
+        self.activation = nn.ELU()
+
+        self.forward_alto = network.forward_alto
+        self.forward_tenor = network.forward_tenor
+        self.forward_bass = network.forward_bass
+
+    def forward(self, x: torch.Tensor):
+        if not torch.is_floating_point(x):
+            x = F.one_hot(x.long(), self.soprano_classes).to(torch.float32)
+        x = torch.flatten(x, start_dim=1)
+
+        x = self.activation(self.input(x))
+        x = self.activation(self.hidden1(x))
+        x = self.activation(self.hidden2(x))
+
+        batch_size = x.shape[0]
+        x_alto = F.log_softmax(self.forward_alto(x).reshape(batch_size, self.alto_classes, self.sequence_length), dim=1)
+        x_tenor = F.log_softmax(self.forward_tenor(x).reshape(batch_size, self.tenor_classes, self.sequence_length), dim=1)
+        x_bass = F.log_softmax(self.forward_bass(x).reshape(batch_size, self.bass_classes, self.sequence_length), dim=1)
+
+        return x_alto, x_tenor, x_bass
+
+
+def build_inference_network(network: ForwardNetwork, quantization: str = QUANTIZATION_NONE) -> torch.jit.ScriptModule:
+    """
+    Args:
+        network: Навчена мережа
+        quantization: "none" або "int8" (динамічна int8-квантизація лінійних шарів)
+    Returns:
+        torch.jit.ScriptModule: Заморожений TorchScript-модуль
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Невідомий тип квантизації: {quantization}")
+
+    inference_network = InferenceForwardNetwork(network.cpu().eval()).eval()
+    if quantization == QUANTIZATION_INT8:
+        inference_network = torch.ao.quantization.quantize_dynamic(
+            inference_network, {nn.Linear}, dtype=torch.qint8
+        )
+    return torch.jit.freeze(torch.jit.script(inference_network))
+
+
+def export_torchscript(network: ForwardNetwork, out_path: str, quantization: str = QUANTIZATION_NONE) -> int:
+    """
+    Зберігає мережу для інференсу у файл TorchScript.
+    Returns:
+        int: Розмір файлу в байтах
+    """
+    torch.jit.save(build_inference_network(network, quantization), out_path)
+    return os.path.getsize(out_path)
+
+
+def default_torchscript_path(model_path: str, quantization: str) -> str:
+    suffix = '' if quantization == QUANTIZATION_NONE else f'_{quantization}'
+    return f'{os.path.splitext(model_path)[0]}{suffix}.pt'
+
+
+def load_inference_network(
+    model_path: str,
+    device: torch.device,
+    engine: str = FFN_INFERENCE_ENGINE,
+    quantization: str = FFN_QUANTIZATION,
+    torchscript_path: str | None = FFN_TORCHSCRIPT_MODEL_PATH
+):
+    """
+    Завантажує мережу гармонізації для обраного рушія інференсу.
+
+    Для "torchscript" використовується файл, збережений export_torchscript; якщо його
+    немає, модуль будується з контрольної точки в пам'яті. Перший прохід виконується
+    одразу в режимі inference_mode, щоб TorchScript оптимізував граф до першого запиту.
+    Args:
+        model_path: Контрольна точка ForwardNetwork (.pth)
+        device: Пристрій виконання
+        engine: "eager" (ForwardNetwork як є) або "torchscript"
+        quantization: "none" або "int8" (лише на CPU)
+        torchscript_path: Файл TorchScript; None — шлях за замовчуванням поруч із model_path
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Невідомий рушій інференсу FFN: {engine}")
+    if engine == ENGINE_EAGER:
+        return load_forward_network(model_path, device)
+    if quantization == QUANTIZATION_INT8 and device.type != 'cpu':
+        raise ValueError("Квантизована int8 мережа виконується лише на CPU")
+
+    path = torchscript_path or default_torchscript_path(model_path, quantization)
+    if os.path.exists(path):
+        network = torch.jit.load(path, map_location=device)
+    else:
+        logger.info(f"Файл {path} не знайдено, мережу для інференсу зібрано з {model_path}")
+        network = build_inference_network(load_forward_network(model_path, torch.device('cpu')), quantization).to(device)
+
+    with torch.inference_mode():
+        warmup = torch.zeros((2, constants.SEQUENCE_LENGTH), dtype=torch.uint8, device=device)
+        for _ in range(2):
+            network(warmup)
+    return network
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Експорт ForwardNetwork у TorchScript для інференсу")
+    parser.add_argument('--model', default='models/best_model_new.pth')
+    parser.add_argument('--quantization', choices=QUANTIZATIONS, default=QUANTIZATION_NONE)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    out_path = args.out or default_torchscript_path(args.model, args.quantization)
+    size = export_torchscript(load_forward_network(args.model, torch.device('cpu')), out_path, args.quantization)
+    print(f"Модель збережено у {out_path} ({size / 1024:.0f} КБ)")
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import torch
+
+import utils.ffn_utils.constants as constants
+from generation.ffn_generator.ffn_export import (
+    ENGINE_TORCHSCRIPT,
+    QUANTIZATION_INT8,
+    QUANTIZATION_NONE,
+    export_torchscript,
+    load_inference_network
+)
+from generation.ffn_generator.network_harmony_generator import NetworkHarmonyGenerator
+from generation.ffn_generator.network_harmony_generator_test import make_melody, make_network
+
+
+def make_windows(count):
+    return torch.stack([make_melody(constants.SEQUENCE_LENGTH, seed) for seed in range(count)])
+
+
+@pytest.mark.parametrize('quantization,atol', [(QUANTIZATION_NONE, 1e-5), (QUANTIZATION_INT8, 0.5)])
+def test_exported_network_matches_eager_for_any_batch_size(tmp_path, quantization, atol):
+    network = make_network()
+    model_path = str(tmp_path / 'model.pth')
+    torch.save(network.state_dict(), model_path)
+    export_torchscript(network, str(tmp_path / 'model.pt'), quantization)
+    exported = load_inference_network(
+        model_path, torch.device('cpu'), ENGINE_TORCHSCRIPT, quantization, str(tmp_path / 'model.pt')
+    )
+
+    for batch_size in (1, 5, 2):
+        windows = make_windows(batch_size)
+        with torch.inference_mode():
+            expected = network(windows)
+            outputs = exported(windows)
+            one_hot_outputs = exported(torch.nn.functional.one_hot(windows.long(), 22).to(torch.float32))
+        for output, one_hot_output, expected_output in zip(outputs, one_hot_outputs, expected):
+            torch.testing.assert_close(output, expected_output, atol=atol, rtol=0)
+            assert torch.equal(output, one_hot_output)
+
+
+def test_exported_network_gives_same_harmony(tmp_path):
+    network = make_network()
+    path = str(tmp_path / 'model.pt')
+    export_torchscript(network, path)
+    exported = load_inference_network('unused.pth', torch.device('cpu'), ENGINE_TORCHSCRIPT, QUANTIZATION_NONE, path)
+    melody = make_melody(5 * constants.SEQUENCE_LENGTH + 9)
+
+    assert np.array_equal(
+        NetworkHarmonyGenerator(exported).generate_song_harmony(melody),
+        NetworkHarmonyGenerator(network).generate_song_harmony(melody)
+    )
+
+
+def test_missing_export_is_built_from_checkpoint(tmp_path):
+    network = make_network()
+    model_path = str(tmp_path / 'model.pth')
+    torch.save(network.state_dict(), model_path)
+
+    exported = load_inference_network(model_path, torch.device('cpu'), ENGINE_TORCHSCRIPT, QUANTIZATION_NONE, None)
+
+    windows = make_windows(3)
+    with torch.inference_mode():
+        torch.testing.assert_close(exported(windows), network(windows), atol=1e-5, rtol=0)
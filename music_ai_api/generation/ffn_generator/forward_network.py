@@ -2,12 +2,19 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import utils.ffn_utils.constants as constants
+from utils.ffn_models.voices import voices
+
+# Кількість класів кожного голосу: ноти його діапазону і пауза
+SOPRANO_CLASSES = voices['soprano'].range.range_and_silence_length()
+ALTO_CLASSES = voices['alto'].range.range_and_silence_length()
+TENOR_CLASSES = voices['tenor'].range.range_and_silence_length()
+BASS_CLASSES = voices['bass'].range.range_and_silence_length()
 
 class ForwardNetwork(nn.Module):
     def __init__(self):
         super(ForwardNetwork, self).__init__()
 
-        self.input = nn.Linear(constants.SEQUENCE_LENGTH * 22, 128)
+        self.input = nn.Linear(constants.SEQUENCE_LENGTH * SOPRANO_CLASSES, 128)
         self.bn1 = nn.BatchNorm1d(128)
 
         self.hidden1 = nn.Linear(128, 128)
@@ -18,9 +25,9 @@ class ForwardNetwork(nn.Module):
         self.hidden2 = nn.Linear(128, 128)
         self.dropout2 = nn.Dropout(0.35)
 
-        self.forward_alto = nn.Linear(128, constants.SEQUENCE_LENGTH * 22)
-        self.forward_tenor = nn.Linear(128, constants.SEQUENCE_LENGTH * 22)
-        self.forward_bass = nn.Linear(128, constants.SEQUENCE_LENGTH * 29)
+        self.forward_alto = nn.Linear(128, constants.SEQUENCE_LENGTH * ALTO_CLASSES)
+        self.forward_tenor = nn.Linear(128, constants.SEQUENCE_LENGTH * TENOR_CLASSES)
+        self.forward_bass = nn.Linear(128, constants.SEQUENCE_LENGTH * BASS_CLASSES)
 
         self.apply(self.init_weights)
 
@@ -30,6 +37,10 @@ class ForwardNetwork(nn.Module):
             nn.init.zeros_(m.bias)
 
     def forward(self, x):
+        # Сопрано може надходити як індекси нот (вікна, SEQUENCE_LENGTH): one-hot
+        # формується тут, одразу для всього батча
+        if not torch.is_floating_point(x):
+            x = F.one_hot(x.long(), SOPRANO_CLASSES).to(self.input.weight.dtype)
         x = torch.flatten(x, start_dim=1)
 
         x = self.input(x)
@@ -46,8 +57,15 @@ class ForwardNetwork(nn.Module):
         x = self.activation(x)
         x = self.dropout2(x)
 
-        x_alto = F.log_softmax(self.forward_alto(x).reshape(constants.BATCH_SIZE, 22, constants.SEQUENCE_LENGTH), dim=1)
-        x_tenor = F.log_softmax(self.forward_tenor(x).reshape(constants.BATCH_SIZE, 22, constants.SEQUENCE_LENGTH), dim=1)
-        x_bass = F.log_softmax(self.forward_bass(x).reshape(constants.BATCH_SIZE, 29, constants.SEQUENCE_LENGTH), dim=1)
+        batch_size = x.shape[0]
+        x_alto = F.log_softmax(self.forward_alto(x).reshape(batch_size, ALTO_CLASSES, constants.SEQUENCE_LENGTH), dim=1)
+        x_tenor = F.log_softmax(self.forward_tenor(x).reshape(batch_size, TENOR_CLASSES, constants.SEQUENCE_LENGTH), dim=1)
+        x_bass = F.log_softmax(self.forward_bass(x).reshape(batch_size, BASS_CLASSES, constants.SEQUENCE_LENGTH), dim=1)
+
+        return x_alto, x_tenor, x_bass
 
-        return x_alto, x_tenor, x_bass
\ No newline at end of file
+def load_forward_network(model_path: str, device: torch.device) -> ForwardNetwork:
+    network = ForwardNetwork().to(device)
+    network.load_state_dict(torch.load(model_path, map_location=device))
+    network.eval()
+    return network
@@ -1,79 +1,139 @@
+import numpy as np
 import torch
 
 import utils.ffn_utils.constants as constants
 
+from common.constants import FFN_MAX_BATCH_WINDOWS
 from generation.ffn_generator.forward_network import ForwardNetwork
 from utils.ffn_models.voices import voices
-from utils.ffn_models.voice import Voice
+from utils.ffn_utils.sequence_length_splitter import get_window_starts
 
 use_cuda = torch.cuda.is_available()
 device = torch.device("cuda" if use_cuda else "cpu")
 
 
-class NetworkHarmonyGenerator:
-    def __init__(self, network: ForwardNetwork):
-        self.network = network
+# Таблиці позиція в тензорі → нота для сопрано, альта, тенора й баса
+VOICE_POSITION_NOTES = tuple(voice.get_tensor_position_notes() for voice in voices.values())
 
-    def get_note_number(self, output: torch.Tensor, slice_index: int, voice: Voice):
-        output_slice = output[slice_index]
-        on_position = output_slice.argmax()
 
-        return voice.get_note_from_tensor_position(on_position.item())
+def decode_positions(positions: np.ndarray) -> np.ndarray:
+    """
+    Перетворює позиції в тензорах голосів на ноти.
 
-    def get_voice_note(self, output: torch.Tensor, slice_index: int, voice: Voice):
-        on_position = output[slice_index]
+    Args:
+        positions: Масив форми (..., 4) з позиціями сопрано, альта, тенора й баса
 
-        return voice.get_note_from_tensor_position(on_position.item())
+    Returns:
+        np.ndarray: Масив int16 тієї ж форми з нотами або SILENCE_NOTE для паузи
+    """
+    notes = np.empty(positions.shape, dtype=np.int16)
+    for voice_index, position_notes in enumerate(VOICE_POSITION_NOTES):
+        notes[..., voice_index] = position_notes[positions[..., voice_index]]
+    return notes
 
 
-    def generate_harmony(self, x_soprano: torch.Tensor):
-        harmony_notes = []
-
-        x_soprano = x_soprano.to(device)
-        y_alto, y_tenor, y_bass = self.network(x_soprano)
+class NetworkHarmonyGenerator:
+    def __init__(self, network: ForwardNetwork, max_batch_windows: int = FFN_MAX_BATCH_WINDOWS):
+        self.network = network
+        self.max_batch_windows = max_batch_windows
+
+    def generate_song_harmony(self, x_soprano: torch.Tensor):
+        """
+        Гармонізує мелодію довільної довжини.
+
+        Мелодія ділиться на вікна по SEQUENCE_LENGTH сегментів (останнє перекриває
+        попереднє), вікна проходять через мережу батчами не більше max_batch_windows,
+        а результати зшиваються в одну послідовність: з кожного вікна береться лише та
+        частина, яку не покрили попередні.
+
+        Args:
+            x_soprano: Індекси нот сопрано форми (довжина,)
+
+        Returns:
+            np.ndarray: Масив форми (довжина, 4) з нотами сопрано, альта, тенора й баса
+        """
+        return self.generate_songs_harmony([x_soprano])[0]
+
+    def generate_songs_harmony(self, melodies: list[torch.Tensor]):
+        """
+        Гармонізує кілька мелодій спільними прямими проходами: вікна всіх мелодій
+        об'єднуються й діляться на батчі не більше max_batch_windows, тож батч може
+        містити кінець однієї мелодії й початок наступної.
+
+        Args:
+            melodies: Індекси нот сопрано кожної мелодії, форми (довжина,)
+
+        Returns:
+            list: Для кожної мелодії — масив форми (довжина, 4), як у generate_song_harmony
+        """
+        song_windows, song_starts = [], []
+        for x_soprano in melodies:
+            song_length = x_soprano.shape[0]
+            if song_length == 0:
+                raise ValueError("Мелодія не містить жодного сегмента")
+
+            if song_length < constants.SEQUENCE_LENGTH:
+                padding = torch.full((constants.SEQUENCE_LENGTH - song_length,), constants.SILENCE_INDEX, dtype=x_soprano.dtype)
+                x_soprano = torch.cat([x_soprano, padding])
+
+            starts = get_window_starts(song_length)
+            song_windows.append(x_soprano.unfold(0, constants.SEQUENCE_LENGTH, 1)[starts])
+            song_starts.append(starts)
+
+        windows = torch.cat(song_windows)
+        windows_notes = np.concatenate([
+            self.generate_harmony(windows[chunk_start:chunk_start + self.max_batch_windows])
+            for chunk_start in range(0, len(windows), self.max_batch_windows)
+        ])
+
+        songs = []
+        window_index = 0
+        for x_soprano, starts in zip(melodies, song_starts):
+            song_length = x_soprano.shape[0]
+            harmony_notes = np.empty((max(song_length, constants.SEQUENCE_LENGTH), 4), dtype=np.int16)
+            covered = 0
+            for start, window_notes in zip(starts, windows_notes[window_index:window_index + len(starts)]):
+                end = start + constants.SEQUENCE_LENGTH
+                harmony_notes[covered:end] = window_notes[covered - start:]
+                covered = end
+            window_index += len(starts)
+            songs.append(harmony_notes[:song_length])
+
+        return songs
 
-        x_soprano = x_soprano[0]
-        y_alto = y_alto[0].transpose(0, 1)
-        y_tenor = y_tenor[0].transpose(0, 1)
-        y_bass = y_bass[0].transpose(0, 1)
+    def generate_harmony(self, x_soprano: torch.Tensor):
+        """
+        Гармонізує батч вікон одним прямим проходом.
 
-        for slice_index in range(constants.SEQUENCE_LENGTH):
-            soprano_note = self.get_note_number(
-                x_soprano, slice_index, voices['soprano'])
-                
-            alto_note = self.get_note_number(
-                y_alto, slice_index, voices['alto'])
-            tenor_note = self.get_note_number(
-                y_tenor, slice_index, voices['tenor'])
-            bass_note = self.get_note_number(
-                y_bass, slice_index, voices['bass'])
+        Args:
+            x_soprano: Індекси нот сопрано форми (вікна, SEQUENCE_LENGTH)
 
-            notes_tuple = (soprano_note, alto_note, tenor_note, bass_note)
-            harmony_notes.append(notes_tuple)
+        Returns:
+            np.ndarray: Масив форми (вікна, SEQUENCE_LENGTH, 4) з нотами сопрано,
+            альта, тенора й баса
+        """
+        x_soprano = x_soprano.to(device)
+        with torch.inference_mode():
+            y_alto, y_tenor, y_bass = self.network(x_soprano)
+            positions = torch.stack([
+                x_soprano.long(),
+                y_alto.argmax(dim=1),
+                y_tenor.argmax(dim=1),
+                y_bass.argmax(dim=1)
+            ], dim=-1)
 
-        return harmony_notes
+        return decode_positions(positions.cpu().numpy())
 
     def imitate_harmony(self,
                         x_soprano: torch.Tensor,
                         y_alto: torch.Tensor,
                         y_tenor: torch.Tensor,
                         y_bass: torch.Tensor):
-        harmony_notes = []
-
-        x_soprano = x_soprano.to(device)[None, :]
-
-        for slice_index in range(constants.SEQUENCE_LENGTH):
-            soprano_note = self.get_note_number(
-                x_soprano[0], slice_index, voices['soprano'])
-
-            alto_note = self.get_voice_note(
-                y_alto, slice_index, voices['alto'])
-            tenor_note = self.get_voice_note(
-                y_tenor, slice_index, voices['tenor'])
-            bass_note = self.get_voice_note(
-                y_bass, slice_index, voices['bass'])
-
-            notes_tuple = (soprano_note, alto_note, tenor_note, bass_note)
-            harmony_notes.append(notes_tuple)
-
-        return harmony_notes
+        """
+        Декодує вікно з датасету (індекси нот усіх голосів) так само, як generate_harmony.
+
+        Returns:
+            np.ndarray: Масив форми (SEQUENCE_LENGTH, 4)
+        """
+        positions = torch.stack([x_soprano, y_alto, y_tenor, y_bass], dim=-1).long()
+        return decode_positions(positions.cpu().numpy())
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+import torch
+
+import utils.ffn_utils.constants as constants
+from generation.ffn_generator.forward_network import ForwardNetwork
+from generation.ffn_generator.network_harmony_generator import NetworkHarmonyGenerator
+from utils.ffn_models.voices import voices
+
+
+def make_network():
+    torch.manual_seed(0)
+    network = ForwardNetwork()
+    for batch_norm in (network.bn1, network.bn2):
+        batch_norm.running_mean.uniform_(-0.5, 0.5)
+        batch_norm.running_var.uniform_(0.5, 2.0)
+    return network.eval()
+
+
+def make_melody(length, seed=0):
+    return torch.from_numpy(np.random.default_rng(seed).integers(0, 22, length, dtype=np.uint8))
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 9])
+def test_forward_accepts_any_batch_size(batch_size):
+    network = make_network()
+    windows = torch.stack([make_melody(constants.SEQUENCE_LENGTH, seed) for seed in range(batch_size)])
+    with torch.inference_mode():
+        y_alto, y_tenor, y_bass = network(windows)
+        single = network(windows[-1:])
+
+    assert y_alto.shape == (batch_size, 22, constants.SEQUENCE_LENGTH)
+    assert y_tenor.shape == (batch_size, 22, constants.SEQUENCE_LENGTH)
+    assert y_bass.shape == (batch_size, 29, constants.SEQUENCE_LENGTH)
+    assert torch.allclose(y_bass[-1:], single[2], atol=1e-6)
+
+
+def test_index_input_matches_one_hot_input():
+    network = make_network()
+    windows = torch.stack([make_melody(constants.SEQUENCE_LENGTH, seed) for seed in range(4)])
+    one_hot = torch.nn.functional.one_hot(windows.long(), 22).to(torch.float32)
+    with torch.inference_mode():
+        from_indexes = network(windows)
+        from_one_hot = network(one_hot)
+
+    for indexed_output, one_hot_output in zip(from_indexes, from_one_hot):
+        assert torch.equal(indexed_output, one_hot_output)
+
+
+@pytest.mark.parametrize('length', [5, constants.SEQUENCE_LENGTH, 150, 5 * constants.SEQUENCE_LENGTH + 3])
+def test_song_harmony_covers_every_segment(length):
+    generator = NetworkHarmonyGenerator(make_network())
+    melody = make_melody(length)
+
+    song = generator.generate_song_harmony(melody)
+
+    assert song.shape == (length, 4)
+    soprano = [
+        constants.SILENCE_NOTE if position == 0 else position + 60
+        for position in melody.tolist()
+    ]
+    assert song[:, 0].tolist() == soprano
+
+
+def test_overlapping_last_window_is_stitched_from_its_tail():
+    generator = NetworkHarmonyGenerator(make_network())
+    melody = make_melody(150)
+
+    song = generator.generate_song_harmony(melody)
+    last_window = generator.generate_harmony(melody[150 - constants.SEQUENCE_LENGTH:][None])[0]
+    first_window = generator.generate_harmony(melody[:constants.SEQUENCE_LENGTH][None])[0]
+
+    assert np.array_equal(song[:constants.SEQUENCE_LENGTH], first_window)
+    assert np.array_equal(song[128:], last_window[128 - (150 - constants.SEQUENCE_LENGTH):])
+
+
+def test_chunked_batches_match_single_batch():
+    network = make_network()
+    melody = make_melody(10 * constants.SEQUENCE_LENGTH + 17)
+
+    single_batch = NetworkHarmonyGenerator(network, max_batch_windows=256).generate_song_harmony(melody)
+    chunked = NetworkHarmonyGenerator(network, max_batch_windows=3).generate_song_harmony(melody)
+
+    assert np.array_equal(chunked, single_batch)
+
+
+def test_decoding_matches_per_slice_argmax():
+    network = make_network()
+    windows = torch.stack([make_melody(constants.SEQUENCE_LENGTH, seed) for seed in range(5)])
+
+    notes = NetworkHarmonyGenerator(network).generate_harmony(windows)
+    with torch.inference_mode():
+        outputs = network(windows)
+
+    assert notes.shape == (5, constants.SEQUENCE_LENGTH, 4)
+    for window_index in range(5):
+        for slice_index in range(constants.SEQUENCE_LENGTH):
+            positions = [windows[window_index, slice_index].item()] + [
+                output[window_index, :, slice_index].argmax().item() for output in outputs
+            ]
+            expected = [
+                voice.get_note_from_tensor_position(position)
+                for voice, position in zip(voices.values(), positions)
+            ]
+            expected = [constants.SILENCE_NOTE if note is None else note for note in expected]
+            assert notes[window_index, slice_index].tolist() == expected
+
+
+def test_imitated_harmony_decodes_dataset_indexes():
+    generator = NetworkHarmonyGenerator(make_network())
+    voice_indexes = [make_melody(constants.SEQUENCE_LENGTH, seed) for seed in range(4)]
+
+    notes = generator.imitate_harmony(*voice_indexes)
+
+    assert notes.shape == (constants.SEQUENCE_LENGTH, 4)
+    assert np.array_equal(notes[:, 1] == constants.SILENCE_NOTE, voice_indexes[1].numpy() == 0)
+    assert np.array_equal(notes[:, 3][voice_indexes[3].numpy() > 0], voice_indexes[3].numpy()[voice_indexes[3].numpy() > 0] + 35)
+
+
+def test_songs_share_forward_passes():
+    network = make_network()
+    calls = []
+
+    def counting_network(x):
+        calls.append(x.shape[0])
+        return network(x)
+
+    melodies = [make_melody(length, seed) for seed, length in enumerate((5, 150, 3 * constants.SEQUENCE_LENGTH, 70))]
+    songs = NetworkHarmonyGenerator(counting_network, max_batch_windows=8).generate_songs_harmony(melodies)
+
+    assert calls == [8, 1]
+    for melody, song in zip(melodies, songs):
+        assert np.array_equal(song, NetworkHarmonyGenerator(network).generate_song_harmony(melody))
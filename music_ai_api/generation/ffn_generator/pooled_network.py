@@ -0,0 +1,35 @@
+import numpy as np
+import torch
+
+from generation.ffn_generator.ffn_export import load_inference_network
+from generation.model_pool import ModelWorkerPool
+
+OUTPUT_NAMES = ('alto', 'tenor', 'bass')
+
+
+class ForwardNetworkPredictor:
+    """Обгортка ForwardNetwork з інтерфейсом predict(inputs) над масивами numpy."""
+
+    def __init__(self, model_path: str):
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.network = load_inference_network(model_path, self.device)
+
+    def predict(self, inputs: np.ndarray) -> dict:
+        with torch.inference_mode():
+            outputs = self.network(torch.from_numpy(inputs).to(self.device))
+        return {name: output.cpu().numpy() for name, output in zip(OUTPUT_NAMES, outputs)}
+
+
+def load_forward_network_predictor(model_path: str) -> ForwardNetworkPredictor:
+    return ForwardNetworkPredictor(model_path)
+
+
+class PooledForwardNetwork:
+    """Викликається як ForwardNetwork, але прямий прохід виконується в пулі процесів."""
+
+    def __init__(self, model_path: str, num_workers: int):
+        self.pool = ModelWorkerPool('ffn', load_forward_network_predictor, (model_path,), num_workers)
+
+    def __call__(self, x: torch.Tensor) -> tuple:
+        outputs = self.pool.predict(x.detach().cpu().numpy())
+        return tuple(torch.from_numpy(outputs[name]).to(x.device) for name in OUTPUT_NAMES)
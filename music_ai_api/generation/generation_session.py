@@ -0,0 +1,164 @@
+import numpy as np
+
+from common.constants import PITCH_VOCAB_SIZE
+from generation.cancellation import CancellationToken
+from generation.note_window import NoteWindow
+from generation.sampling import sample_categorical
+from utils.midi_utils_v2 import NOTE_DTYPE, DurationTable
+
+
+class GenerationSession:
+    """Стан однієї авторегресійної генерації: вхідне вікно, параметри запиту та згенеровані ноти."""
+
+    def __init__(
+        self,
+        window: NoteWindow,
+        num_predictions: int,
+        temperature: float,
+        tempo: int,
+        duration_table: DurationTable,
+        original_avg_pitch: float,
+        rng: np.random.Generator | None = None,
+        top_k: int | None = None,
+        top_p: float | None = None,
+        token: CancellationToken | None = None
+    ):
+        """
+        Args:
+            window: Кільцевий буфер з нормалізованим вхідним вікном (SEQ_LENGTH, 3)
+            num_predictions: Кількість нот для генерації
+            temperature: Температура для семплінгу
+            tempo: Темп мелодії (BPM)
+            duration_table: Таблиця тривалостей для темпу запиту
+            original_avg_pitch: Середня висота початкових нот для зворотної транспозиції
+            rng: Генератор випадкових чисел сесії (з seed запиту для відтворюваності)
+            top_k: Скільки найімовірніших висот враховувати при семплінгу
+            top_p: Поріг сумарної ймовірності для nucleus-семплінгу висот
+            token: Токен скасування запиту, якому належить сесія
+        """
+        self.window = window
+        self.num_predictions = num_predictions
+        self.temperature = temperature
+        self.tempo = tempo
+        self.duration_table = duration_table
+        self.original_avg_pitch = original_avg_pitch
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.top_k = top_k
+        self.top_p = top_p
+        self.token = token
+        self.notes = np.zeros(num_predictions, dtype=NOTE_DTYPE)
+        self.count = 0
+        self.prev_start = 0
+        self._pitch_sum = 0
+
+    def fork(self, temperature: float) -> 'GenerationSession':
+        """Нова сесія з тим самим вхідним вікном і темпом, але власною температурою."""
+        return GenerationSession(
+            self.window.copy(),
+            self.num_predictions,
+            temperature,
+            self.tempo,
+            self.duration_table,
+            self.original_avg_pitch,
+            self.rng.spawn(1)[0],
+            self.top_k,
+            self.top_p,
+            self.token
+        )
+
+    @property
+    def input_notes(self) -> np.ndarray:
+        """Поточне вхідне вікно моделі без копіювання."""
+        return self.window.view
+
+    @property
+    def done(self) -> bool:
+        return self.count >= self.num_predictions
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token is not None and self.token.cancelled
+
+    def check_cancelled(self) -> None:
+        """
+        Raises:
+            GenerationCancelled: Якщо запит сесії скасовано
+        """
+        if self.token is not None:
+            self.token.check()
+
+    @property
+    def generated(self) -> np.ndarray:
+        """Згенеровані ноти як структурований масив (NOTE_DTYPE) без копіювання."""
+        return self.notes[:self.count]
+
+    @property
+    def generated_notes(self) -> list[tuple]:
+        """
+        Згенеровані ноти з мітками тривалостей.
+        Returns:
+            list: Кортежі (pitch, step, duration_label, duration, start, end)
+        """
+        notes = self.generated
+        labels = self.duration_table.to_labels(notes['duration_class'])
+        return list(zip(
+            notes['pitch'].tolist(),
+            notes['step'].tolist(),
+            labels.tolist(),
+            notes['duration'].tolist(),
+            notes['start'].tolist(),
+            notes['end'].tolist()
+        ))
+
+    def record(self, pitch: int, step: float, duration_class: int) -> tuple:
+        """
+        Додає семпльовану ноту до сесії та зсуває вхідне вікно.
+        Returns:
+            tuple: (pitch, step, duration_label, duration, start, end)
+        """
+        duration_in_seconds = self.duration_table.seconds[duration_class]
+
+        start = self.prev_start + step
+        end = start + duration_in_seconds
+
+        self.notes[self.count] = (pitch, step, duration_class, duration_in_seconds, start, end)
+        self.count += 1
+        self._pitch_sum += pitch
+
+        self.window.push(pitch / PITCH_VOCAB_SIZE, step, duration_class)
+        self.prev_start = start
+        return (pitch, step, self.duration_table.labels[duration_class], float(duration_in_seconds), float(start), float(end))
+
+    def preview_pitch(self, pitch: int) -> int:
+        """
+        Транспонує ноту в діапазон вхідної послідовності за середнім уже згенерованих нот.
+        Остаточний зсув у MIDI-файлі обчислюється за всіма нотами, тому може трохи відрізнятися.
+        """
+        generated_avg_pitch = self._pitch_sum / self.count
+        pitch_shift = int(round(self.original_avg_pitch - generated_avg_pitch))
+        return max(0, min(127, pitch + pitch_shift))
+
+
+def advance_sessions(sessions: list[GenerationSession], predictions: dict) -> list[tuple]:
+    """
+    Семплює наступну ноту для кожної сесії батчу однією векторною операцією.
+    Рядок `i` виходів моделі відповідає сесії `sessions[i]`; кожна сесія бере
+    випадкові числа зі свого генератора, тож результат не залежить від складу батчу.
+    Returns:
+        list: Кортежі (pitch, step, duration_label, duration, start, end) для кожної сесії
+    """
+    uniforms = np.array([session.rng.random(2) for session in sessions])
+    pitches = sample_categorical(
+        predictions['pitch'],
+        uniforms[:, 0],
+        temperature=[session.temperature for session in sessions],
+        top_k=[session.top_k or 0 for session in sessions],
+        top_p=[session.top_p or 1.0 for session in sessions]
+    )
+    duration_classes = sample_categorical(predictions['duration'], uniforms[:, 1])
+    steps = np.maximum(0, predictions['step'][:, 0])
+
+    return [
+        session.record(int(pitch), float(step), int(duration_class))
+        for session, pitch, step, duration_class in zip(sessions, pitches, steps, duration_classes)
+    ]
@@ -0,0 +1,35 @@
+import numpy as np
+
+from common.constants import SEQ_LENGTH, valid_durations
+from generation.generation_session import GenerationSession, advance_sessions
+from generation.note_window import NoteWindow
+from generation.sampling import sample_categorical
+from utils.midi_utils_v2 import get_duration_table
+
+
+def make_session(temperature, seed):
+    duration_table = get_duration_table(120, tuple(sorted(valid_durations.values())))
+    return GenerationSession(
+        NoteWindow(SEQ_LENGTH), 1, temperature, 120, duration_table, 60.0, np.random.default_rng(seed)
+    )
+
+
+def test_each_session_draws_pitch_then_duration_from_its_own_rng():
+    rng = np.random.default_rng(0)
+    predictions = {
+        'pitch': rng.normal(size=(3, 128)).astype(np.float32),
+        'step': np.full((3, 1), 0.25, dtype=np.float32),
+        'duration': rng.normal(size=(3, len(valid_durations))).astype(np.float32),
+    }
+    temperatures = [0.5, 1.0, 1.5]
+    sessions = [make_session(temperature, seed) for seed, temperature in enumerate(temperatures)]
+
+    advance_sessions(sessions, predictions)
+
+    for index, session in enumerate(sessions):
+        pitch_uniform, duration_uniform = np.random.default_rng(index).random(2)
+        row = slice(index, index + 1)
+        expected_pitch = sample_categorical(predictions['pitch'][row], [pitch_uniform], temperatures[index])[0]
+        expected_duration = sample_categorical(predictions['duration'][row], [duration_uniform])[0]
+        assert session.generated['pitch'][0] == expected_pitch
+        assert session.generated['duration_class'][0] == expected_duration
@@ -0,0 +1,197 @@
+import numpy as np
+import tensorflow as tf
+
+from common.constants import SEQ_LENGTH
+
+OUTPUT_NAMES = ('pitch', 'step', 'duration')
+
+
+class IncrementalDecoder:
+    """
+    Потоковий (stateful) декодер для моделі attention-LSTM.
+
+    Використовує ваги завантаженої моделі, але замість повторного проходу по всьому
+    вікні з SEQ_LENGTH нот зберігає між кроками стани LSTM і кеш ключів/значень
+    уваги, тому кожна нова нота обчислюється лише з найновішого входу.
+
+    Перший прогноз (prime) обчислюється по всьому вікну і збігається з віконним
+    шляхом. Подальші кроки є потоковим наближенням: модель має двонапрямлений LSTM
+    і неказуальну увагу, тож точний інкрементальний розрахунок для неї неможливий.
+    Прямий LSTM не скидає стан на початку вікна, а для старіших позицій у кеші
+    зберігаються виходи, обчислені в момент, коли вони були найновішими.
+
+    Декодер лише для офлайн-експериментів і не є рушієм сервісу: наскільки кроки
+    розходяться з віконним шляхом, залежить від ваг моделі (measure_step_drift,
+    generation/lstm_backend_report.py --incremental-steps).
+    """
+
+    def __init__(self, model: tf.keras.Model):
+        """
+        Args:
+            model: Завантажена модель ckpt_best.model_lstm_attention_categorical.keras
+        """
+        bidirectional = self._single_layer(model, tf.keras.layers.Bidirectional)
+        self.forward_cell = bidirectional.forward_layer.cell
+        self.backward_cell = bidirectional.backward_layer.cell
+        self.attention = self._single_layer(model, tf.keras.layers.Attention)
+        self.output_lstm_cell = next(
+            layer for layer in model.layers if type(layer) is tf.keras.layers.LSTM
+        ).cell
+        self.sequence_norm, self.lstm_norm, self.dense_norm = [
+            layer for layer in model.layers if isinstance(layer, tf.keras.layers.BatchNormalization)
+        ]
+        self.dense = next(
+            layer for layer in model.layers
+            if isinstance(layer, tf.keras.layers.Dense) and layer.name not in OUTPUT_NAMES
+        )
+        self.heads = {name: model.get_layer(name) for name in OUTPUT_NAMES}
+
+        num_features = model.input_shape[-1]
+        self._prime = tf.function(
+            self._prime_graph,
+            input_signature=[tf.TensorSpec((None, SEQ_LENGTH, num_features), tf.float32)])
+        self._step = tf.function(
+            self._step_graph,
+            input_signature=[
+                tf.TensorSpec((None, num_features), tf.float32),
+                self._state_signature(),
+            ])
+
+        # Трасуємо обидві функції під час запуску, а не на першому запиті
+        _, state = self._prime(tf.zeros((1, SEQ_LENGTH, num_features), tf.float32))
+        self._step(tf.zeros((1, num_features), tf.float32), state)
+
+    @staticmethod
+    def _single_layer(model: tf.keras.Model, layer_type: type) -> tf.keras.layers.Layer:
+        layers = [layer for layer in model.layers if isinstance(layer, layer_type)]
+        if len(layers) != 1:
+            raise ValueError(f"Очікувався один шар {layer_type.__name__}, знайдено {len(layers)}")
+        return layers[0]
+
+    def _state_signature(self) -> tuple:
+        forward_units = self.forward_cell.units
+        output_units = self.output_lstm_cell.units
+        context_units = forward_units + self.backward_cell.units
+        return (
+            tf.TensorSpec((None, forward_units), tf.float32),
+            tf.TensorSpec((None, forward_units), tf.float32),
+            tf.TensorSpec((None, output_units), tf.float32),
+            tf.TensorSpec((None, output_units), tf.float32),
+            tf.TensorSpec((None, SEQ_LENGTH, context_units), tf.float32),
+        )
+
+    @staticmethod
+    def _zero_state(cell, batch_size: tf.Tensor) -> list:
+        return [tf.zeros((batch_size, cell.units)), tf.zeros((batch_size, cell.units))]
+
+    def _head_outputs(self, lstm_output: tf.Tensor) -> dict:
+        x = self.lstm_norm(lstm_output, training=False)
+        x = self.dense(x)
+        x = self.dense_norm(x, training=False)
+        return {name: head(x) for name, head in self.heads.items()}
+
+    def _prime_graph(self, window: tf.Tensor):
+        batch_size = tf.shape(window)[0]
+
+        forward_state = self._zero_state(self.forward_cell, batch_size)
+        forward_outputs = []
+        for t in range(SEQ_LENGTH):
+            output, forward_state = self.forward_cell(window[:, t], forward_state, training=False)
+            forward_outputs.append(output)
+
+        backward_state = self._zero_state(self.backward_cell, batch_size)
+        backward_outputs = [None] * SEQ_LENGTH
+        for t in reversed(range(SEQ_LENGTH)):
+            backward_outputs[t], backward_state = self.backward_cell(window[:, t], backward_state, training=False)
+
+        context = tf.concat([tf.stack(forward_outputs, axis=1), tf.stack(backward_outputs, axis=1)], axis=-1)
+        context = self.sequence_norm(context, training=False)
+        attended = context + self.attention([context, context], training=False)
+
+        output_state = self._zero_state(self.output_lstm_cell, batch_size)
+        for t in range(SEQ_LENGTH):
+            output, output_state = self.output_lstm_cell(attended[:, t], output_state, training=False)
+
+        state = (*forward_state, *output_state, context)
+        return self._head_outputs(output), state
+
+    def _step_graph(self, note: tf.Tensor, state: tuple):
+        forward_h, forward_c, output_h, output_c, context = state
+        batch_size = tf.shape(note)[0]
+
+        forward_output, forward_state = self.forward_cell(note, [forward_h, forward_c], training=False)
+        # Для найновішої позиції зворотний LSTM робить рівно один крок з нульового стану
+        backward_output, _ = self.backward_cell(note, self._zero_state(self.backward_cell, batch_size), training=False)
+
+        newest = tf.concat([forward_output, backward_output], axis=-1)[:, tf.newaxis]
+        newest = self.sequence_norm(newest, training=False)
+        context = tf.concat([context[:, 1:], newest], axis=1)
+        attended = newest + self.attention([newest, context], training=False)
+
+        output, output_state = self.output_lstm_cell(attended[:, 0], [output_h, output_c], training=False)
+
+        state = (*forward_state, *output_state, context)
+        return self._head_outputs(output), state
+
+    @staticmethod
+    def _to_numpy(predictions: dict) -> dict:
+        return {name: value.numpy() for name, value in predictions.items()}
+
+    def prime(self, window: np.ndarray) -> tuple[dict, tuple]:
+        """
+        Обчислює прогноз для повного вікна та початковий стан декодера.
+        Args:
+            window: Батч нормалізованих вікон (batch, SEQ_LENGTH, 3)
+        Returns:
+            tuple: (виходи моделі, стан декодера)
+        """
+        predictions, state = self._prime(tf.cast(window, tf.float32))
+        return self._to_numpy(predictions), state
+
+    def step(self, note: np.ndarray, state: tuple) -> tuple[dict, tuple]:
+        """
+        Обчислює прогноз лише з найновішої ноти, оновлюючи стан декодера.
+        Args:
+            note: Батч нормалізованих нот (batch, 3)
+            state: Стан, повернутий prime або попереднім step
+        Returns:
+            tuple: (виходи моделі, новий стан декодера)
+        """
+        predictions, state = self._step(tf.cast(note, tf.float32), state)
+        return self._to_numpy(predictions), state
+
+
+def measure_step_drift(model: tf.keras.Model, window: np.ndarray, notes: np.ndarray) -> dict:
+    """
+    Порівнює кроки IncrementalDecoder з віконним шляхом, де модель щоразу отримує
+    все вікно з останніми SEQ_LENGTH нотами.
+    Args:
+        model: Модель attention-LSTM
+        window: Батч початкових вікон (batch, SEQ_LENGTH, 3)
+        notes: Ноти, що по черзі додаються до вікна (batch, кроки, 3)
+    Returns:
+        dict: Частка збігів найімовірнішого класу висоти й тривалості за всі кроки
+        та максимальна абсолютна різниця виходів моделі
+    """
+    decoder = IncrementalDecoder(model)
+    windowed = tf.function(lambda inputs: model(inputs, training=False))
+    window = np.asarray(window, dtype=np.float32)
+    notes = np.asarray(notes, dtype=np.float32)
+
+    _, state = decoder.prime(window)
+    matches = {'pitch': 0, 'duration': 0}
+    max_delta = 0.0
+    for t in range(notes.shape[1]):
+        window = np.concatenate([window[:, 1:], notes[:, t:t + 1]], axis=1)
+        predictions, state = decoder.step(notes[:, t], state)
+        expected = {name: value.numpy() for name, value in windowed(window).items()}
+        for name in matches:
+            matches[name] += int((predictions[name].argmax(axis=1) == expected[name].argmax(axis=1)).sum())
+        max_delta = max(max_delta, *(float(np.abs(predictions[name] - expected[name]).max()) for name in OUTPUT_NAMES))
+
+    total = notes.shape[0] * notes.shape[1]
+    return {
+        'pitch_top1': matches['pitch'] / total,
+        'duration_top1': matches['duration'] / total,
+        'max_abs_diff': max_delta,
+    }
@@ -0,0 +1,72 @@
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.layers import LSTM, Add, Attention, BatchNormalization, Bidirectional, Dense, Dropout
+
+from common.constants import SEQ_LENGTH
+from generation.incremental_decoder import IncrementalDecoder, measure_step_drift
+
+
+def build_attention_lstm() -> tf.keras.Model:
+    """Та сама архітектура, що й у ckpt_best.model_lstm_attention_categorical.keras, але менша."""
+    inputs = tf.keras.Input(shape=(SEQ_LENGTH, 3))
+    x = Bidirectional(LSTM(16, return_sequences=True))(inputs)
+    x = BatchNormalization()(x)
+    x = Dropout(0.2)(x)
+    x = Add()([x, Attention()([x, x])])
+    x = LSTM(8)(x)
+    x = BatchNormalization()(x)
+    x = Dropout(0.2)(x)
+    x = Dense(8, activation='relu')(x)
+    x = BatchNormalization()(x)
+    x = Dropout(0.3)(x)
+    outputs = {
+        'pitch': Dense(128, name='pitch')(x),
+        'step': Dense(1, name='step')(x),
+        'duration': Dense(12, name='duration')(x),
+    }
+    model = tf.keras.Model(inputs, outputs)
+
+    rng = np.random.default_rng(1)
+    for layer in model.layers:
+        if isinstance(layer, BatchNormalization):
+            layer.set_weights([w + rng.uniform(0.1, 0.5, w.shape).astype(np.float32) for w in layer.get_weights()])
+    return model
+
+
+def test_prime_matches_windowed_model():
+    model = build_attention_lstm()
+    decoder = IncrementalDecoder(model)
+    window = np.random.default_rng(0).uniform(0, 1, (3, SEQ_LENGTH, 3))
+
+    predictions, _ = decoder.prime(window)
+    expected = model(window.astype(np.float32), training=False)
+
+    for name in ('pitch', 'step', 'duration'):
+        np.testing.assert_allclose(predictions[name], expected[name].numpy(), atol=1e-5)
+
+
+def test_step_keeps_fixed_size_attention_cache():
+    model = build_attention_lstm()
+    decoder = IncrementalDecoder(model)
+    rng = np.random.default_rng(0)
+
+    _, state = decoder.prime(rng.uniform(0, 1, (2, SEQ_LENGTH, 3)))
+    for _ in range(SEQ_LENGTH + 5):
+        predictions, state = decoder.step(rng.uniform(0, 1, (2, 3)), state)
+
+    assert state[-1].shape == (2, SEQ_LENGTH, 32)
+    assert predictions['pitch'].shape == (2, 128)
+    assert all(np.isfinite(value).all() for value in predictions.values())
+
+
+def test_step_drift_is_reported_per_output():
+    # Розходження залежить від ваг, тож перевіряється лише сам вимір, а не його межа
+    model = build_attention_lstm()
+    rng = np.random.default_rng(0)
+
+    drift = measure_step_drift(model, rng.uniform(0, 1, (4, SEQ_LENGTH, 3)), rng.uniform(0, 1, (4, 3, 3)))
+
+    assert set(drift) == {'pitch_top1', 'duration_top1', 'max_abs_diff'}
+    assert 0.0 <= drift['pitch_top1'] <= 1.0
+    assert 0.0 <= drift['duration_top1'] <= 1.0
+    assert np.isfinite(drift['max_abs_diff'])
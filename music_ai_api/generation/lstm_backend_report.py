@@ -0,0 +1,170 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from common.constants import CATEGORICAL_DATASET_PATH, PITCH_VOCAB_SIZE, SEQ_LENGTH
+from generation.incremental_decoder import measure_step_drift
+from generation.lstm_export import QUANTIZATIONS, default_tflite_path, export_tflite
+from generation.lstm_generator import ENGINE_COMPILED, ENGINE_TFLITE, load_inference_model, load_model
+from utils.duration_vocabulary import load_duration_vocabulary
+from utils.metrics import rss_mb
+
+
+def load_windows(
+    count: int,
+    dataset_path: str = CATEGORICAL_DATASET_PATH,
+    seed: int = 0,
+    length: int = SEQ_LENGTH
+) -> np.ndarray:
+    """Випадкові послідовності з length нот тренувального датасету у форматі входу моделі."""
+    notes = pd.read_parquet(dataset_path)
+    class_by_label = {label: index for index, label in enumerate(load_duration_vocabulary())}
+    features = np.stack([
+        notes['pitch'].to_numpy(dtype=np.float32) / PITCH_VOCAB_SIZE,
+        notes['step'].to_numpy(dtype=np.float32),
+        notes['duration'].map(class_by_label).to_numpy(dtype=np.float32),
+    ], axis=1)
+    starts = np.random.default_rng(seed).integers(0, len(features) - length, count)
+    return np.stack([features[start:start + length] for start in starts])
+
+
+def measure_backend(
+    model_path: str,
+    engine: str,
+    tflite_path: str | None,
+    windows: np.ndarray,
+    batch_sizes: tuple,
+    repeats: int
+) -> dict:
+    """Виконується в окремому процесі, щоб пам'ять кожного бекенду вимірювалася окремо."""
+    rss_before = rss_mb()
+    backend = load_inference_model(model_path, engine, tflite_path)
+    outputs = {}
+    for start in range(0, len(windows), 64):
+        for name, value in backend.predict(windows[start:start + 64]).items():
+            outputs.setdefault(name, []).append(value)
+    outputs = {name: np.concatenate(values) for name, values in outputs.items()}
+
+    latency = {}
+    for batch_size in batch_sizes:
+        batch = windows[:batch_size]
+        backend.predict(batch)
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            backend.predict(batch)
+            timings.append((time.perf_counter() - started) * 1000)
+        latency[batch_size] = (float(np.percentile(timings, 50)), float(np.percentile(timings, 95)))
+
+    return {'outputs': outputs, 'latency': latency, 'rss_mb': rss_mb(), 'rss_delta_mb': rss_mb() - rss_before}
+
+
+def _log_softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits.astype(np.float64)
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=1, keepdims=True))
+
+
+def distribution_drift(reference: dict, outputs: dict) -> dict:
+    """
+    Розбіжність вихідних розподілів бекенду з моделлю Keras.
+    Returns:
+        dict: Середня та максимальна KL(Keras || бекенд) для висоти і тривалості,
+        частка збігів найімовірнішого класу та середня абсолютна похибка кроку
+    """
+    drift = {}
+    for head in ('pitch', 'duration'):
+        log_p = _log_softmax(reference[head])
+        log_q = _log_softmax(outputs[head])
+        kl = (np.exp(log_p) * (log_p - log_q)).sum(axis=1)
+        drift[f'{head}_kl_mean'] = float(kl.mean())
+        drift[f'{head}_kl_max'] = float(kl.max())
+        drift[f'{head}_top1'] = float((reference[head].argmax(axis=1) == outputs[head].argmax(axis=1)).mean())
+    drift['step_mae'] = float(np.abs(reference['step'] - outputs['step']).mean())
+    return drift
+
+
+def build_report(
+    model_path: str,
+    tflite_paths: dict,
+    windows: np.ndarray,
+    batch_sizes: tuple = (1, 32),
+    repeats: int = 50
+) -> list[dict]:
+    """Вимірює Keras-модель і кожен TFLite-варіант (назва квантизації → шлях до файлу)."""
+    backends = [('keras', ENGINE_COMPILED, None)] + [
+        (f'tflite-{quantization}', ENGINE_TFLITE, path) for quantization, path in tflite_paths.items()
+    ]
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for name, engine, path in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(
+                measure_backend, model_path, engine, path, windows, batch_sizes, repeats
+            ).result()
+        result['name'] = name
+        result['size_kb'] = os.path.getsize(path or model_path) / 1024
+        results.append(result)
+
+    reference = results[0]['outputs']
+    for result in results:
+        result['drift'] = distribution_drift(reference, result['outputs'])
+    return results
+
+
+def format_report(results: list[dict]) -> str:
+    batch_sizes = list(results[0]['latency'])
+    header = ['бекенд', 'розмір, КБ', 'RSS (+модель), МБ'] + [f'батч {b}: p50/p95, мс' for b in batch_sizes] + [
+        'KL висоти (сер./макс.)', 'top-1 висоти', 'KL тривалості (сер./макс.)', 'top-1 тривалості', 'MAE кроку'
+    ]
+    rows = []
+    for result in results:
+        drift = result['drift']
+        rows.append([
+            result['name'],
+            f"{result['size_kb']:.0f}",
+            f"{result['rss_mb']:.0f} (+{result['rss_delta_mb']:.0f})",
+            *[f'{p50:.2f}/{p95:.2f}' for p50, p95 in result['latency'].values()],
+            f"{drift['pitch_kl_mean']:.2e}/{drift['pitch_kl_max']:.2e}",
+            f"{drift['pitch_top1']:.3f}",
+            f"{drift['duration_kl_mean']:.2e}/{drift['duration_kl_max']:.2e}",
+            f"{drift['duration_top1']:.3f}",
+            f"{drift['step_mae']:.2e}",
+        ])
+    lines = ['| ' + ' | '.join(header) + ' |', '|' + '---|' * len(header)]
+    lines += ['| ' + ' | '.join(row) + ' |' for row in rows]
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Порівняння бекендів інференсу LSTM з моделлю Keras")
+    parser.add_argument('--model', default='models/ckpt_best.model_lstm_attention_categorical.keras')
+    parser.add_argument('--windows', type=int, default=512)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--incremental-steps', type=int, default=0,
+                        help="Скільки кроків експериментального IncrementalDecoder порівняти з віконним шляхом")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        tflite_paths = {}
+        for quantization in QUANTIZATIONS:
+            path = default_tflite_path(args.model, quantization)
+            if not os.path.exists(path):
+                path = os.path.join(export_dir, os.path.basename(path))
+                export_tflite(load_model(args.model), path, quantization)
+            tflite_paths[quantization] = path
+
+        results = build_report(args.model, tflite_paths, load_windows(args.windows), repeats=args.repeats)
+        print(format_report(results))
+
+    if args.incremental_steps:
+        sequences = load_windows(args.windows, length=SEQ_LENGTH + args.incremental_steps)
+        drift = measure_step_drift(load_model(args.model), sequences[:, :SEQ_LENGTH], sequences[:, SEQ_LENGTH:])
+        print(f"\nincremental, {args.incremental_steps} кроків: top-1 висоти {drift['pitch_top1']:.3f}, "
+              f"top-1 тривалості {drift['duration_top1']:.3f}, макс. |Δ| виходів {drift['max_abs_diff']:.2e}")
@@ -0,0 +1,84 @@
+import argparse
+import os
+import tempfile
+
+import tensorflow as tf
+
+from generation.lstm_generator import load_model
+
+QUANTIZATION_NONE = 'none'
+QUANTIZATION_FLOAT16 = 'float16'
+QUANTIZATION_INT8 = 'int8'
+QUANTIZATIONS = (QUANTIZATION_NONE, QUANTIZATION_FLOAT16, QUANTIZATION_INT8)
+
+
+def inference_clone(model: tf.keras.Model) -> tf.keras.Model:
+    """
+    Копія моделі для експорту з тими самими вагами.
+
+    У LSTM вимикається recurrent_dropout (при інференсі він і так не діє) і вмикається
+    розгортання по кроках: TFLite не може перетворити цикл while зі змінними та
+    динамічним батчем, а вікно має фіксовану довжину.
+    """
+    def clone_layer(layer: tf.keras.layers.Layer) -> tf.keras.layers.Layer:
+        config = layer.get_config()
+        if isinstance(layer, tf.keras.layers.Bidirectional):
+            for key in ('layer', 'backward_layer'):
+                if config.get(key):
+                    config[key]['config'].update(recurrent_dropout=0.0, unroll=True)
+        elif isinstance(layer, tf.keras.layers.LSTM):
+            config.update(recurrent_dropout=0.0, unroll=True)
+        return layer.__class__.from_config(config)
+
+    clone = tf.keras.models.clone_model(model, clone_function=clone_layer)
+    clone.set_weights(model.get_weights())
+    return clone
+
+
+def export_tflite(model: tf.keras.Model, out_path: str, quantization: str = QUANTIZATION_NONE) -> int:
+    """
+    Перетворює модель у TFLite з динамічним розміром батчу.
+    Args:
+        model: Модель attention-LSTM
+        out_path: Шлях до файлу .tflite
+        quantization: "none", "float16" (ваги у float16) або "int8" (динамічна int8-квантизація ваг)
+    Returns:
+        int: Розмір моделі в байтах
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Невідомий тип квантизації: {quantization}")
+
+    seq_length, num_features = model.input_shape[1:]
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        inference_clone(model).export(
+            saved_model_dir,
+            format='tf_saved_model',
+            input_signature=[tf.TensorSpec((None, seq_length, num_features), tf.float32)]
+        )
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        if quantization != QUANTIZATION_NONE:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == QUANTIZATION_FLOAT16:
+            converter.target_spec.supported_types = [tf.float16]
+        tflite_model = converter.convert()
+
+    with open(out_path, 'wb') as f:
+        f.write(tflite_model)
+    return len(tflite_model)
+
+
+def default_tflite_path(model_path: str, quantization: str) -> str:
+    suffix = '' if quantization == QUANTIZATION_NONE else f'_{quantization}'
+    return f'{os.path.splitext(model_path)[0]}{suffix}.tflite'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Експорт моделі attention-LSTM у TFLite")
+    parser.add_argument('--model', default='models/ckpt_best.model_lstm_attention_categorical.keras')
+    parser.add_argument('--quantization', choices=QUANTIZATIONS, default=QUANTIZATION_NONE)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    out_path = args.out or default_tflite_path(args.model, args.quantization)
+    size = export_tflite(load_model(args.model), out_path, args.quantization)
+    print(f"Модель збережено у {out_path} ({size / 1024:.0f} КБ)")
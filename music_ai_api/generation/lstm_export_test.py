@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from generation.incremental_decoder_test import build_attention_lstm
+from generation.lstm_export import QUANTIZATIONS, export_tflite
+from generation.lstm_generator import ENGINE_TFLITE, create_inference_model
+
+
+@pytest.mark.parametrize('quantization,atol', zip(QUANTIZATIONS, (1e-5, 1e-2, 5e-2)))
+def test_tflite_backend_matches_keras_for_any_batch_size(tmp_path, quantization, atol):
+    model = build_attention_lstm()
+    path = str(tmp_path / f'model_{quantization}.tflite')
+    export_tflite(model, path, quantization)
+    backend = create_inference_model(model, ENGINE_TFLITE, path)
+
+    rng = np.random.default_rng(0)
+    for batch_size in (1, 5, 2):
+        windows = rng.uniform(0, 1, (batch_size, *model.input_shape[1:])).astype(np.float32)
+        expected = model(windows, training=False)
+        outputs = backend.predict(windows)
+        for name in ('pitch', 'step', 'duration'):
+            np.testing.assert_allclose(outputs[name], np.asarray(expected[name]), atol=atol)
@@ -1,58 +1,98 @@
+import threading
+from typing import Optional, Protocol
+
 import numpy as np
 import tensorflow as tf
 
+from generation.loss_functions import diversity_loss
 
-def predict_next_note(
-    notes: np.ndarray,
-    model: tf.keras.Model,
-    temperature: float = 1.0) -> tuple[int, float, float]:
-  """Generates a note as a tuple of (pitch, step, duration), using a trained sequence model."""
 
-  assert temperature > 0
+ENGINE_PREDICT = 'predict'
+ENGINE_COMPILED = 'compiled'
+ENGINE_TFLITE = 'tflite'
+
+
+class InferenceBackend(Protocol):
+  """Interface of every inference backend: a batch of windows in, named model outputs out."""
+
+  def predict(self, inputs: np.ndarray, verbose: int = 0) -> dict:
+    ...
+
+
+class CompiledStepModel:
+  """Wraps a Keras model into a graph-mode step function that is traced once.
+
+  Exposes the same `predict` interface as `tf.keras.Model`, so it can be used
+  wherever the model is expected, but skips the data adapter and callback setup
+  that `model.predict` repeats on every call.
+  """
+
+  def __init__(self, model: tf.keras.Model):
+    self.model = model
+    seq_length, num_features = model.input_shape[1:]
+    self._step = tf.function(
+        self._forward,
+        input_signature=[tf.TensorSpec((None, seq_length, num_features), tf.float32)])
+    self._step(tf.zeros((1, seq_length, num_features), tf.float32))
+
+  def _forward(self, inputs: tf.Tensor) -> dict:
+    return self.model(inputs, training=False)
 
-  inputs = tf.expand_dims(notes, 0)
+  def predict(self, inputs: np.ndarray, verbose: int = 0) -> dict:
+    outputs = self._step(tf.cast(inputs, tf.float32))
+    return {name: value.numpy() for name, value in outputs.items()}
 
-  predictions = model.predict(inputs)
-  pitch_logits = predictions['pitch']
-  step = predictions['step']
-  duration = predictions['duration']
 
-  pitch_logits /= temperature
-  pitch = tf.random.categorical(pitch_logits, num_samples=1)
-  pitch = tf.squeeze(pitch, axis=-1)
+class TFLiteStepModel:
+  """Runs a model exported by generation.lstm_export with the TFLite interpreter.
 
-  duration = tf.squeeze(duration, axis=-1)
-  step = tf.squeeze(step, axis=-1)
+  The exported model keeps a dynamic batch dimension; the interpreter resizes its
+  tensors when the batch size changes. Calls are serialized because the
+  interpreter is not thread-safe.
+  """
 
-  step = tf.maximum(0, step)
-  duration = tf.maximum(0, duration)
+  def __init__(self, model_path: str, num_threads: Optional[int] = None):
+    self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+    self._runner = self.interpreter.get_signature_runner()
+    self._input_name = self._runner.get_input_details().popitem()[0]
+    self._lock = threading.Lock()
 
-  return int(pitch), float(step), float(duration)
+  def predict(self, inputs: np.ndarray, verbose: int = 0) -> dict:
+    inputs = np.asarray(inputs, dtype=np.float32)
+    with self._lock:
+      outputs = self._runner(**{self._input_name: inputs})
+      return {name: np.array(value) for name, value in outputs.items()}
 
 
-def predict_next_note_categorical(
-    notes: np.ndarray,
+def create_inference_model(
     model: tf.keras.Model,
-    temperature: float = 1.0) -> tuple[int, float, float]:
-  """Generates a note as a tuple of (pitch, step, duration), using a trained sequence model."""
+    engine: str = ENGINE_COMPILED,
+    tflite_path: Optional[str] = None,
+    num_threads: Optional[int] = None) -> InferenceBackend:
+  """Returns the backend used for per-step inference in the generation loop."""
 
-  assert temperature > 0
+  if engine == ENGINE_PREDICT:
+    return model
+  if engine == ENGINE_COMPILED:
+    return CompiledStepModel(model)
+  if engine == ENGINE_TFLITE:
+    return TFLiteStepModel(tflite_path, num_threads)
+  raise ValueError(f'Unknown inference engine: {engine}')
 
-  inputs = tf.expand_dims(notes, 0)
 
-  predictions = model.predict(inputs)
-  pitch_logits = predictions['pitch']
-  step = predictions['step']
-  duration_logits = predictions['duration']
+def load_model(model_path: str) -> tf.keras.Model:
+  """Loads the trained attention-LSTM with its custom loss."""
 
-  pitch_logits /= temperature
-  pitch = tf.random.categorical(pitch_logits, num_samples=1)
-  pitch = tf.squeeze(pitch, axis=-1)
+  return tf.keras.models.load_model(model_path, custom_objects={'diversity_loss': diversity_loss})
 
-  duration = tf.random.categorical(duration_logits, num_samples=1)
-  duration = tf.squeeze(duration, axis=-1)
 
-  step = tf.squeeze(step, axis=-1)
-  step = tf.maximum(0, step)
+def load_inference_model(
+    model_path: str,
+    engine: str = ENGINE_COMPILED,
+    tflite_path: Optional[str] = None,
+    num_threads: Optional[int] = None) -> InferenceBackend:
+  """Loads the backend for inference; used as the loader of model worker processes."""
 
-  return int(pitch), float(step), float(duration)
\ No newline at end of file
+  if engine == ENGINE_TFLITE:
+    return TFLiteStepModel(tflite_path, num_threads)
+  return create_inference_model(load_model(model_path), engine)
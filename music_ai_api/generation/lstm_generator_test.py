@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from common.constants import SEQ_LENGTH, valid_durations
+from generation.generation_session import GenerationSession, advance_sessions
+from generation.lstm_generator import (
+    ENGINE_COMPILED,
+    ENGINE_PREDICT,
+    create_inference_model,
+)
+from generation.note_window import NoteWindow
+from utils.midi_utils_v2 import get_duration_table
+
+
+def build_model() -> tf.keras.Model:
+    inputs = tf.keras.Input(shape=(SEQ_LENGTH, 3))
+    x = tf.keras.layers.LSTM(16)(inputs)
+    outputs = {
+        'pitch': tf.keras.layers.Dense(128, name='pitch')(x),
+        'step': tf.keras.layers.Dense(1, name='step')(x),
+        'duration': tf.keras.layers.Dense(len(valid_durations), name='duration')(x),
+    }
+    return tf.keras.Model(inputs, outputs)
+
+
+def generate(inference_model, notes, steps=5):
+    window = NoteWindow(SEQ_LENGTH)
+    window.fill(*notes.T)
+    duration_table = get_duration_table(120, tuple(sorted(valid_durations.values())))
+    session = GenerationSession(window, steps, 0.8, 120, duration_table, 60.0, np.random.default_rng(7))
+    while not session.done:
+        advance_sessions([session], inference_model.predict(session.input_notes[np.newaxis]))
+    return session.generated_notes
+
+
+def test_compiled_engine_matches_predict_for_fixed_seed():
+    model = build_model()
+    notes = np.random.default_rng(0).uniform(0, 1, (SEQ_LENGTH, 3))
+
+    predict_notes = generate(create_inference_model(model, ENGINE_PREDICT), notes)
+    compiled_notes = generate(create_inference_model(model, ENGINE_COMPILED), notes)
+
+    assert compiled_notes == predict_notes
+
+
+def test_incremental_decoder_is_not_a_serving_engine():
+    # IncrementalDecoder лише наближує віконний шлях і лишається офлайн-експериментом
+    with pytest.raises(ValueError, match='Unknown inference engine'):
+        create_inference_model(build_model(), 'incremental')
@@ -0,0 +1,240 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable
+
+import numpy as np
+
+from common.runtime_config import configure_pool_worker, thread_budget
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MIN_SEGMENT_SIZE = 1 << 20
+ALIGNMENT = 64
+
+_pools = []
+_pools_lock = threading.Lock()
+# Порядковий номер процесу моделі серед усіх пулів, за яким йому відводяться ядра
+_worker_slots = itertools.count()
+
+
+class WorkerCrashed(RuntimeError):
+    """Процес моделі завершився під час обробки завдання."""
+
+
+def _aligned(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def _serve(predictor, message: tuple, segments: dict) -> tuple:
+    """Обробляє одне завдання: вхід читається зі спільної пам'яті, виходи записуються туди ж."""
+    input_name, shape, dtype, output_name, output_size = message
+    for name in (input_name, output_name):
+        if name not in segments:
+            segments[name] = SharedMemory(name=name)
+
+    inputs = np.ndarray(shape, dtype, buffer=segments[input_name].buf)
+    outputs = {name: np.ascontiguousarray(value) for name, value in predictor.predict(inputs).items()}
+
+    layout, offset = [], 0
+    for name, value in outputs.items():
+        layout.append((name, value.shape, value.dtype.str, offset))
+        offset += _aligned(value.nbytes)
+    if offset > output_size:
+        return 'grow', offset
+
+    buffer = segments[output_name].buf
+    for (name, shape, dtype, start), value in zip(layout, outputs.values()):
+        np.ndarray(shape, dtype, buffer=buffer, offset=start)[...] = value
+    return 'ok', layout
+
+
+def _worker_main(loader: Callable, loader_args: tuple, conn, threads: int, cpus: list[int] | None) -> None:
+    """Точка входу процесу: завантажує модель один раз і виконує завдання з каналу."""
+    configure_pool_worker(threads, cpus)
+    predictor = loader(*loader_args)
+    conn.send(('ready', None))
+    segments = {}
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        # Клієнт замінює сегменти, коли їм бракує місця; старі більше не знадобляться
+        for name in [name for name in segments if name not in (message[0], message[3])]:
+            segments.pop(name).close()
+        try:
+            conn.send(_serve(predictor, message, segments))
+        except Exception as e:
+            conn.send(('error', f'{type(e).__name__}: {e}'))
+    for segment in segments.values():
+        segment.close()
+
+
+class _Worker:
+    """Процес моделі разом з його каналом і сегментами спільної пам'яті для входу та виходів."""
+
+    def __init__(self, context, name: str, loader: Callable, loader_args: tuple):
+        self.context = context
+        self.name = name
+        self.loader = loader
+        self.loader_args = loader_args
+        self.input = None
+        self.output = None
+        self.cpus = thread_budget.pool_worker_cpus(next(_worker_slots))
+        self.start()
+
+    def start(self) -> None:
+        self.conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_worker_main,
+            args=(self.loader, self.loader_args, child_conn, thread_budget.pool_worker_threads, self.cpus),
+            name=self.name,
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def restart(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.start()
+
+    def _recv(self) -> tuple:
+        try:
+            while not self.conn.poll(0.1):
+                if not self.process.is_alive():
+                    raise WorkerCrashed(f"{self.name} завершився з кодом {self.process.exitcode}")
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.process.join(timeout=1)
+            raise WorkerCrashed(f"{self.name} закрив канал (код завершення {self.process.exitcode})") from e
+
+    @staticmethod
+    def _ensure_segment(segment: SharedMemory | None, size: int) -> SharedMemory:
+        if segment is not None and segment.size >= size:
+            return segment
+        new_size = max(size, MIN_SEGMENT_SIZE, 2 * segment.size if segment is not None else 0)
+        if segment is not None:
+            segment.close()
+            segment.unlink()
+        return SharedMemory(create=True, size=new_size)
+
+    def call(self, inputs: np.ndarray) -> dict:
+        if not self.ready:
+            status, _ = self._recv()
+            self.ready = status == 'ready'
+        inputs = np.ascontiguousarray(inputs)
+        self.input = self._ensure_segment(self.input, inputs.nbytes)
+        self.output = self._ensure_segment(self.output, 0)
+        np.ndarray(inputs.shape, inputs.dtype, buffer=self.input.buf)[...] = inputs
+
+        while True:
+            try:
+                self.conn.send((self.input.name, inputs.shape, inputs.dtype.str, self.output.name, self.output.size))
+            except OSError as e:
+                raise WorkerCrashed(f"{self.name} закрив канал: {e}") from e
+            status, payload = self._recv()
+            if status == 'grow':
+                self.output = self._ensure_segment(self.output, payload)
+                continue
+            if status == 'error':
+                raise RuntimeError(f"Помилка в процесі {self.name}: {payload}")
+            return {
+                name: np.ndarray(shape, dtype, buffer=self.output.buf, offset=offset).copy()
+                for name, shape, dtype, offset in payload
+            }
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        for segment in (self.input, self.output):
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+        self.input = self.output = None
+
+
+class ModelWorkerPool:
+    """
+    Пул окремих процесів, кожен з яких один раз завантажує модель і виконує прямі проходи.
+
+    Має той самий інтерфейс predict(inputs), що й моделі в процесі API, тому його можна
+    передати будь-де замість моделі. Обчислення моделі не тримає GIL процесу API, а масиви
+    передаються через спільну пам'ять, тож каналом ідуть лише форми й назви сегментів.
+    Процес, що аварійно завершився, перезапускається, а завдання повторюється один раз.
+    """
+
+    def __init__(self, name: str, loader: Callable, loader_args: tuple, num_workers: int):
+        """
+        Args:
+            name: Назва сімейства моделей (для логів і назв процесів)
+            loader: Функція верхнього рівня модуля, що повертає об'єкт з методом predict
+            loader_args: Аргументи для loader
+            num_workers: Кількість процесів
+        """
+        if num_workers < 1:
+            raise ValueError("Пул моделей потребує хоча б одного процесу")
+        context = multiprocessing.get_context('spawn')
+        self.name = name
+        self._workers = [
+            _Worker(context, f'{name}-worker-{index}', loader, loader_args)
+            for index in range(num_workers)
+        ]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        with _pools_lock:
+            _pools.append(self)
+        logger.info(f"Запущено {num_workers} процес(ів) моделі {name}")
+
+    def predict(self, inputs: np.ndarray, verbose: int = 0) -> dict:
+        """
+        Виконує прямий прохід у вільному процесі.
+        Args:
+            inputs: Вхідний батч
+        Returns:
+            dict: Виходи моделі за назвами
+        """
+        worker = self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    return worker.call(inputs)
+                except WorkerCrashed as e:
+                    logger.error(f"Процес моделі аварійно завершився ({e}), перезапускаємо")
+                    worker.restart()
+                    if attempt:
+                        raise
+        finally:
+            self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.stop()
+        with _pools_lock:
+            if self in _pools:
+                _pools.remove(self)
+
+
+def shutdown_pools() -> None:
+    """Зупиняє всі запущені пули моделей."""
+    with _pools_lock:
+        pools = list(_pools)
+    for pool in pools:
+        pool.shutdown()
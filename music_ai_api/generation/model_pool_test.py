@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from common.runtime_config import thread_budget
+from generation.model_pool import ModelWorkerPool, WorkerCrashed
+
+
+class EchoModel:
+    def __init__(self, scale):
+        self.scale = scale
+
+    def predict(self, inputs):
+        if inputs.min() < 0:
+            os._exit(1)
+        if inputs.max() > 1000:
+            raise ValueError('too large')
+        return {
+            'scaled': inputs * self.scale,
+            'pid': np.array([os.getpid()]),
+            'wide': np.repeat(inputs.astype(np.float64), 4, axis=-1),
+        }
+
+
+def load_echo_model(scale):
+    return EchoModel(scale)
+
+
+@pytest.fixture
+def pool():
+    pool = ModelWorkerPool('echo', load_echo_model, (2.0,), num_workers=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_outputs_round_trip_through_shared_memory(pool):
+    inputs = np.arange(6 * 50 * 3, dtype=np.float32).reshape(6, 50, 3) / 1000
+    outputs = pool.predict(inputs)
+
+    np.testing.assert_array_equal(outputs['scaled'], inputs * 2)
+    assert outputs['wide'].shape == (6, 50, 12)
+
+    large = np.ones((2000, 50, 3), dtype=np.float32)
+    assert pool.predict(large)['wide'].shape == (2000, 50, 12)
+
+
+def test_model_errors_are_raised_without_restart(pool):
+    pid = pool.predict(np.zeros((1, 3), dtype=np.float32))['pid'][0]
+    with pytest.raises(RuntimeError, match='too large'):
+        pool.predict(np.full((1, 3), 2000, dtype=np.float32))
+    assert pool.predict(np.zeros((1, 3), dtype=np.float32))['pid'][0] == pid
+
+
+def test_crashed_worker_is_restarted(pool):
+    pid = pool.predict(np.zeros((1, 3), dtype=np.float32))['pid'][0]
+    with pytest.raises(WorkerCrashed):
+        pool.predict(np.full((1, 3), -1, dtype=np.float32))
+
+    outputs = pool.predict(np.ones((1, 3), dtype=np.float32))
+    assert outputs['pid'][0] != pid
+    np.testing.assert_array_equal(outputs['scaled'], np.full((1, 3), 2))
+
+
+
+class ThreadsModel:
+    def predict(self, inputs):
+        return {'threads': np.array([torch.get_num_threads()])}
+
+
+def load_threads_model():
+    return ThreadsModel()
+
+
+def test_worker_uses_pool_thread_budget(monkeypatch):
+    monkeypatch.setattr(thread_budget, 'pool_worker_threads', 3)
+
+    pool = ModelWorkerPool('threads', load_threads_model, (), num_workers=1)
+    try:
+        assert pool.predict(np.zeros((1, 1), dtype=np.float32))['threads'][0] == 3
+    finally:
+        pool.shutdown()
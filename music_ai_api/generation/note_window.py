@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class NoteWindow:
+    """
+    Кільцевий буфер вхідного вікна моделі з попередньо виділеною пам'яттю.
+
+    Буфер має подвійну довжину, і кожна нота записується в обидві половини, тому
+    поточне вікно завжди є суцільним зрізом (view) без копіювання, а крок генерації
+    не виділяє нової пам'яті.
+    """
+
+    def __init__(self, length: int, num_features: int = 3, dtype: np.dtype = np.float32):
+        """
+        Args:
+            length: Довжина вікна (SEQ_LENGTH)
+            num_features: Кількість ознак ноти
+            dtype: Тип даних буфера (збігається з типом входу моделі)
+        """
+        self.length = length
+        self._buffer = np.zeros((2 * length, num_features), dtype=dtype)
+        self._head = 0
+
+    def fill(self, *columns: np.ndarray) -> None:
+        """Заповнює вікно стовпцями ознак довжини `length` (від найстарішої ноти до найновішої)."""
+        for feature, column in enumerate(columns):
+            self._buffer[:self.length, feature] = column
+        self._buffer[self.length:] = self._buffer[:self.length]
+        self._head = 0
+
+    def push(self, *features: float) -> None:
+        """Витісняє найстарішу ноту і додає нову в кінець вікна."""
+        head = self._head
+        mirror = head + self.length
+        for feature, value in enumerate(features):
+            self._buffer[head, feature] = value
+            self._buffer[mirror, feature] = value
+        self._head = head + 1 if head + 1 < self.length else 0
+
+    def copy(self) -> 'NoteWindow':
+        """Незалежна копія вікна з тим самим вмістом."""
+        window = NoteWindow(self.length, self._buffer.shape[1], self._buffer.dtype)
+        window._buffer[:] = self._buffer
+        window._head = self._head
+        return window
+
+    @property
+    def view(self) -> np.ndarray:
+        """Поточне вікно (length, num_features) як суцільний зріз буфера."""
+        return self._buffer[self._head:self._head + self.length]
@@ -0,0 +1,29 @@
+import numpy as np
+
+from generation.note_window import NoteWindow
+
+
+def test_push_matches_delete_and_append():
+    rng = np.random.default_rng(0)
+    notes = rng.uniform(0, 1, (5, 3))
+    window = NoteWindow(5, dtype=np.float64)
+    window.fill(notes[:, 0], notes[:, 1], notes[:, 2])
+
+    expected = notes
+    for _ in range(12):
+        next_note = rng.uniform(0, 1, 3)
+        window.push(*next_note)
+        expected = np.append(np.delete(expected, 0, axis=0), next_note[np.newaxis], axis=0)
+
+        np.testing.assert_array_equal(window.view, expected)
+
+
+def test_view_is_contiguous_and_shares_memory():
+    window = NoteWindow(4)
+    window.fill(np.arange(4), np.arange(4), np.arange(4))
+    for value in range(6):
+        window.push(value, value, value)
+        view = window.view
+
+        assert view.flags['C_CONTIGUOUS']
+        assert np.shares_memory(view, window._buffer)
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def sample_categorical(
+    logits: np.ndarray,
+    uniforms: np.ndarray,
+    temperature: np.ndarray | float = 1.0,
+    top_k: np.ndarray | int = 0,
+    top_p: np.ndarray | float = 1.0
+) -> np.ndarray:
+    """
+    Векторизований семплінг категорій з логітів для всього батчу.
+
+    Випадковість задається ззовні рівномірними числами (по одному на рядок), тому кожен
+    рядок може мати власний numpy.random.Generator, а результат не залежить від складу батчу.
+    Args:
+        logits: Логіти моделі (batch, vocab)
+        uniforms: Рівномірні числа з [0, 1) для кожного рядка (batch,)
+        temperature: Температура для кожного рядка або спільна
+        top_k: Скільки найімовірніших категорій залишити (0 — без обмеження)
+        top_p: Поріг сумарної ймовірності для nucleus-семплінгу (1.0 — без обмеження)
+    Returns:
+        np.ndarray: Індекси вибраних категорій (batch,)
+    """
+    batch_size, vocab_size = logits.shape
+    temperature = np.broadcast_to(np.asarray(temperature, dtype=np.float64), (batch_size,))
+    top_k = np.broadcast_to(np.asarray(top_k, dtype=np.int64), (batch_size,))
+    top_p = np.broadcast_to(np.asarray(top_p, dtype=np.float64), (batch_size,))
+
+    scaled = logits.astype(np.float64) / temperature[:, np.newaxis]
+    order = np.argsort(-scaled, axis=1, kind='stable')
+    sorted_logits = np.take_along_axis(scaled, order, axis=1)
+
+    probs = np.exp(sorted_logits - sorted_logits[:, :1])
+    probs /= probs.sum(axis=1, keepdims=True)
+
+    ranks = np.arange(vocab_size)[np.newaxis, :]
+    keep = (top_k[:, np.newaxis] <= 0) | (ranks < top_k[:, np.newaxis])
+    # Найімовірніша категорія залишається завжди, бо перед нею сумарна ймовірність нульова
+    keep &= (np.cumsum(probs, axis=1) - probs) < top_p[:, np.newaxis]
+    probs = np.where(keep, probs, 0.0)
+
+    cumulative = np.cumsum(probs, axis=1)
+    thresholds = uniforms * cumulative[:, -1]
+    sorted_index = np.minimum((cumulative <= thresholds[:, np.newaxis]).sum(axis=1), vocab_size - 1)
+    return order[np.arange(batch_size), sorted_index]
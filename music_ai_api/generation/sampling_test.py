@@ -0,0 +1,42 @@
+import numpy as np
+
+from generation.sampling import sample_categorical
+
+
+def test_top_k_one_and_small_top_p_pick_argmax():
+    rng = np.random.default_rng(0)
+    logits = rng.normal(size=(64, 128))
+    uniforms = rng.random(64)
+
+    assert sample_categorical(logits, uniforms, top_k=1).tolist() == logits.argmax(axis=1).tolist()
+    assert sample_categorical(logits, uniforms, top_p=1e-6).tolist() == logits.argmax(axis=1).tolist()
+
+
+def test_top_k_restricts_to_most_probable_categories():
+    rng = np.random.default_rng(1)
+    logits = rng.normal(size=(1, 128)).repeat(2000, axis=0)
+
+    samples = sample_categorical(logits, rng.random(2000), temperature=2.0, top_k=5)
+
+    assert set(samples.tolist()) <= set(np.argsort(-logits[0])[:5].tolist())
+
+
+def test_sampling_follows_softmax_distribution():
+    logits = np.log(np.array([[0.1, 0.2, 0.7]])).repeat(20000, axis=0)
+    samples = sample_categorical(logits, np.random.default_rng(2).random(20000))
+
+    frequencies = np.bincount(samples, minlength=3) / len(samples)
+    np.testing.assert_allclose(frequencies, [0.1, 0.2, 0.7], atol=0.02)
+
+
+def test_per_row_parameters_are_independent():
+    logits = np.random.default_rng(3).normal(size=(3, 128))
+    uniforms = np.array([0.3, 0.6, 0.9])
+
+    batched = sample_categorical(logits, uniforms, temperature=[0.5, 1.0, 1.5], top_k=[0, 10, 3], top_p=[1.0, 0.9, 1.0])
+    rows = [
+        sample_categorical(logits[i:i + 1], uniforms[i:i + 1], temperature=t, top_k=k, top_p=p)[0]
+        for i, (t, k, p) in enumerate([(0.5, 0, 1.0), (1.0, 10, 0.9), (1.5, 3, 1.0)])
+    ]
+
+    assert batched.tolist() == rows
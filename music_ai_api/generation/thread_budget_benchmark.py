@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Бюджет потоків задається змінними середовища окремого процесу для кожного налаштування
+SETTINGS = {
+    # Поведінка без бюджету: кожен фреймворк і BLAS займають усі ядра
+    'unbounded': lambda cpus: {
+        'TORCH_NUM_THREADS': cpus, 'TF_INTRA_OP_THREADS': cpus, 'TF_INTER_OP_THREADS': cpus, 'BLAS_NUM_THREADS': cpus,
+    },
+    'budget': lambda cpus: {},
+    'budget-executor-2': lambda cpus: {'EXECUTOR_WORKERS': 2},
+    'budget-executor-8': lambda cpus: {'EXECUTOR_WORKERS': 8},
+    'single-thread': lambda cpus: {
+        'TORCH_NUM_THREADS': 1, 'TF_INTRA_OP_THREADS': 1, 'TF_INTER_OP_THREADS': 1, 'BLAS_NUM_THREADS': 1,
+    },
+}
+
+
+def run_workload(ffn_model_path: str, lstm_model_path: str, requests: int, melody_length: int, lstm_steps: int) -> dict:
+    """
+    Змішане навантаження в межах одного процесу: половина запитів гармонізує мелодію,
+    половина виконує кроки декодування LSTM; запити обробляє EXECUTOR.
+    """
+    from common.runtime_config import configure_process, thread_budget
+    configure_process(thread_budget)
+
+    import numpy as np
+    import torch
+
+    from common.constants import EXECUTOR, SEQ_LENGTH
+    from generation.ffn_generator.ffn_export import load_inference_network
+    from generation.ffn_generator.forward_network import SOPRANO_CLASSES, ForwardNetwork
+    from generation.ffn_generator.network_harmony_generator import NetworkHarmonyGenerator
+    from generation.lstm_generator import create_inference_model, load_model
+
+    if os.path.exists(ffn_model_path):
+        network = load_inference_network(ffn_model_path, torch.device('cpu'))
+    else:
+        network = ForwardNetwork().eval()
+    if os.path.exists(lstm_model_path):
+        lstm_model = load_model(lstm_model_path)
+    else:
+        from generation.incremental_decoder_test import build_attention_lstm
+        lstm_model = build_attention_lstm()
+    lstm_backend = create_inference_model(lstm_model)
+
+    rng = np.random.default_rng(0)
+    melody = torch.from_numpy(rng.integers(0, SOPRANO_CLASSES, melody_length, dtype=np.uint8))
+    window = rng.uniform(0, 1, (1, SEQ_LENGTH, 3)).astype(np.float32)
+
+    def harmonize():
+        started = time.perf_counter()
+        NetworkHarmonyGenerator(network).generate_song_harmony(melody)
+        return 'ffn', time.perf_counter() - started
+
+    def generate():
+        started = time.perf_counter()
+        for _ in range(lstm_steps):
+            lstm_backend.predict(window)
+        return 'lstm', time.perf_counter() - started
+
+    harmonize()
+    generate()
+
+    started = time.perf_counter()
+    futures = [EXECUTOR.submit(harmonize if index % 2 == 0 else generate) for index in range(requests)]
+    timings = {'ffn': [], 'lstm': []}
+    for future in futures:
+        kind, seconds = future.result()
+        timings[kind].append(seconds * 1000)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'budget': repr(thread_budget),
+        'throughput': requests / elapsed,
+        'latency': {
+            kind: (float(np.percentile(values, 50)), float(np.percentile(values, 95)))
+            for kind, values in timings.items()
+        },
+    }
+
+
+def run_setting(name: str, overrides: dict, args: argparse.Namespace) -> dict:
+    env = dict(os.environ)
+    env.update({key: str(value) for key, value in overrides.items()})
+    command = [
+        sys.executable, '-m', 'generation.thread_budget_benchmark', '--child',
+        '--ffn-model', args.ffn_model, '--lstm-model', args.lstm_model, '--requests', str(args.requests),
+        '--melody-length', str(args.melody_length), '--lstm-steps', str(args.lstm_steps),
+    ]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['name'] = name
+    return result
+
+
+def format_report(results: list[dict]) -> str:
+    lines = [
+        '| налаштування | запитів/с | FFN p50/p95, мс | LSTM p50/p95, мс | бюджет |',
+        '|---|---|---|---|---|',
+    ]
+    for result in results:
+        ffn, lstm = result['latency']['ffn'], result['latency']['lstm']
+        lines.append(
+            f"| {result['name']} | {result['throughput']:.1f} | {ffn[0]:.0f}/{ffn[1]:.0f} | "
+            f"{lstm[0]:.0f}/{lstm[1]:.0f} | {result['budget']} |"
+        )
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Пропускна здатність API за різних бюджетів потоків CPU")
+    parser.add_argument('--ffn-model', default='models/best_model_new.pth')
+    parser.add_argument('--lstm-model', default='models/ckpt_best.model_lstm_attention_categorical.keras')
+    parser.add_argument('--settings', nargs='*', choices=list(SETTINGS), default=list(SETTINGS))
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--melody-length', type=int, default=1024)
+    parser.add_argument('--lstm-steps', type=int, default=32)
+    parser.add_argument('--unbounded-threads', type=int, help="Розмір пулів для 'unbounded' (за замовчуванням — кількість ядер)")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_workload(args.ffn_model, args.lstm_model, args.requests, args.melody_length, args.lstm_steps)
+        print(json.dumps(result))
+    else:
+        cpus = args.unbounded_threads or (
+            len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        )
+        results = [run_setting(name, SETTINGS[name](cpus), args) for name in args.settings]
+        print(format_report(results))
@@ -1,3 +1,7 @@
+# Бюджет потоків застосовується до імпорту numpy, TensorFlow і PyTorch
+from common.runtime_config import configure_process
+configure_process()
+
 from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import APIRouter, FastAPI, BackgroundTasks, File, HTTPException, UploadFile
@@ -5,7 +9,10 @@ from fastapi.middleware.cors import CORSMiddleware
 import httpx
 from common.constants import FILE_NOT_FOUND, EXECUTOR
 from dto.response.generate_response import GenerateResponse
-from routers import ffn, lstm_v2
+from routers import ffn, jobs, lstm_v2
+from generation.model_pool import shutdown_pools
+from utils.jobs import job_runner
+from utils.metrics import metrics
 import os
 from fastapi.responses import FileResponse, StreamingResponse
 from datetime import datetime
@@ -23,7 +30,10 @@ logger = setup_logger(__name__)
 async def lifespan(app: FastAPI):
     await asyncio.to_thread(clean_old_files)
     yield
+    job_runner.shutdown()
+    lstm_v2.batch_scheduler.shutdown()
     EXECUTOR.shutdown(wait=True)
+    shutdown_pools()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -106,8 +116,13 @@ async def preview_midi(filename: str):
             headers={"Content-Disposition": f'inline; filename="{filename}"'}
         )
     
+@apirouter.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
 apirouter.include_router(lstm_v2.router, prefix="/v2/lstm", tags=["LSTM_v2"])
 apirouter.include_router(ffn.router, prefix="/ffn", tags=["FFN"])
+apirouter.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
 
 app.include_router(apirouter, prefix="/api", tags=["API"])
 
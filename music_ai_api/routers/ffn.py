@@ -1,19 +1,46 @@
 import asyncio
-from fastapi import APIRouter, File, HTTPException, UploadFile
+import io
+import json
+import zipfile
+from typing import Callable
+from fastapi import APIRouter, File, HTTPException, Request, Response, UploadFile
 import torch
 import os
 from datetime import datetime
 
+from dto.response.batch_harmonize_response import BatchHarmonizeResponse, HarmonizedFile
 from dto.response.generate_response import GenerateResponse
-from common.constants import EXECUTOR
+from common.constants import (
+    EXECUTOR,
+    FFN_BATCH_MAX_ARCHIVE_BYTES,
+    FFN_BATCH_MAX_FILES,
+    FFN_INFERENCE_ENGINE,
+    FFN_POOL_WORKERS,
+    FFN_QUANTIZATION,
+    GENERATION_DEADLINE_SECONDS,
+    DISCONNECT_POLL_INTERVAL_SECONDS
+)
 import utils.ffn_utils.midi_generator as midi_generator
 import utils.ffn_utils.dataset_note_info_generator as note_generator
-import utils.ffn_utils.constants as constants
 
-from utils.ffn_utils.data_midi_loader import load_custom_midi_data
-from generation.ffn_generator.forward_network import ForwardNetwork
+from utils.ffn_utils.data_midi_loader import (
+    EmptyMelody,
+    TooManyFiles,
+    UploadTooLarge,
+    is_midi_filename,
+    load_soprano_melody,
+    read_midi_archive,
+    read_midi_upload
+)
+from generation.ffn_generator.ffn_export import load_inference_network
+from generation.ffn_generator.pooled_network import PooledForwardNetwork
 from generation.ffn_generator.network_harmony_generator import NetworkHarmonyGenerator
+from generation.cancellation import CANCEL_STATUS_CODES, CancellationToken, GenerationCancelled, cancel_on_disconnect
 from utils.logger import setup_logger
+from utils.result_cache import make_cache_key, result_cache
+from utils.jobs import job_runner
+from utils.metrics import metrics
+from routers.jobs import submit_job
 
 logger = setup_logger(__name__)
 
@@ -22,46 +49,368 @@ router = APIRouter()
 use_cuda = torch.cuda.is_available()
 device = torch.device("cuda" if use_cuda else "cpu")
 
-network = ForwardNetwork().to(device)
-network.load_state_dict(torch.load('models/best_model_new.pth', map_location=device))
-network.eval()
+MODEL_PATH = 'models/best_model_new.pth'
+
+# Прямі проходи гармонізації виконуються в окремих процесах, якщо FFN_POOL_WORKERS > 0;
+# тоді мережа в процесі API не завантажується
+if FFN_POOL_WORKERS > 0:
+    harmony_network = PooledForwardNetwork(MODEL_PATH, FFN_POOL_WORKERS)
+else:
+    harmony_network = load_inference_network(MODEL_PATH, device)
 
 @router.post("/harmonize")
-async def harmonize_midi(file: UploadFile = File(...)):
+async def harmonize_midi(http_request: Request, file: UploadFile = File(...)):
     logger.info(f"Запит на гармонізацію файлу: {file.filename}")
+    token = CancellationToken(GENERATION_DEADLINE_SECONDS)
     try:
-        if not file.filename.endswith(".mid"):
+        if not is_midi_filename(file.filename):
             logger.warning(f"Спроба завантажити файл з неправильним розширенням: {file.filename}")
             raise HTTPException(status_code=400, detail="Дозволені лише MIDI-файли")
-        output_filename = await asyncio.get_event_loop().run_in_executor(
-            EXECUTOR, 
-            harmonize_melody, 
-            file
-        )
+        async with cancel_on_disconnect(http_request, token, DISCONNECT_POLL_INTERVAL_SECONDS):
+            output_filename = await asyncio.get_event_loop().run_in_executor(
+                EXECUTOR, 
+                harmonize_melody, 
+                file,
+                token
+            )
         logger.info(f"Гармонізація завершена. Файл: {output_filename}")
         return GenerateResponse(message="Мелодію успішно гармонізовано", midi_file=output_filename).model_dump()
     
     except HTTPException as he:
         raise he
+    except UploadTooLarge as e:
+        logger.warning(f"Завеликий файл для гармонізації: {file.filename}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except EmptyMelody as e:
+        logger.warning(f"Файл без нот для гармонізації: {file.filename}")
+        raise HTTPException(status_code=422, detail=str(e))
+    except GenerationCancelled as e:
+        metrics.increment(f'ffn_cancelled_{e.reason}')
+        logger.info(f"Гармонізацію скасовано: {e.reason}")
+        raise HTTPException(status_code=CANCEL_STATUS_CODES[e.reason], detail=str(e))
     except Exception as e:
         error_msg = f"Помилка під час гармонізації: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
-def harmonize_melody(file: UploadFile = File(...)):
-    logger.debug(f'Ініціалізація генерації гармонії для {file.filename}')
-    harmony_generator = NetworkHarmonyGenerator(network)
-    _, val_dataset = load_custom_midi_data(file)
-    (x_soprano_sample, _, _, _) = val_dataset[:constants.BATCH_SIZE]
-        
-    logger.debug('Генерація гармонії...')
-    generated_song = harmony_generator.generate_harmony(x_soprano_sample)
-    generated_note_infos = note_generator.generate_note_info(generated_song)
-        
+def run_harmonize_job(payload: dict, report_progress: Callable[[int, int], None]) -> dict:
+    """
+    Виконує завдання гармонізації з черги; прямі проходи йдуть через EXECUTOR, як і в /harmonize.
+    Returns:
+        dict: Відповідь у форматі GenerateResponse
+    """
+    report_progress(0, 1)
+    try:
+        output_filename = EXECUTOR.submit(
+            harmonize_bytes,
+            payload['data'],
+            payload['filename'],
+            CancellationToken(GENERATION_DEADLINE_SECONDS)
+        ).result()
+    except GenerationCancelled as e:
+        metrics.increment(f'ffn_cancelled_{e.reason}')
+        raise
+    report_progress(1, 1)
+    logger.info(f"Гармонізація завершена. Файл: {output_filename}")
+    return GenerateResponse(message="Мелодію успішно гармонізовано", midi_file=output_filename).model_dump()
+
+job_runner.register('ffn_harmonize', run_harmonize_job)
+
+@router.post("/jobs", status_code=202)
+async def submit_harmonize_job(file: UploadFile = File(...)):
+    """
+    Ставить гармонізацію в чергу і одразу повертає ідентифікатор завдання.
+    Стан і результат доступні через GET /jobs/{job_id}.
+    """
+    logger.info(f"Отримано завдання на гармонізацію файлу: {file.filename}")
+    if not is_midi_filename(file.filename):
+        logger.warning(f"Спроба завантажити файл з неправильним розширенням: {file.filename}")
+        raise HTTPException(status_code=400, detail="Дозволені лише MIDI-файли")
+    try:
+        data = await asyncio.get_event_loop().run_in_executor(EXECUTOR, read_midi_upload, file.file)
+    except UploadTooLarge as e:
+        logger.warning(f"Завеликий файл для гармонізації: {file.filename}")
+        raise HTTPException(status_code=413, detail=str(e))
+    return submit_job('ffn_harmonize', {'filename': file.filename, 'data': data}).model_dump()
+
+def harmonize_melody(file: UploadFile = File(...), token: CancellationToken | None = None):
+    return harmonize_bytes(read_midi_upload(file.file), file.filename, token)
+
+def harmony_cache_key(data: bytes) -> str:
+    # Гармонізація детермінована, тому однаковий вміст файлу дає однаковий результат;
+    # квантизована мережа може дати іншу гармонію, тому рушій входить у ключ
+    model_id = f'{MODEL_PATH}:{FFN_INFERENCE_ENGINE}:{FFN_QUANTIZATION}'
+    return make_cache_key('ffn_harmonize_song', model_id.encode('utf-8') + b'\0' + data)
+
+def harmonize_bytes(data: bytes, filename: str, token: CancellationToken | None = None) -> str:
+    midi_bytes = result_cache.get_or_compute(
+        harmony_cache_key(data),
+        lambda: render_harmony(data, filename, token),
+        retry_on=GenerationCancelled,
+        token=token
+    )
+    if token is not None:
+        token.check()
+
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_filename = f'generated_file_{timestamp}.mid'
     output_path = 'generated_midis/' + output_filename
         
     logger.debug(f'Збереження згенерованого MIDI файлу: {output_path}')
-    midi_generator.generate_midi(output_path, generated_note_infos)
+    midi_generator.save_midi_bytes(output_path, midi_bytes)
     return output_filename
+
+def render_harmony(data: bytes, filename: str, token: CancellationToken | None = None) -> bytes:
+    logger.debug(f'Ініціалізація генерації гармонії для {filename}')
+    harmony_generator = NetworkHarmonyGenerator(harmony_network)
+    if token is not None:
+        token.check()
+    melody = torch.from_numpy(load_soprano_melody(data))
+        
+    if token is not None:
+        token.check()
+    logger.debug(f'Генерація гармонії для {len(melody)} сегментів...')
+    generated_song = harmony_generator.generate_song_harmony(melody)
+    if token is not None:
+        token.check()
+    generated_note_infos = note_generator.generate_note_info(generated_song)
+    return midi_generator.get_midi_bytes(generated_note_infos)
+
+@router.post("/harmonize/batch")
+async def harmonize_midi_batch(http_request: Request, files: list[UploadFile] = File(...), archive: bool = False):
+    """
+    Гармонізує кілька MIDI-файлів або zip-архівів з ними за один запит.
+
+    Файли розбираються паралельно, а вікна всіх мелодій проходять через мережу
+    спільними батчами. Помилка в окремому файлі потрапляє в маніфест і не зупиняє
+    решту. archive=true повертає один zip з гармонізованими файлами та manifest.json
+    замість збереження кожного файлу окремо.
+    """
+    logger.info(f"Запит на пакетну гармонізацію: {len(files)} файл(ів)")
+    token = CancellationToken(GENERATION_DEADLINE_SECONDS)
+    try:
+        if len(files) > FFN_BATCH_MAX_FILES:
+            raise TooManyFiles(f"Запит містить {len(files)} файлів, дозволено не більше {FFN_BATCH_MAX_FILES}")
+        async with cancel_on_disconnect(http_request, token, DISCONNECT_POLL_INTERVAL_SECONDS):
+            loop = asyncio.get_event_loop()
+            items = await loop.run_in_executor(EXECUTOR, read_batch_uploads, files)
+            if not items:
+                raise HTTPException(status_code=400, detail="Запит не містить жодного MIDI-файлу")
+
+            results = await harmonize_batch(items, token)
+            token.check()
+            harmonized = sum(midi_bytes is not None for _, midi_bytes, _ in results)
+            metrics.increment('ffn_batch_files', len(results))
+            metrics.increment('ffn_batch_errors', len(results) - harmonized)
+            message = f"Гармонізовано {harmonized} з {len(results)} файлів"
+            logger.info(f"Пакетна гармонізація завершена: {message}")
+
+            if archive:
+                content = await loop.run_in_executor(EXECUTOR, build_harmony_archive, results, message)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                return Response(
+                    content=content,
+                    media_type="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="harmonized_{timestamp}.zip"'}
+                )
+            manifest = await loop.run_in_executor(EXECUTOR, save_batch_results, results)
+            return BatchHarmonizeResponse(message=message, files=manifest).model_dump()
+
+    except HTTPException as he:
+        raise he
+    except TooManyFiles as e:
+        logger.warning(f"Забагато файлів для пакетної гармонізації: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except GenerationCancelled as e:
+        metrics.increment(f'ffn_cancelled_{e.reason}')
+        logger.info(f"Пакетну гармонізацію скасовано: {e.reason}")
+        raise HTTPException(status_code=CANCEL_STATUS_CODES[e.reason], detail=str(e))
+    except Exception as e:
+        error_msg = f"Помилка під час пакетної гармонізації: {str(e)}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=500, detail=error_msg)
+
+def read_batch_uploads(files: list[UploadFile]) -> list[tuple[str, bytes | None, str | None]]:
+    """
+    Читає завантажені MIDI-файли та розпаковує zip-архіви. Кожен файл, зокрема з
+    помилкою, займає місце в ліміті FFN_BATCH_MAX_FILES; архів отримує лише залишок
+    ліміту, тому після його вичерпання нічого не розпаковується.
+    Returns:
+        list: Кортежі (назва файлу, вміст або None, помилка або None)
+    Raises:
+        TooManyFiles: Якщо разом із вмістом архівів файлів більше за FFN_BATCH_MAX_FILES
+    """
+    too_many = f"Запит містить більше {FFN_BATCH_MAX_FILES} MIDI-файлів"
+    items = []
+    for file in files:
+        filename = file.filename or ''
+        remaining = FFN_BATCH_MAX_FILES - len(items)
+        try:
+            if filename.lower().endswith('.zip'):
+                archive_bytes = read_midi_upload(file.file, FFN_BATCH_MAX_ARCHIVE_BYTES)
+                items.extend(
+                    (f'{filename}/{entry}', data, error)
+                    for entry, data, error in read_midi_archive(archive_bytes, max_files=remaining)
+                )
+            elif remaining == 0:
+                raise TooManyFiles(too_many)
+            elif is_midi_filename(filename):
+                items.append((filename, read_midi_upload(file.file), None))
+            else:
+                items.append((filename, None, "Дозволені лише MIDI-файли та zip-архіви"))
+        except TooManyFiles:
+            raise TooManyFiles(too_many) from None
+        except UploadTooLarge as e:
+            items.append((filename, None, str(e)))
+        except zipfile.BadZipFile:
+            items.append((filename, None, "Файл не є коректним zip-архівом"))
+        except ValueError as e:
+            items.append((filename, None, str(e)))
+        if len(items) > FFN_BATCH_MAX_FILES:
+            raise TooManyFiles(too_many)
+    return items
+
+async def harmonize_batch(
+    items: list[tuple[str, bytes | None, str | None]],
+    token: CancellationToken
+) -> list[tuple[str, bytes | None, str | None]]:
+    """
+    Гармонізує файли через кеш результатів з об'єднанням однакових запитів.
+
+    Ключі всіх файлів реєструються в кеші одразу. Файли, які ніхто інший не обчислює,
+    розбираються паралельно (окреме завдання EXECUTOR на файл) і гармонізуються одним
+    викликом render_harmonies, після чого їхні результати передаються очікувачам.
+    Лише потім запит чекає на файли, що вже обчислюються в інших запитах (або
+    повторюються в цьому), тож два пакетні запити не можуть чекати один на одного.
+    Returns:
+        list: Кортежі (назва файлу, гармонізований MIDI або None, помилка або None)
+    """
+    loop = asyncio.get_event_loop()
+    results = [[filename, None, error] for filename, _, error in items]
+    owned, waiting = {}, []
+
+    def settle(index: int, value: bytes | None = None, error: BaseException | None = None) -> None:
+        key, future = owned.pop(index)
+        result_cache.resolve(key, future, value, error)
+
+    try:
+        for index, (_, data, error) in enumerate(items):
+            if error is not None:
+                continue
+            key = harmony_cache_key(data)
+            value, future, owner = result_cache.claim(key)
+            if value is not None:
+                results[index][1] = value
+            elif owner:
+                owned[index] = (key, future)
+            else:
+                waiting.append((index, key))
+
+        pending = list(owned)
+        prepared = await asyncio.gather(
+            *(loop.run_in_executor(EXECUTOR, load_soprano_melody, items[index][1]) for index in pending),
+            return_exceptions=True
+        )
+        to_render = []
+        for index, outcome in zip(pending, prepared):
+            if isinstance(outcome, Exception):
+                logger.warning(f"Не вдалося розібрати {items[index][0]}: {outcome}")
+                results[index][2] = f"Не вдалося розібрати MIDI-файл: {outcome}"
+                settle(index, error=outcome)
+            else:
+                to_render.append((index, outcome))
+
+        token.check()
+        if to_render:
+            rendered = await loop.run_in_executor(
+                EXECUTOR,
+                render_harmonies,
+                [melody for _, melody in to_render],
+                token
+            )
+            for (index, _), outcome in zip(to_render, rendered):
+                if isinstance(outcome, Exception):
+                    logger.warning(f"Не вдалося гармонізувати {items[index][0]}: {outcome}")
+                    results[index][2] = f"Помилка під час гармонізації: {outcome}"
+                    settle(index, error=outcome)
+                else:
+                    results[index][1] = outcome
+                    settle(index, value=outcome)
+    except BaseException as e:
+        # Очікувачі в інших запитах отримують ту саму помилку; після скасування вони обчислюють самі
+        for index in list(owned):
+            settle(index, error=e)
+        raise
+
+    async def join(index: int, key: str) -> None:
+        filename, data, _ = items[index]
+        try:
+            results[index][1] = await result_cache.get_or_compute_async(
+                key,
+                lambda: loop.run_in_executor(EXECUTOR, render_harmony, data, filename, token),
+                retry_on=GenerationCancelled
+            )
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Не вдалося гармонізувати {filename}: {e}")
+            results[index][2] = f"Помилка під час гармонізації: {e}"
+
+    # GenerationCancelled з join означає скасування цього запиту; його перевіряє викликач
+    await asyncio.gather(*(join(index, key) for index, key in waiting), return_exceptions=True)
+    return [tuple(result) for result in results]
+
+def render_harmonies(melodies: list, token: CancellationToken | None = None) -> list:
+    """
+    Гармонізує мелодії спільними прямими проходами.
+    Returns:
+        list: MIDI кожної мелодії або виняток, якщо її не вдалося записати
+    """
+    harmony_generator = NetworkHarmonyGenerator(harmony_network)
+    logger.debug(f'Генерація гармонії для {len(melodies)} мелодій, {sum(map(len, melodies))} сегментів...')
+    songs = harmony_generator.generate_songs_harmony([torch.from_numpy(melody) for melody in melodies])
+    if token is not None:
+        token.check()
+
+    rendered = []
+    for song in songs:
+        try:
+            rendered.append(midi_generator.get_midi_bytes(note_generator.generate_note_info(song)))
+        except Exception as e:
+            rendered.append(e)
+    return rendered
+
+def save_batch_results(results: list[tuple[str, bytes | None, str | None]]) -> list[HarmonizedFile]:
+    """Зберігає кожен гармонізований файл так само, як /harmonize, і повертає маніфест."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    manifest = []
+    for index, (filename, midi_bytes, error) in enumerate(results, start=1):
+        if midi_bytes is None:
+            manifest.append(HarmonizedFile(filename=filename, error=error))
+            continue
+        output_filename = f'generated_file_{timestamp}_{index:03d}.mid'
+        try:
+            midi_generator.save_midi_bytes('generated_midis/' + output_filename, midi_bytes)
+        except Exception as e:
+            logger.error(f"Не вдалося зберегти {output_filename}: {e}")
+            manifest.append(HarmonizedFile(filename=filename, error=f"Не вдалося зберегти файл: {e}"))
+            continue
+        manifest.append(HarmonizedFile(filename=filename, midi_file=output_filename))
+    return manifest
+
+def build_harmony_archive(results: list[tuple[str, bytes | None, str | None]], message: str) -> bytes:
+    """Zip з гармонізованими файлами та manifest.json у форматі BatchHarmonizeResponse."""
+    manifest = []
+    archive_io = io.BytesIO()
+    with zipfile.ZipFile(archive_io, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for index, (filename, midi_bytes, error) in enumerate(results, start=1):
+            if midi_bytes is None:
+                manifest.append(HarmonizedFile(filename=filename, error=error))
+                continue
+            stem = os.path.splitext(os.path.basename(filename))[0]
+            entry = f'{index:03d}_{stem}_harmonized.mid'
+            archive.writestr(entry, midi_bytes)
+            manifest.append(HarmonizedFile(filename=filename, midi_file=entry))
+        response = BatchHarmonizeResponse(message=message, files=manifest)
+        archive.writestr('manifest.json', json.dumps(response.model_dump(), ensure_ascii=False, indent=2))
+    return archive_io.getvalue()
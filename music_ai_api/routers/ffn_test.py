@@ -0,0 +1,147 @@
+import io
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.ffn as ffn
+from common.constants import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS
+from dto.response.job_response import JobResponse
+from utils.ffn_utils.data_midi_loader_test import CHORDS, make_midi_bytes
+from utils.result_cache import ResultCache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    saved = {}
+    monkeypatch.setattr(ffn.midi_generator, 'save_midi_bytes', lambda name, data: saved.__setitem__(name, data))
+    app = FastAPI()
+    app.include_router(ffn.router, prefix='/ffn')
+    with TestClient(app) as client:
+        client.saved = saved
+        yield client
+
+
+def test_file_without_notes_is_rejected_as_client_error(client):
+    response = client.post('/ffn/harmonize', files={'file': ('empty.mid', make_midi_bytes([]), 'audio/midi')})
+
+    assert response.status_code == 422
+    assert response.json()['detail'] == "Мелодія не містить жодного сегмента"
+    assert client.saved == {}
+
+
+def test_uppercase_midi_extension_is_accepted_by_single_file_endpoints(client, monkeypatch):
+    monkeypatch.setattr(ffn, 'submit_job', lambda kind, payload: JobResponse(job_id='job', status='queued'))
+    files = {'file': ('SONG.MID', make_midi_bytes(CHORDS), 'audio/midi')}
+
+    assert client.post('/ffn/harmonize', files=files).status_code == 200
+    assert client.post('/ffn/jobs', files=files).status_code == 202
+    assert client.post('/ffn/harmonize', files={'file': ('song.txt', b'text', 'text/plain')}).status_code == 400
+
+
+def make_archive_bytes(entries):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+    return data.getvalue()
+
+
+def midi_upload(name, data):
+    return ('files', (name, data, 'audio/midi'))
+
+
+def test_batch_over_file_limit_is_rejected_before_reading(client, monkeypatch):
+    reads = []
+    monkeypatch.setattr(ffn, 'FFN_BATCH_MAX_FILES', 2)
+    monkeypatch.setattr(ffn, 'read_midi_upload', lambda *args: reads.append(args))
+
+    song = make_midi_bytes(CHORDS)
+    response = client.post('/ffn/harmonize/batch', files=[midi_upload(f'{i}.mid', song) for i in range(3)])
+
+    assert response.status_code == 413
+    assert reads == []
+
+
+def test_archives_share_the_request_file_limit(client, monkeypatch):
+    extracted = []
+    read_midi_archive = ffn.read_midi_archive
+
+    def recording_read_midi_archive(archive_bytes, max_files):
+        entries = read_midi_archive(archive_bytes, max_files=max_files)
+        extracted.append(len(entries))
+        return entries
+
+    monkeypatch.setattr(ffn, 'FFN_BATCH_MAX_FILES', 3)
+    monkeypatch.setattr(ffn, 'read_midi_archive', recording_read_midi_archive)
+
+    archive = make_archive_bytes([('a.mid', make_midi_bytes(CHORDS)), ('b.mid', make_midi_bytes(CHORDS[:8]))])
+    response = client.post('/ffn/harmonize/batch', files=[
+        ('files', ('one.zip', archive, 'application/zip')),
+        ('files', ('two.zip', archive, 'application/zip')),
+        midi_upload('c.mid', make_midi_bytes(CHORDS)),
+    ])
+
+    assert response.status_code == 413
+    # Другий архів не розпаковується: у ліміті лишилося місце лише для одного файлу
+    assert extracted == [2]
+    assert client.saved == {}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS)
+    monkeypatch.setattr(ffn, 'result_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def rendered_batches(monkeypatch):
+    batches = []
+    render_harmonies = ffn.render_harmonies
+
+    def recording_render_harmonies(melodies, token=None):
+        batches.append(len(melodies))
+        return render_harmonies(melodies, token)
+
+    monkeypatch.setattr(ffn, 'render_harmonies', recording_render_harmonies)
+    return batches
+
+
+def archive_entries(response) -> list[bytes]:
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    return [archive.read(name) for name in sorted(archive.namelist()) if name != 'manifest.json']
+
+
+def test_duplicate_files_in_batch_are_harmonized_once(client, cache, rendered_batches):
+    song = make_midi_bytes(CHORDS)
+
+    response = client.post('/ffn/harmonize/batch?archive=true', files=[midi_upload('a.mid', song), midi_upload('b.mid', song)])
+
+    first, second = archive_entries(response)
+    assert rendered_batches == [1]
+    assert first == second == cache.get(ffn.harmony_cache_key(song))
+
+
+def test_batch_waits_for_harmonization_in_flight_elsewhere(client, cache, rendered_batches):
+    song, other = make_midi_bytes(CHORDS), make_midi_bytes(CHORDS[:12])
+    key = ffn.harmony_cache_key(song)
+    # Гармонізація цього файлу вже виконується в іншому запиті
+    _, future, owner = cache.claim(key)
+    assert owner
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        response_future = executor.submit(
+            client.post, '/ffn/harmonize/batch?archive=true', files=[midi_upload('a.mid', song), midi_upload('b.mid', other)]
+        )
+        deadline = time.monotonic() + 30
+        while cache.coalesced == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        cache.resolve(key, future, value=b'from-other-request')
+        response = response_future.result(timeout=30)
+
+    assert archive_entries(response)[0] == b'from-other-request'
+    assert rendered_batches == [1]
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException
+
+from dto.response.job_response import JobResponse
+from utils.jobs import QueueFull, job_runner, job_store
+
+router = APIRouter()
+
+
+def submit_job(kind: str, payload: dict) -> JobResponse:
+    """
+    Ставить завдання в чергу.
+    Raises:
+        HTTPException: 429 із заголовком Retry-After, якщо черга заповнена
+    """
+    try:
+        job_id = job_runner.submit(kind, payload)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return JobResponse(job_id=job_id, status=job_store.get(job_id)['status'])
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str) -> dict:
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Завдання не знайдено")
+    return JobResponse(
+        job_id=job['job_id'],
+        status=job['status'],
+        progress=job['progress'],
+        result=job['result'],
+        error=job['error']
+    ).model_dump()
@@ -1,24 +1,63 @@
 import asyncio
+import io
+import itertools
+import json
+import threading
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 import numpy as np
-import pandas as pd
-from sklearn.calibration import LabelEncoder
-import tensorflow as tf
 
 from dto.request.lstm_dto import GenerateRequest, RawNotes
-from generation.loss_functions import diversity_loss
 from dto.response.generate_response import GenerateResponse
 from utils.midi_utils_v2 import (
-    classify_duration,
-    convert_duration_to_seconds,
-    get_note_durations_for_tempo,
-    notes_to_midi_categorical
+    DurationTable,
+    get_duration_table,
+    notes_to_midi_categorical,
+    transpose_notes
 )
-from generation.lstm_generator import predict_next_note_categorical
-from common.constants import INSTRUMENT_NAMES, SEQ_LENGTH, PITCH_VOCAB_SIZE, EXECUTOR
+from generation.lstm_generator import (
+    ENGINE_TFLITE,
+    create_inference_model,
+    load_inference_model,
+    load_model
+)
+from generation.model_pool import ModelWorkerPool
+from generation.cancellation import (
+    CANCEL_DISCONNECTED,
+    CANCEL_STATUS_CODES,
+    CancellationToken,
+    GenerationCancelled,
+    cancel_on_disconnect
+)
+from generation.generation_session import GenerationSession, advance_sessions
+from generation.note_window import NoteWindow
+from generation.batch_scheduler import BatchScheduler
+from common.constants import (
+    INSTRUMENT_NAMES,
+    SEQ_LENGTH,
+    PITCH_VOCAB_SIZE,
+    EXECUTOR,
+    LSTM_INFERENCE_ENGINE,
+    LSTM_BATCHING_ENABLED,
+    LSTM_BATCH_MAX_SIZE,
+    LSTM_BATCH_MAX_WAIT_MS,
+    LSTM_STREAM_BUFFER_NOTES,
+    LSTM_POOL_WORKERS,
+    LSTM_TFLITE_MODEL_PATH,
+    LSTM_TFLITE_NUM_THREADS,
+    GENERATION_DEADLINE_SECONDS,
+    DISCONNECT_POLL_INTERVAL_SECONDS
+)
+from common.runtime_config import thread_budget
+from utils.duration_vocabulary import check_duration_vocabulary, load_duration_vocabulary
+from utils.ffn_utils.cloudinary_utils import upload_midi_bytes
+from utils.result_cache import make_cache_key, result_cache
+from utils.jobs import job_runner
+from utils.metrics import metrics
+from routers.jobs import submit_job
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -28,59 +67,147 @@ router = APIRouter()
 class MelodyGenerator:
     """Клас для генерації мелодій використовуючи LSTM модель."""
 
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, engine: str = LSTM_INFERENCE_ENGINE, pool_workers: int = LSTM_POOL_WORKERS):
         """
         Ініціалізація генератора мелодій.
         Args:
             model_path: Шлях до збереженої моделі LSTM
+            engine: Рушій інференсу ("compiled", "predict" або "tflite")
+            pool_workers: Кількість окремих процесів для прямих проходів (0 — у процесі API)
         Raises:
             RuntimeError: Якщо не вдалося завантажити модель
         """
         try:
-            self.model = tf.keras.models.load_model(
-                model_path,
-                custom_objects={'diversity_loss': diversity_loss}
-            )
-            self.key_order = ['pitch', 'step', 'duration']
-            self.label_encoder = self._init_label_encoder()
-            logger.info(f"Модель успішно завантажено з {model_path}")
+            self.model_path = model_path
+            self.engine = engine
+            # Файл, з якого рушій бере ваги (для TFLite — експортована, можливо квантизована модель)
+            self.backend_path = LSTM_TFLITE_MODEL_PATH if engine == ENGINE_TFLITE else model_path
+            pooled = pool_workers > 0
+            # Модель Keras у процесі API потрібна лише рушіям, що виконуються в ньому
+            in_process = not (pooled or engine == ENGINE_TFLITE)
+            self.model = load_model(model_path) if in_process else None
+            # Скільки батчів модель виконує одночасно: по одному на процес пулу
+            self.parallel_batches = pool_workers if pooled else 1
+            if pooled:
+                self.inference_model = ModelWorkerPool(
+                    'lstm',
+                    load_inference_model,
+                    (model_path, engine, LSTM_TFLITE_MODEL_PATH, LSTM_TFLITE_NUM_THREADS or thread_budget.pool_worker_threads),
+                    pool_workers
+                )
+            else:
+                self.inference_model = create_inference_model(
+                    self.model, engine, LSTM_TFLITE_MODEL_PATH, LSTM_TFLITE_NUM_THREADS or thread_budget.tf_intra_op_threads
+                )
+            self.duration_classes = self._init_duration_classes()
+            logger.info(f"Модель успішно завантажено з {model_path} (рушій: {engine})")
         except Exception as e:
             logger.error(f"Не вдалося завантажити модель: {e}")
             raise RuntimeError(f"Не вдалося ініціалізувати генератор мелодій: {e}")
 
-    def _init_label_encoder(self) -> LabelEncoder:
-        """Ініціалізує LabelEncoder на тренувальних даних."""
+    def _duration_units(self) -> int:
+        """Розмір виходу тривалостей; без моделі в процесі — з прямого проходу рушія."""
+        if self.model is not None:
+            return self.model.get_layer('duration').units
+        outputs = self.inference_model.predict(np.zeros((1, SEQ_LENGTH, 3), dtype=np.float32))
+        return outputs['duration'].shape[-1]
+
+    def _init_duration_classes(self) -> tuple:
+        """Завантажує словник класів тривалостей і звіряє його з виходом моделі."""
         try:
-            all_notes = pd.read_parquet('common/dataset_categorical.parquet')
-            train_notes = np.stack([all_notes[key] for key in self.key_order], axis=1)
-            label_encoder = LabelEncoder()
-            label_encoder.fit(train_notes[:, 2])
-            return label_encoder
+            duration_classes = load_duration_vocabulary()
+            check_duration_vocabulary(duration_classes, self._duration_units())
+            return duration_classes
         except Exception as e:
-            logger.error(f"Не вдалося ініціалізувати label encoder: {e}")
-            raise RuntimeError(f"Не вдалося ініціалізувати label encoder: {e}")
+            logger.error(f"Не вдалося ініціалізувати словник тривалостей: {e}")
+            raise RuntimeError(f"Не вдалося ініціалізувати словник тривалостей: {e}")
 
     def _prepare_input_notes(
         self,
         start_notes: Optional[List[RawNotes]],
-        note_durations: dict
+        duration_table: DurationTable,
+        rng: np.random.Generator
     ) -> np.ndarray:
-        """Підготовка вхідних нот для генерації."""
+        """Підготовка вхідних нот для генерації: (pitch, step, індекс класу тривалості)."""
         if start_notes is None:
-            return np.random.uniform(0, 1, (SEQ_LENGTH, 3))
-        notes_array = np.array([[int(note.pitch), note.step, classify_duration(note.duration, note_durations)] 
-                for note in start_notes[:SEQ_LENGTH]], dtype=object)
+            return rng.uniform(0, 1, (SEQ_LENGTH, 3))
+        start_notes = start_notes[:SEQ_LENGTH]
+        notes_array = np.array([[int(note.pitch), note.step, note.duration] for note in start_notes], dtype=np.float64)
+        notes_array[:, 2] = duration_table.classify(notes_array[:, 2])
         
         repetitions = -(-SEQ_LENGTH // len(notes_array)) 
         notes_array = np.tile(notes_array, (repetitions, 1))
         return notes_array[:SEQ_LENGTH]
 
+    def start_session(
+        self,
+        start_notes: Optional[List[RawNotes]],
+        num_predictions: int,
+        temperature: float,
+        tempo: int,
+        seed: Optional[int] = None,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        token: Optional[CancellationToken] = None
+    ) -> GenerationSession:
+        """
+        Готує вхідне вікно та створює сесію генерації.
+        Args:
+            start_notes: Початкові ноти для генерації
+            num_predictions: Кількість нот для генерації
+            temperature: Температура для семплінгу
+            tempo: Темп мелодії (BPM)
+            seed: Зерно генератора випадкових чисел для відтворюваного результату
+            top_k: Скільки найімовірніших висот враховувати при семплінгу
+            top_p: Поріг сумарної ймовірності для nucleus-семплінгу висот
+            token: Токен скасування запиту, що перевіряється на кожному кроці декодування
+        Returns:
+            GenerationSession: Сесія, готова до покрокового декодування
+        """
+        rng = np.random.default_rng(seed)
+        duration_table = get_duration_table(tempo, self.duration_classes)
+        start_notes_array = self._prepare_input_notes(start_notes, duration_table, rng)
+
+        # Транспозиція в діапазон моделі
+        # Зберігаємо інформацію про початкові висоти нот для подальшої транспозиції
+        pitches = start_notes_array[:, 0].astype(np.float64)
+        original_avg_pitch = np.mean(pitches)
+        model_preferred_range = (50, 80)  # Діапазон, в якому зазвичай генерує модель
+        target_avg_pitch = sum(model_preferred_range) / 2
+        bridge_length = min(8, SEQ_LENGTH // 2)
+        ratios = np.arange(1, bridge_length + 1) / bridge_length
+        bridge = pitches[SEQ_LENGTH - bridge_length:]
+        bridge[:] = bridge * (1 - ratios) + target_avg_pitch * ratios
+
+        steps = start_notes_array[:, 1]
+        note_type_encoded = start_notes_array[:, 2]
+
+        window = NoteWindow(SEQ_LENGTH)
+        window.fill(pitches / PITCH_VOCAB_SIZE, steps, note_type_encoded)
+
+        return GenerationSession(
+            window,
+            num_predictions,
+            temperature,
+            tempo,
+            duration_table,
+            original_avg_pitch,
+            rng,
+            top_k,
+            top_p,
+            token
+        )
+
     def generate_melody(
         self,
         start_notes: Optional[List[RawNotes]],
         num_predictions: int,
         temperature: float,
-        tempo: int
+        tempo: int,
+        seed: Optional[int] = None,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        token: Optional[CancellationToken] = None
     ) -> str:
         """
         Генерація мелодії за допомогою LSTM.
@@ -89,122 +216,593 @@ class MelodyGenerator:
             num_predictions: Кількість нот для генерації
             temperature: Температура для семплінгу
             tempo: Темп мелодії (BPM)
+            seed: Зерно генератора випадкових чисел для відтворюваного результату
+            top_k: Скільки найімовірніших висот враховувати при семплінгу
+            top_p: Поріг сумарної ймовірності для nucleus-семплінгу висот
+            token: Токен скасування запиту, що перевіряється на кожному кроці декодування
         Returns:
             str: Назва згенерованого MIDI файлу
         """
         try:
-            note_durations = get_note_durations_for_tempo(tempo)
-            start_notes_array = self._prepare_input_notes(start_notes, note_durations)
-
-            # Транспозиція в діапазон моделі
-            # Зберігаємо інформацію про початкові висоти нот для подальшої транспозиції
-            original_pitches = start_notes_array[:, 0].copy()
-            original_avg_pitch = np.mean(original_pitches)
-            model_preferred_range = (50, 80)  # Діапазон, в якому зазвичай генерує модель
-            target_avg_pitch = sum(model_preferred_range) / 2
-            bridge_length = min(8, SEQ_LENGTH // 2)
-            for i in range(bridge_length):
-                ratio = (i + 1) / bridge_length
-                idx = SEQ_LENGTH - bridge_length + i
-                shifted_pitch = original_pitches[idx] * (1 - ratio) + target_avg_pitch * ratio
-                start_notes_array[idx, 0] = shifted_pitch
-            
-            notes = {name: start_notes_array[:, i] for i, name in enumerate(self.key_order)}
-            start_notes_df = pd.DataFrame(notes)
-
-            sample_notes = np.stack([start_notes_df[key] for key in self.key_order], axis=1)
-
-            normalization_factors = np.array([PITCH_VOCAB_SIZE, 1, 1])
-
-            pitch = sample_notes[:, 0].astype(np.float64)
-            duration = sample_notes[:, 1].astype(np.float64)
-            note_type_encoded = self.label_encoder.transform(sample_notes[:, 2]).astype(np.float64)
-            sample_notes = np.stack([pitch, duration, note_type_encoded], axis=1)
-
-            input_notes = (sample_notes[:SEQ_LENGTH] / normalization_factors)
-
-            generated_notes = []
-            prev_start = 0
-
-            for _ in range(num_predictions):
-                pitch, step, duration = predict_next_note_categorical(input_notes, self.model, temperature)
-                duration_label = self.label_encoder.inverse_transform(np.array([int(duration)]))[0]
-                duration_in_seconds = convert_duration_to_seconds(duration_label, tempo)
-                
-                start = prev_start + step
-                end = start + duration_in_seconds
-
-                normalized_pitch = pitch / PITCH_VOCAB_SIZE
-                next_input_note = np.array([normalized_pitch, step, duration])
-                generated_notes.append((int(pitch), float(step), duration_label, duration_in_seconds, float(start), float(end)))
-
-                input_notes = np.delete(input_notes, 0, axis=0)
-                input_notes = np.append(input_notes, np.expand_dims(next_input_note, 0), axis=0)
-                prev_start = start
-
-            notes_df = pd.DataFrame(generated_notes, columns=['pitch', 'step', 'duration_label', 'duration', 'start', 'end'])
-            logger.debug(f"Згенеровані ноти у вигляді таблиці:\n{notes_df}")
+            key = self.cache_key(start_notes, num_predictions, temperature, tempo, seed, top_k, top_p)
+            def render() -> bytes:
+                return self.render_melody(start_notes, num_predictions, temperature, tempo, seed, top_k, top_p, token)
 
-            # Транспозиція згенерованих нот у діапазон вхідної послідовності
-            # Обчислюємо необхідний зсув висоти для відповідності початковій середній висоті
-            generated_avg_pitch = notes_df['pitch'].mean()
-            pitch_shift = int(round(original_avg_pitch - generated_avg_pitch))
-            notes_df['pitch'] = notes_df['pitch'].apply(
-                lambda p: max(0, min(127, p + pitch_shift))
-            )
-            logger.debug(f"Згенеровані ноти після транспозиції:\n{notes_df}")
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            out_file = f'output_{timestamp}.mid'
-            
-            self._save_midi(notes_df, tempo, out_file)
-            return out_file
-            
+            if key is None:
+                midi_bytes = render()
+            else:
+                midi_bytes = result_cache.get_or_compute(key, render, retry_on=GenerationCancelled, token=token)
+            if token is not None:
+                token.check()
+            return self.publish_midi(midi_bytes)
+        except GenerationCancelled:
+            raise
         except Exception as e:
             logger.error(f"Не вдалося згенерувати мелодію: {e}")
             raise e
 
-    def _save_midi(
+    def render_melody(
         self,
-        notes_df: pd.DataFrame,
+        start_notes: Optional[List[RawNotes]],
+        num_predictions: int,
+        temperature: float,
         tempo: int,
-        out_file: str
+        seed: Optional[int] = None,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        token: Optional[CancellationToken] = None
+    ) -> bytes:
+        """Генерує мелодію і повертає вміст MIDI-файлу без збереження."""
+        session = self.start_session(start_notes, num_predictions, temperature, tempo, seed, top_k, top_p, token)
+        self.decode(session)
+        return self.render_session(session)
+
+    def cache_key(
+        self,
+        start_notes: Optional[List[RawNotes]],
+        num_predictions: int,
+        temperature: float,
+        tempo: int,
+        seed: Optional[int] = None,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        Ключ кешу результатів для запиту генерації.
+        Returns:
+            Optional[str]: Хеш параметрів запиту, моделі та рушія; None без seed,
+            бо тоді кожен запит має давати нову мелодію
+        """
+        if seed is None:
+            return None
+        return make_cache_key('lstm_v2', {
+            'model': self.backend_path,
+            'engine': self.engine,
+            'duration_classes': list(self.duration_classes),
+            'start_notes': None if start_notes is None else [
+                [note.pitch, note.step, note.duration] for note in start_notes[:SEQ_LENGTH]
+            ],
+            'num_predictions': num_predictions,
+            'temperature': temperature,
+            'tempo': tempo,
+            'seed': seed,
+            'top_k': top_k,
+            'top_p': top_p,
+        })
+
+    def generate_variations(
+        self,
+        start_notes: Optional[List[RawNotes]],
+        num_predictions: int,
+        temperatures: List[float],
+        tempo: int,
+        seed: Optional[int] = None,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        token: Optional[CancellationToken] = None
+    ) -> List[str]:
+        """
+        Генерація кількох варіацій продовження однакових початкових нот.
+        Усі варіації проходять через модель одним батчем на кожному кроці.
+        Args:
+            start_notes: Початкові ноти для генерації
+            num_predictions: Кількість нот для генерації
+            temperatures: Температура для кожної варіації
+            tempo: Темп мелодії (BPM)
+            seed: Зерно генератора випадкових чисел для відтворюваного результату
+            top_k: Скільки найімовірніших висот враховувати при семплінгу
+            top_p: Поріг сумарної ймовірності для nucleus-семплінгу висот
+            token: Токен скасування запиту, що перевіряється на кожному кроці декодування
+        Returns:
+            List[str]: Назви згенерованих MIDI файлів
+        """
+        try:
+            sessions = self.start_variations(start_notes, num_predictions, temperatures, tempo, seed, top_k, top_p, token)
+            self.decode_batch(sessions)
+            if token is not None:
+                token.check()
+            return [self.finish_session(session, variation) for variation, session in enumerate(sessions)]
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Не вдалося згенерувати варіації мелодії: {e}")
+            raise e
+
+    def start_variations(
+        self,
+        start_notes: Optional[List[RawNotes]],
+        num_predictions: int,
+        temperatures: List[float],
+        tempo: int,
+        seed: Optional[int] = None,
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        token: Optional[CancellationToken] = None
+    ) -> List[GenerationSession]:
+        """Готує вхідне вікно один раз і створює окрему сесію для кожної температури."""
+        session = self.start_session(start_notes, num_predictions, temperatures[0], tempo, seed, top_k, top_p, token)
+        return [session] + [session.fork(temperature) for temperature in temperatures[1:]]
+
+    def decode(
+        self,
+        session: GenerationSession,
+        on_note: Optional[Callable[[tuple], None]] = None
     ) -> None:
-        """Зберігає згенеровані ноти у MIDI-файл."""
-        logger.info(f"Початок збереження MIDI-файлу: {out_file}")
+        """
+        Покрокове декодування сесії до потрібної кількості нот.
+        Args:
+            session: Сесія генерації
+            on_note: Викликається для кожної ноти одразу після її генерації
+        """
+        self.decode_batch([session], None if on_note is None else lambda _, note: on_note(note))
+
+    def decode_batch(
+        self,
+        sessions: List[GenerationSession],
+        on_note: Optional[Callable[[int, tuple], None]] = None
+    ) -> None:
+        """
+        Покрокове декодування кількох сесій однакової довжини одним батчем.
+        Args:
+            sessions: Сесії генерації з однаковою кількістю нот
+            on_note: Викликається з індексом сесії для кожної згенерованої ноти
+        Raises:
+            GenerationCancelled: Якщо запит сесій скасовано до завершення декодування
+        """
+        for session in sessions:
+            session.check_cancelled()
+        inputs = np.empty((len(sessions), SEQ_LENGTH, 3), dtype=np.float32)
+        np.stack([session.input_notes for session in sessions], out=inputs)
+        predictions = self.inference_model.predict(inputs)
+
+        while True:
+            notes = advance_sessions(sessions, predictions)
+            if on_note is not None:
+                for index, note in enumerate(notes):
+                    on_note(index, note)
+            if all(session.done for session in sessions):
+                return
+            for session in sessions:
+                session.check_cancelled()
+            np.stack([session.input_notes for session in sessions], out=inputs)
+            predictions = self.inference_model.predict(inputs)
+
+    def finish_session(self, session: GenerationSession, variation: Optional[int] = None) -> str:
+        """
+        Транспонує згенеровані ноти сесії та зберігає їх у MIDI-файл.
+        Args:
+            session: Завершена сесія генерації
+            variation: Номер варіації, додається до назви файлу
+        Returns:
+            str: Назва згенерованого MIDI файлу
+        """
+        return self.publish_midi(self.render_session(session), variation)
+
+    def render_session(self, session: GenerationSession) -> bytes:
+        """
+        Транспонує згенеровані ноти сесії та формує з них MIDI-файл.
+        Args:
+            session: Завершена сесія генерації
+        Returns:
+            bytes: Вміст MIDI-файлу
+        """
         try:
+            # Транспозиція згенерованих нот у діапазон вхідної послідовності
+            notes = transpose_notes(session.generated, session.original_avg_pitch)
+            logger.debug(f"Згенеровано {len(notes)} нот, діапазон висот після транспозиції: "
+                         f"{notes['pitch'].min()}-{notes['pitch'].max()}")
+
             instrument_name = INSTRUMENT_NAMES.get(0, "Unknown Instrument")
-            notes_to_midi_categorical(
-                notes_df,
-                out_file='generated_midis/' + out_file,
-                instrument_name=instrument_name,
-                bpm=tempo
-            )
+            pm = notes_to_midi_categorical(notes, instrument_name=instrument_name, bpm=session.tempo)
+            midi_io = io.BytesIO()
+            pm.write(midi_io)
+            return midi_io.getvalue()
+
+        except Exception as e:
+            logger.error(f"Не вдалося сформувати MIDI-файл з нот сесії: {e}")
+            raise e
+
+    def publish_midi(self, midi_bytes: bytes, variation: Optional[int] = None) -> str:
+        """
+        Зберігає MIDI-файл під новою назвою.
+        Args:
+            midi_bytes: Вміст MIDI-файлу
+            variation: Номер варіації, додається до назви файлу
+        Returns:
+            str: Назва збереженого MIDI файлу
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_file = f'output_{timestamp}.mid' if variation is None else f'output_{timestamp}_v{variation + 1}.mid'
+        logger.info(f"Початок збереження MIDI-файлу: {out_file}")
+        try:
+            url = upload_midi_bytes(midi_bytes, out_file='generated_midis/' + out_file)
+            logger.info(f"Завантажено MIDI файл на Cloudinary: {url}")
+            return out_file
         except Exception as e:
             logger.error(f"Помилка при збереженні MIDI-файлу {out_file}: {str(e)}")
             raise
 
 melody_generator = MelodyGenerator('models/ckpt_best.model_lstm_attention_categorical.keras')
+batch_scheduler = BatchScheduler(
+    melody_generator.inference_model,
+    max_batch_size=LSTM_BATCH_MAX_SIZE,
+    max_wait_ms=LSTM_BATCH_MAX_WAIT_MS,
+    max_in_flight=melody_generator.parallel_batches
+)
+
+async def render_batched(request: GenerateRequest, token: Optional[CancellationToken] = None) -> List[bytes]:
+    """Генерація, де кроки декодування об'єднуються з іншими запитами в планувальнику батчів."""
+    loop = asyncio.get_event_loop()
+    sessions = await loop.run_in_executor(
+        EXECUTOR,
+        melody_generator.start_variations,
+        request.start_notes,
+        request.num_predictions,
+        request.variation_temperatures(),
+        request.tempo,
+        request.seed,
+        request.top_k,
+        request.top_p,
+        token
+    )
+    await asyncio.gather(*(asyncio.wrap_future(batch_scheduler.submit(session)) for session in sessions))
+    return [await loop.run_in_executor(EXECUTOR, melody_generator.render_session, session) for session in sessions]
+
+async def generate_batched(request: GenerateRequest, token: Optional[CancellationToken] = None) -> List[str]:
+    """Пакетна генерація; результат запиту з seed та однією варіацією береться з кешу, якщо він там є."""
+    loop = asyncio.get_event_loop()
+    key = None
+    if request.variations == 1:
+        key = melody_generator.cache_key(
+            request.start_notes,
+            request.num_predictions,
+            request.variation_temperatures()[0],
+            request.tempo,
+            request.seed,
+            request.top_k,
+            request.top_p
+        )
+    if key is None:
+        rendered = await render_batched(request, token)
+    else:
+        async def render_single() -> bytes:
+            return (await render_batched(request, token))[0]
+        rendered = [await result_cache.get_or_compute_async(key, render_single, retry_on=GenerationCancelled)]
+    if token is not None:
+        token.check()
+    return [
+        await loop.run_in_executor(
+            EXECUTOR,
+            melody_generator.publish_midi,
+            midi_bytes,
+            variation if len(rendered) > 1 else None
+        )
+        for variation, midi_bytes in enumerate(rendered)
+    ]
 
 @router.post("/generate")
-async def generate_music(request: GenerateRequest) -> dict:
+async def generate_music(request: GenerateRequest, http_request: Request) -> dict:
+    """
+    Генерація мелодії. Якщо клієнт відключився або минув GENERATION_DEADLINE_SECONDS,
+    декодування зупиняється на наступному кроці, а файл не зберігається.
+    """
     logger.info(f"Отримано запит на генерацію музики: темп={request.tempo}, "
                 f"кількість нот={request.num_predictions}, "
-                f"температура={request.temperature}")
+                f"температура={request.temperature}, "
+                f"варіацій={request.variations}")
+    token = CancellationToken(GENERATION_DEADLINE_SECONDS)
     try:
-        midi_file = await asyncio.get_event_loop().run_in_executor(
-            EXECUTOR, 
-            melody_generator.generate_melody, 
-            request.start_notes,
-            request.num_predictions,
-            request.temperature,
-            request.tempo
-        )
-        logger.info(f"Мелодію успішно згенеровано: {midi_file}")
-        return GenerateResponse(message="Мелодія згенерована успішно", midi_file=midi_file).model_dump()
+        async with cancel_on_disconnect(http_request, token, DISCONNECT_POLL_INTERVAL_SECONDS):
+            midi_files = await generate_for_request(request, token)
+        logger.info(f"Мелодію успішно згенеровано: {', '.join(midi_files)}")
+        return GenerateResponse(
+            message="Мелодія згенерована успішно",
+            midi_file=midi_files[0],
+            midi_files=midi_files
+        ).model_dump()
+    except GenerationCancelled as e:
+        metrics.increment(f'lstm_cancelled_{e.reason}')
+        logger.info(f"Генерацію музики скасовано: {e.reason}")
+        raise HTTPException(status_code=CANCEL_STATUS_CODES[e.reason], detail=str(e))
     except Exception as e:
         logger.error(f"Помилка при генерації музики: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=str(e)
         )
+
+async def generate_for_request(request: GenerateRequest, token: CancellationToken) -> List[str]:
+    """Обирає шлях генерації: планувальник батчів, варіації одним батчем або одна мелодія."""
+    if LSTM_BATCHING_ENABLED:
+        return await generate_batched(request, token)
+    if request.variations > 1:
+        return await asyncio.get_event_loop().run_in_executor(
+            EXECUTOR,
+            melody_generator.generate_variations,
+            request.start_notes,
+            request.num_predictions,
+            request.variation_temperatures(),
+            request.tempo,
+            request.seed,
+            request.top_k,
+            request.top_p,
+            token
+        )
+    midi_file = await asyncio.get_event_loop().run_in_executor(
+        EXECUTOR, 
+        melody_generator.generate_melody, 
+        request.start_notes,
+        request.num_predictions,
+        request.variation_temperatures()[0],
+        request.tempo,
+        request.seed,
+        request.top_k,
+        request.top_p,
+        token
+    )
+    return [midi_file]
+
+JOB_PROGRESS_EVERY_NOTES = 16
+
+def run_generate_job(payload: dict, report_progress: Callable[[int, int], None]) -> dict:
+    """
+    Виконує завдання генерації з черги, повідомляючи кількість уже згенерованих нот.
+    Потік завдання лише чекає: декодування йде тим самим шляхом, що й у /generate
+    (планувальник батчів або EXECUTOR), тож завдання не виходять за бюджет потоків.
+    Returns:
+        dict: Відповідь у форматі GenerateResponse
+    """
+    request = GenerateRequest.model_validate(payload)
+    temperatures = request.variation_temperatures()
+    total = request.num_predictions * len(temperatures)
+    token = CancellationToken(GENERATION_DEADLINE_SECONDS)
+    report_progress(0, total)
+
+    def render() -> List[bytes]:
+        sessions = EXECUTOR.submit(
+            melody_generator.start_variations,
+            request.start_notes,
+            request.num_predictions,
+            temperatures,
+            request.tempo,
+            request.seed,
+            request.top_k,
+            request.top_p,
+            token
+        ).result()
+        # Ноти можуть надходити з кількох потоків планувальника; next() лічильника атомарний
+        progress = itertools.count(1)
+
+        def on_note(*_) -> None:
+            done = next(progress)
+            if done % JOB_PROGRESS_EVERY_NOTES == 0:
+                report_progress(done, total)
+
+        if LSTM_BATCHING_ENABLED:
+            futures = [batch_scheduler.submit(session, on_note=on_note) for session in sessions]
+            for future in futures:
+                future.result()
+        else:
+            EXECUTOR.submit(melody_generator.decode_batch, sessions, on_note).result()
+        token.check()
+        report_progress(total, total)
+        return [EXECUTOR.submit(melody_generator.render_session, session).result() for session in sessions]
+
+    key = None
+    if len(temperatures) == 1:
+        key = melody_generator.cache_key(
+            request.start_notes,
+            request.num_predictions,
+            temperatures[0],
+            request.tempo,
+            request.seed,
+            request.top_k,
+            request.top_p
+        )
+    try:
+        if key is None:
+            rendered = render()
+        else:
+            rendered = [result_cache.get_or_compute(key, lambda: render()[0], retry_on=GenerationCancelled, token=token)]
+            report_progress(total, total)
+    except GenerationCancelled as e:
+        metrics.increment(f'lstm_cancelled_{e.reason}')
+        raise
+
+    midi_files = [
+        EXECUTOR.submit(
+            melody_generator.publish_midi,
+            midi_bytes,
+            variation if len(rendered) > 1 else None
+        ).result()
+        for variation, midi_bytes in enumerate(rendered)
+    ]
+    logger.info(f"Мелодію успішно згенеровано: {', '.join(midi_files)}")
+    return GenerateResponse(
+        message="Мелодія згенерована успішно",
+        midi_file=midi_files[0],
+        midi_files=midi_files
+    ).model_dump()
+
+job_runner.register('lstm_generate', run_generate_job)
+
+@router.post("/jobs", status_code=202)
+async def submit_generate_job(request: GenerateRequest) -> dict:
+    """
+    Ставить генерацію в чергу і одразу повертає ідентифікатор завдання.
+    Стан і прогрес доступні через GET /jobs/{job_id}.
+    """
+    logger.info(f"Отримано завдання на генерацію музики: темп={request.tempo}, "
+                f"кількість нот={request.num_predictions}, "
+                f"варіацій={request.variations}")
+    return submit_job('lstm_generate', request.model_dump()).model_dump()
+
+def encode_stream_event(event: str, payload: dict, stream_format: str) -> str:
+    data = json.dumps({"event": event, **payload}, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {data}\n\n"
+    return data + "\n"
+
+# Задачі потокової генерації, що ще виконуються (цикл подій тримає на задачі лише слабкі посилання)
+stream_producers = set()
+
+@router.post("/generate/stream")
+async def generate_music_stream(request: GenerateRequest, format: str = "ndjson") -> StreamingResponse:
+    """
+    Потокова генерація: кожна нота кожної варіації надсилається одразу після семплінгу
+    (NDJSON або SSE), останньою подією йдуть назви MIDI-файлів. Генерація призупиняється,
+    якщо клієнт читає повільніше, ніж буфер на LSTM_STREAM_BUFFER_NOTES нот.
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="Підтримуються формати ndjson та sse")
+    logger.info(f"Отримано запит на потокову генерацію музики: темп={request.tempo}, "
+                f"кількість нот={request.num_predictions}, "
+                f"температура={request.temperature}, "
+                f"варіацій={request.variations}")
+
+    loop = asyncio.get_event_loop()
+    events = asyncio.Queue()
+    credits = threading.Semaphore(LSTM_STREAM_BUFFER_NOTES)
+    token = CancellationToken(GENERATION_DEADLINE_SECONDS)
+
+    def send_note(variation: int, session: GenerationSession, note: tuple) -> None:
+        pitch, step, duration_label, duration, start, end = note
+        payload = {
+            "variation": variation,
+            "index": session.count - 1,
+            "pitch": session.preview_pitch(pitch),
+            "step": step,
+            "duration_label": str(duration_label),
+            "duration": duration,
+            "start": start,
+            "end": end,
+        }
+        loop.call_soon_threadsafe(events.put_nowait, ("note", payload))
+
+    def decode_in_process(sessions: List[GenerationSession]) -> None:
+        def on_note(variation: int, note: tuple) -> None:
+            while not credits.acquire(timeout=0.1):
+                sessions[variation].check_cancelled()
+            send_note(variation, sessions[variation], note)
+
+        melody_generator.decode_batch(sessions, on_note)
+
+    async def decode_batched(sessions: List[GenerationSession]) -> None:
+        # Потік планувальника не блокується: поки буфер клієнта повний, сесії пропускають кроки
+        await asyncio.gather(*(
+            asyncio.wrap_future(batch_scheduler.submit(
+                session,
+                on_note=lambda note, variation=variation, session=session: send_note(variation, session, note),
+                ready=lambda: credits.acquire(blocking=False)
+            ))
+            for variation, session in enumerate(sessions)
+        ))
+
+    async def produce() -> None:
+        # Ноти потрібні клієнтові, тож потік генерує навіть за наявності результату в кеші,
+        # але сам заповнює кеш для /generate, якщо ніхто інший не обчислює цей ключ
+        key = None
+        if request.variations == 1:
+            key = melody_generator.cache_key(
+                request.start_notes,
+                request.num_predictions,
+                request.variation_temperatures()[0],
+                request.tempo,
+                request.seed,
+                request.top_k,
+                request.top_p
+            )
+        owner = False
+        if key is not None:
+            _, cache_future, owner = result_cache.claim(key)
+        try:
+            sessions = await loop.run_in_executor(
+                EXECUTOR,
+                melody_generator.start_variations,
+                request.start_notes,
+                request.num_predictions,
+                request.variation_temperatures(),
+                request.tempo,
+                request.seed,
+                request.top_k,
+                request.top_p,
+                token
+            )
+            if LSTM_BATCHING_ENABLED:
+                await decode_batched(sessions)
+            else:
+                await loop.run_in_executor(EXECUTOR, decode_in_process, sessions)
+            token.check()
+            rendered = [
+                await loop.run_in_executor(EXECUTOR, melody_generator.render_session, session)
+                for session in sessions
+            ]
+            if owner:
+                owner = False
+                result_cache.resolve(key, cache_future, value=rendered[0])
+            midi_files = [
+                await loop.run_in_executor(
+                    EXECUTOR,
+                    melody_generator.publish_midi,
+                    midi_bytes,
+                    variation if len(rendered) > 1 else None
+                )
+                for variation, midi_bytes in enumerate(rendered)
+            ]
+            logger.info(f"Мелодію успішно згенеровано: {', '.join(midi_files)}")
+            event = ("done", {
+                "message": "Мелодія згенерована успішно",
+                "midi_file": midi_files[0],
+                "midi_files": midi_files,
+            })
+        except GenerationCancelled as e:
+            if owner:
+                result_cache.resolve(key, cache_future, error=e)
+            metrics.increment(f'lstm_cancelled_{e.reason}')
+            logger.info(f"Потокову генерацію музики скасовано: {e.reason}")
+            if e.reason == CANCEL_DISCONNECTED:
+                return
+            event = ("error", {"detail": str(e)})
+        except Exception as e:
+            if owner:
+                result_cache.resolve(key, cache_future, error=e)
+            logger.error(f"Помилка при потоковій генерації музики: {str(e)}")
+            event = ("error", {"detail": str(e)})
+        events.put_nowait(event)
+
+    async def stream():
+        producer = asyncio.create_task(produce())
+        stream_producers.add(producer)
+        producer.add_done_callback(stream_producers.discard)
+        try:
+            while True:
+                event, payload = await events.get()
+                yield encode_stream_event(event, payload, format)
+                if event != "note":
+                    break
+                credits.release()
+        finally:
+            token.cancel(CANCEL_DISCONNECTED)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
@@ -0,0 +1,124 @@
+import importlib
+import json
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from common.constants import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS
+from generation.incremental_decoder_test import build_attention_lstm
+from utils.result_cache import ResultCache
+
+REQUEST = {
+    'num_predictions': 24,
+    'temperature': 1.0,
+    'tempo': 120,
+    'variations': 1,
+    'temperatures': [0.3],
+    'seed': 11,
+}
+
+
+@pytest.fixture(scope='module')
+def lstm_v2():
+    # Роутер завантажує модель під час імпорту; замість контрольної точки — модель тієї ж архітектури
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr('generation.lstm_generator.load_model', lambda path: build_attention_lstm())
+        module = importlib.import_module('routers.lstm_v2')
+    yield module
+    module.batch_scheduler.shutdown()
+
+
+@pytest.fixture
+def client(lstm_v2, monkeypatch):
+    uploads = []
+    monkeypatch.setattr(lstm_v2, 'upload_midi_bytes', lambda data, out_file: uploads.append(data) or out_file)
+    monkeypatch.setattr(lstm_v2, 'result_cache', ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS))
+    app = FastAPI()
+    app.include_router(lstm_v2.router, prefix='/v2/lstm')
+    with TestClient(app) as client:
+        client.uploads = uploads
+        yield client
+
+
+def render(lstm_v2, temperature: float) -> bytes:
+    return lstm_v2.melody_generator.render_melody(
+        None, REQUEST['num_predictions'], temperature, REQUEST['tempo'], REQUEST['seed']
+    )
+
+
+@pytest.mark.parametrize('batching', [False, True])
+def test_single_variation_uses_its_temperature_on_every_path(lstm_v2, client, monkeypatch, batching):
+    monkeypatch.setattr(lstm_v2, 'LSTM_BATCHING_ENABLED', batching)
+
+    response = client.post('/v2/lstm/generate', json=REQUEST)
+
+    assert response.status_code == 200
+    assert client.uploads == [render(lstm_v2, 0.3)]
+    assert client.uploads[0] != render(lstm_v2, REQUEST['temperature'])
+
+
+@pytest.mark.parametrize('batching', [False, True])
+def test_stream_uses_variation_temperature(lstm_v2, client, monkeypatch, batching):
+    monkeypatch.setattr(lstm_v2, 'LSTM_BATCHING_ENABLED', batching)
+
+    response = client.post('/v2/lstm/generate/stream', json=REQUEST)
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]['event'] == 'done'
+    assert len(events) == REQUEST['num_predictions'] + 1
+    assert client.uploads == [render(lstm_v2, 0.3)]
+
+
+@pytest.mark.parametrize('batching', [False, True])
+def test_stream_sends_every_variation(lstm_v2, client, monkeypatch, batching):
+    monkeypatch.setattr(lstm_v2, 'LSTM_BATCHING_ENABLED', batching)
+    request = {**REQUEST, 'variations': 2, 'temperatures': [0.3, 1.5]}
+
+    events = [json.loads(line) for line in client.post('/v2/lstm/generate/stream', json=request).text.splitlines()]
+    streamed = client.uploads[:]
+    client.uploads.clear()
+    client.post('/v2/lstm/generate', json=request)
+
+    notes = [event for event in events if event['event'] == 'note']
+    for variation in (0, 1):
+        assert [event['index'] for event in notes if event['variation'] == variation] == list(range(REQUEST['num_predictions']))
+    assert len(events[-1]['midi_files']) == 2
+    assert streamed == client.uploads
+
+
+def test_stream_fills_cache_for_generate(lstm_v2, client):
+    client.post('/v2/lstm/generate/stream', json=REQUEST)
+    response = client.post('/v2/lstm/generate', json=REQUEST)
+
+    assert response.status_code == 200
+    assert lstm_v2.result_cache.hits == 1
+    assert client.uploads == [render(lstm_v2, 0.3)] * 2
+
+
+@pytest.mark.parametrize('batching', [False, True])
+def test_job_decodes_on_the_same_path_as_generate(lstm_v2, client, monkeypatch, batching):
+    monkeypatch.setattr(lstm_v2, 'LSTM_BATCHING_ENABLED', batching)
+    decode_threads, submitted = [], []
+    decode_batch = lstm_v2.melody_generator.decode_batch
+    submit = lstm_v2.batch_scheduler.submit
+
+    def recording_decode_batch(*args):
+        decode_threads.append(threading.current_thread())
+        return decode_batch(*args)
+
+    monkeypatch.setattr(lstm_v2.melody_generator, 'decode_batch', recording_decode_batch)
+    monkeypatch.setattr(lstm_v2.batch_scheduler, 'submit', lambda *args, **kwargs: submitted.append(args) or submit(*args, **kwargs))
+    progress = []
+
+    result = lstm_v2.run_generate_job(REQUEST, lambda done, total: progress.append((done, total)))
+    job_decode_threads = decode_threads[:]
+
+    assert client.uploads == [render(lstm_v2, 0.3)]
+    assert result['midi_files'] == [result['midi_file']]
+    assert progress[0] == (0, 24) and progress[-1] == (24, 24) and (16, 24) in progress
+    if batching:
+        assert len(submitted) == 1 and not job_decode_threads
+    else:
+        assert not submitted and job_decode_threads[0] is not threading.current_thread()
@@ -0,0 +1,48 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from common.constants import CATEGORICAL_DATASET_PATH, DURATION_VOCABULARY_PATH
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def build_duration_vocabulary(dataset_path: str = CATEGORICAL_DATASET_PATH) -> tuple:
+    """Класи тривалостей у тому ж порядку, що й LabelEncoder, навчений на тренувальному датасеті."""
+    durations = pd.read_parquet(dataset_path, columns=['duration'])['duration']
+    return tuple(np.unique(durations.to_numpy()).tolist())
+
+def save_duration_vocabulary(classes: tuple, path: str = DURATION_VOCABULARY_PATH) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'durations': list(classes)}, f, ensure_ascii=False, indent=2)
+
+def load_duration_vocabulary(
+    path: str = DURATION_VOCABULARY_PATH,
+    dataset_path: str = CATEGORICAL_DATASET_PATH
+) -> tuple:
+    """
+    Завантажує словник класів тривалостей зі збереженого артефакту.
+    Якщо артефакту немає, будує словник з parquet-датасету.
+    """
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return tuple(json.load(f)['durations'])
+
+    logger.warning(f"Словник тривалостей {path} не знайдено, будуємо його з {dataset_path}")
+    return build_duration_vocabulary(dataset_path)
+
+def check_duration_vocabulary(classes: tuple, output_size: int) -> None:
+    """Перевіряє, що словник тривалостей відповідає розмірності виходу моделі."""
+    if len(classes) != output_size:
+        raise ValueError(
+            f"Словник тривалостей містить {len(classes)} класів, а вихід моделі 'duration' — {output_size}"
+        )
+
+
+if __name__ == '__main__':
+    vocabulary = build_duration_vocabulary()
+    save_duration_vocabulary(vocabulary)
+    logger.info(f"Словник тривалостей ({len(vocabulary)} класів) збережено у {DURATION_VOCABULARY_PATH}")
@@ -1,4 +1,7 @@
-from typing import Tuple
+from typing import Sequence, Tuple
+
+import numpy as np
+
 from utils.ffn_models.voice import Voice
 
 
@@ -64,3 +67,76 @@ class SongNoteRangeTracker:
             return self.apply_get_note(-1, song_segment)
 
         return self.apply_get_note(note_candidate, song_segment)
+
+
+def _pad_segments(song):
+    """Перетворює список сегментів різної довжини (до 4 нот) на масив (T, 4) і довжини сегментів."""
+    segments = np.zeros((len(song), 4), dtype=np.int64)
+    lengths = np.zeros(len(song), dtype=np.int64)
+    for song_position, song_segment in enumerate(song):
+        segments[song_position, :len(song_segment)] = song_segment
+        lengths[song_position] = len(song_segment)
+    return segments, lengths
+
+
+def assign_voice_notes(song, voices: Sequence[Voice]):
+    """
+    Визначає ноти кількох голосів для всієї пісні за один прохід; результат збігається
+    з послідовними викликами SongNoteRangeTracker.get_next_note для кожного голосу.
+
+    Сегмент із чотирьох нот (а такими є всі рядки масиву analyze_simultaneous_pitches)
+    не залежить від попередніх, тому такі сегменти обробляються векторно. Лише сегменти
+    з 1–3 нотами потребують попередньої ноти голосу й обробляються циклом по порядку.
+
+    Args:
+        song: Масив форми (T, 4) або послідовність сегментів з не більше ніж 4 нот
+        voices: Голоси, для яких визначаються ноти
+
+    Returns:
+        np.ndarray: Масив int64 форми (T, кількість голосів) з нотою голосу або -1 для паузи
+    """
+    if isinstance(song, np.ndarray):
+        segments = song.astype(np.int64, copy=False).reshape(-1, 4)
+        lengths = np.full(len(segments), 4, dtype=np.int64)
+    else:
+        segments, lengths = _pad_segments(song)
+
+    tuple_indexes = np.array([voice.tuple_index for voice in voices])
+    min_notes = np.array([voice.range.min_note for voice in voices])
+    max_notes = np.array([voice.range.max_note for voice in voices])
+
+    candidates = np.full((len(segments), len(voices)), -1, dtype=np.int64)
+    full = lengths == 4
+    candidates[full] = segments[full][:, tuple_indexes]
+    notes = np.where((candidates >= min_notes) & (candidates <= max_notes), candidates, -1)
+
+    for song_position in np.flatnonzero((lengths > 0) & (lengths < 4)).tolist():
+        song_segment = segments[song_position, :lengths[song_position]].tolist()
+        if song_position == 0:
+            prev_notes = [None] * len(voices)
+            prev_song_segment = None
+        else:
+            prev_notes = notes[song_position - 1].tolist()
+            prev_song_segment = segments[song_position - 1, :lengths[song_position - 1]].tolist()
+
+        for voice_index, voice in enumerate(voices):
+            note = _get_partial_segment_note(song_segment, prev_notes[voice_index], prev_song_segment, voice)
+            notes[song_position, voice_index] = note if voice.range.is_in_range(note) else -1
+
+    return notes
+
+
+def _get_partial_segment_note(song_segment, prev_note, prev_song_segment, voice: Voice):
+    """get_most_probable_note_in_segment для сегмента з 1–3 нотами."""
+    if prev_note in song_segment:
+        return prev_note
+
+    if prev_song_segment is None:
+        tuple_index = voice.tuple_index - (4 - len(song_segment))
+        return -1 if tuple_index < 0 else song_segment[tuple_index]
+
+    distance, target_note = min(((abs(prev_note - note), note) for note in song_segment), key=lambda dn: dn[0])
+    if any(abs(note - target_note) < distance for note in prev_song_segment):
+        return -1
+
+    return target_note
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from utils.ffn_models.song_note_range_tracker import SongNoteRangeTracker, assign_voice_notes
+from utils.ffn_models.voices import voices
+
+
+def tracker_notes(song):
+    columns = []
+    for voice in voices.values():
+        tracker = SongNoteRangeTracker(voice)
+        columns.append([tracker.get_next_note(tuple(song_segment)) for song_segment in song])
+    return np.array(columns, dtype=np.int64).T.reshape(len(song), len(voices))
+
+
+def random_segments(seed, length):
+    rng = np.random.default_rng(seed)
+    song = []
+    for _ in range(length):
+        notes_count = rng.choice([0, 1, 2, 3, 4], p=[0.05, 0.2, 0.25, 0.2, 0.3])
+        song.append(tuple(sorted(rng.integers(34, 84, notes_count).tolist())))
+    return song
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_segments_of_any_length_match_tracker(seed):
+    song = random_segments(seed, 300)
+    assert np.array_equal(assign_voice_notes(song, list(voices.values())), tracker_notes(song))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_padded_song_array_matches_tracker(seed):
+    song = np.sort(np.random.default_rng(seed).integers(0, 84, (500, 4)), axis=1)
+    song[::7, :2] = 0
+
+    assert np.array_equal(assign_voice_notes(song, list(voices.values())), tracker_notes(song))
+
+
+def test_partial_first_segments_and_rests_match_tracker():
+    song = [(65,), (), (60, 70), (60, 70), (55, 67, 80), (40,), (66, 67)]
+    assert np.array_equal(assign_voice_notes(song, list(voices.values())), tracker_notes(song))
@@ -1,3 +1,6 @@
+import numpy as np
+
+import utils.ffn_utils.constants as constants
 from utils.ffn_models.range import Range
 
 class Voice:
@@ -11,4 +14,10 @@ class Voice:
         if tensor_position == 0:
             return None
 
-        return tensor_position + self.range.min_note - 1
\ No newline at end of file
+        return tensor_position + self.range.min_note - 1
+
+    def get_tensor_position_notes(self):
+        """Таблиця позиція в тензорі → нота: SILENCE_NOTE для позиції 0, далі ноти діапазону."""
+        notes = np.arange(self.range.min_note - 1, self.range.max_note + 1, dtype=np.int16)
+        notes[0] = constants.SILENCE_NOTE
+        return notes
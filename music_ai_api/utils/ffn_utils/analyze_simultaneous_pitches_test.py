@@ -0,0 +1,134 @@
+import io
+from collections import defaultdict
+
+import mido
+import numpy as np
+import pytest
+
+from utils.ffn_utils.data_midi_loader import analyze_simultaneous_pitches
+
+
+def reference_analyze_simultaneous_pitches(midi_file):
+    """Попередня реалізація на словниках, з якою звіряється векторна."""
+    mid = mido.MidiFile(file=midi_file)
+    note_events = defaultdict(list)
+    active_notes = {}
+    for track in mid.tracks:
+        current_time = 0
+        for msg in track:
+            current_time += msg.time
+            if msg.type == 'note_on' and msg.velocity > 0:
+                active_notes[(msg.channel, msg.note)] = (msg.note, current_time)
+            elif (msg.type == 'note_off') or (msg.type == 'note_on' and msg.velocity == 0):
+                channel_note = (msg.channel, msg.note)
+                if channel_note in active_notes:
+                    note_pitch, start_time = active_notes[channel_note]
+                    note_events[start_time].append({"event": "note_on", "pitch": note_pitch, "channel": msg.channel})
+                    note_events[current_time].append({"event": "note_off", "pitch": note_pitch, "channel": msg.channel})
+                    del active_notes[channel_note]
+
+    active_notes_at_time = {}
+    currently_active = set()
+    for t in sorted(note_events.keys()):
+        for event in note_events[t]:
+            if event["event"] == "note_on":
+                currently_active.add((event["pitch"], event["channel"]))
+            elif (event["pitch"], event["channel"]) in currently_active:
+                currently_active.remove((event["pitch"], event["channel"]))
+        active_notes_at_time[t] = [pitch for pitch, _ in currently_active]
+
+    unique_combinations = {}
+    prev_pitches = None
+    for t in sorted(active_notes_at_time.keys()):
+        current_pitches = tuple(sorted(active_notes_at_time[t]))
+        if current_pitches != prev_pitches and len(current_pitches) > 0:
+            unique_combinations[t] = list(current_pitches)
+        prev_pitches = current_pitches
+
+    result_arrays = []
+    for t in sorted(unique_combinations.keys()):
+        pitches = unique_combinations[t]
+        while len(pitches) < 4:
+            pitches.append(0)
+        result_arrays.append(pitches[:4])
+    return result_arrays
+
+
+def build_midi(tracks):
+    """Кожна доріжка — список (абсолютний час, тип, висота, канал[, швидкість])."""
+    midi = mido.MidiFile()
+    for events in tracks:
+        track = mido.MidiTrack()
+        previous = 0
+        for event in sorted(events, key=lambda e: e[0]):
+            time, kind, note, channel = event[:4]
+            velocity = event[4] if len(event) > 4 else (0 if kind == 'note_off' else 80)
+            track.append(mido.Message(kind, note=note, channel=channel, velocity=velocity, time=time - previous))
+            previous = time
+        midi.tracks.append(track)
+    data = io.BytesIO()
+    midi.save(file=data)
+    return data.getvalue()
+
+
+def notes(*specs):
+    """(початок, кінець, висота[, канал]) → події note_on/note_off."""
+    events = []
+    for spec in specs:
+        start, end, note = spec[:3]
+        channel = spec[3] if len(spec) > 3 else 0
+        events += [(start, 'note_on', note, channel), (end, 'note_off', note, channel)]
+    return events
+
+
+def random_tracks(seed, tracks=3, notes_per_track=120, channels=2):
+    rng = np.random.default_rng(seed)
+    result = []
+    for _ in range(tracks):
+        events = []
+        for _ in range(notes_per_track):
+            start = int(rng.integers(0, 4000)) // 60 * 60
+            length = int(rng.integers(0, 8)) * 60
+            note = int(rng.integers(40, 90))
+            channel = int(rng.integers(0, channels))
+            velocity_off = 'note_on' if rng.random() < 0.3 else 'note_off'
+            events.append((start, 'note_on', note, channel))
+            if rng.random() > 0.05:
+                events.append((start + length, velocity_off, note, channel, 0))
+        result.append(events)
+    return result
+
+
+FIXTURES = {
+    'empty': [[]],
+    'single_note': [notes((0, 480, 60))],
+    'chords': [notes(*[(i * 480, (i + 1) * 480, p) for i in range(8) for p in (48 + i, 55 + i, 64 + i, 72 + i)])],
+    'more_than_four_voices': [notes((0, 960, 40), (0, 960, 45), (0, 480, 50), (0, 960, 55), (0, 960, 60), (480, 960, 52))],
+    'restrike_same_key': [notes((0, 480, 60), (480, 960, 60), (240, 720, 64))],
+    'note_on_velocity_zero': [[(0, 'note_on', 60, 0), (240, 'note_on', 64, 0), (480, 'note_on', 60, 0, 0), (720, 'note_on', 64, 0, 0)]],
+    'unclosed_and_stray_off': [[(0, 'note_on', 60, 0), (0, 'note_on', 67, 0), (480, 'note_off', 67, 0), (600, 'note_off', 70, 0)]],
+    'double_note_on': [[(0, 'note_on', 60, 0), (240, 'note_on', 60, 0), (480, 'note_off', 60, 0), (300, 'note_on', 62, 0), (700, 'note_off', 62, 0)]],
+    'zero_length_notes': [notes((0, 0, 60), (0, 480, 64), (480, 480, 67), (240, 240, 62))],
+    'same_pitch_two_channels': [notes((0, 480, 60, 0), (240, 720, 60, 1), (480, 960, 64, 1))],
+    'overlap_across_tracks': [notes((0, 960, 60), (0, 960, 48)), notes((240, 480, 60), (480, 720, 55))],
+    'multi_track_chorale': [
+        notes(*[(i * 240, (i + 1) * 240, 72 + i % 5) for i in range(32)]),
+        notes(*[(i * 480, (i + 1) * 480, 64 + i % 3) for i in range(16)]),
+        notes(*[(i * 480, (i + 1) * 480, 57 - i % 4) for i in range(16)]),
+        notes(*[(i * 960, (i + 1) * 960, 45 + i % 2) for i in range(8)]),
+    ],
+    **{f'random_{seed}': random_tracks(seed) for seed in range(8)},
+    'random_many_channels': random_tracks(100, tracks=6, notes_per_track=300, channels=8),
+}
+
+
+@pytest.mark.parametrize('name', FIXTURES)
+def test_matches_reference_implementation(name):
+    data = build_midi(FIXTURES[name])
+
+    expected = np.array(reference_analyze_simultaneous_pitches(io.BytesIO(data)), dtype=np.int64).reshape(-1, 4)
+    actual = analyze_simultaneous_pitches(io.BytesIO(data))
+
+    assert actual.dtype == np.int64
+    assert actual.shape == expected.shape
+    assert np.array_equal(actual, expected)
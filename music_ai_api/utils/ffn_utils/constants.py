@@ -1,4 +1,6 @@
 SILENCE_INDEX = 0
+# Нота голосу в декодованій гармонії, що позначає паузу
+SILENCE_NOTE = -1
 
 SEQUENCE_LENGTH = 16 * 4 # Four measure of 16 notes segments
 
@@ -1,168 +1,204 @@
-from utils.ffn_utils.dataset_one_hot_encoder import get_to_one_hot_encoding
-from utils.ffn_utils.sequence_length_splitter import split_into_sequences
-from utils.ffn_models.voices import voices
-from utils.ffn_models.chorales_dataset import ChoralesDataset
+import io
 import os
+import zipfile
+from typing import BinaryIO
+
 import numpy as np
+from mido import MidiFile
+
+from utils.ffn_utils.dataset_one_hot_encoder import get_voice_indexes
+from utils.ffn_models.voices import voices
+from common.constants import FFN_BATCH_MAX_FILES, MIDI_UPLOAD_MAX_BYTES
 from utils.logger import setup_logger
-import tempfile
-import shutil
 
 logger = setup_logger(__name__)
 
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Завантажений файл перевищує MIDI_UPLOAD_MAX_BYTES."""
+
+
+class TooManyFiles(ValueError):
+    """Запит або архів містить більше MIDI-файлів, ніж дозволено."""
+
+
+class EmptyMelody(ValueError):
+    """У MIDI-файлі немає жодної ноти, тож гармонізувати нічого."""
+
 
-def load_custom_midi_data(file, test_size=0.2, random_seed=42):
+def read_midi_upload(stream: BinaryIO, max_bytes: int = MIDI_UPLOAD_MAX_BYTES) -> bytes:
     """
-    Завантажує дані з одного MIDI-файлу (UploadFile), дублює його до 4 файлів і формує датасет.
-    
-    Args:
-        file (UploadFile): MIDI-файл, отриманий через HTTP-запит.
-        test_size (float): Частка тестових даних.
-        random_seed (int): Зерно для випадкового розподілу.
-        
-    Returns:
-        tuple: MIDI-дані та об'єкт ChoralesDataset.
+    Читає завантажений файл у пам'ять один раз, частинами, не більше max_bytes.
+    FastAPI зберігає великі завантаження в SpooledTemporaryFile на диску, тому файл,
+    що перевищує ліміт, не читається в пам'ять повністю.
+    Raises:
+        UploadTooLarge: Якщо файл більший за max_bytes
     """
-    # Створення структури даних для пісень
-    sequence_data = {'soprano': [], 'alto': [], 'tenor': [], 'bass': []}
+    stream.seek(0)
+    data = io.BytesIO()
+    while chunk := stream.read(READ_CHUNK_SIZE):
+        data.write(chunk)
+        if data.tell() > max_bytes:
+            raise UploadTooLarge(f"Розмір MIDI-файлу перевищує {max_bytes // 1024} КБ")
+    stream.seek(0)
+    return data.getvalue()
 
-    # Створюємо тимчасову директорію для файлів
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        # Зберігаємо отриманий файл у тимчасову директорію
-        base_filename = os.path.splitext(file.filename)[0]
-        midi_filenames = []
-        for i in range(4):
-            midi_filename = f"{base_filename}_copy{i+1}.mid"
-            midi_path = os.path.join(tmpdirname, midi_filename)
-            logger.debug(f"Зберігаємо файл {midi_filename} у {tmpdirname}")
-            file.file.seek(0)
-            with open(midi_path, "wb") as out_f:
-                shutil.copyfileobj(file.file, out_f)
-            midi_filenames.append(midi_filename)
-        # Після запису файлу file.file потрібно повернутися на початок для подальших читань
-        file.file.seek(0)
 
-        logger.debug(f"Підготовлено {len(midi_filenames)} копій MIDI-файлу для обробки")
+def is_midi_filename(filename: str) -> bool:
+    return filename.lower().endswith('.mid')
 
-        midi_data_all = []
 
-        for idx, midi_file in enumerate(midi_filenames):
-            midi_file_path = os.path.join(tmpdirname, midi_file)
-            logger.debug(f"Обробка файлу {idx+1}/4: {midi_file}")
+def read_midi_archive(
+    archive_bytes: bytes,
+    max_files: int = FFN_BATCH_MAX_FILES,
+    max_bytes: int = MIDI_UPLOAD_MAX_BYTES
+) -> list[tuple[str, bytes | None, str | None]]:
+    """
+    Виймає MIDI-файли з zip-архіву. Інші файли та службові каталоги пропускаються,
+    а файл, більший за max_bytes, не розпаковується й повертається з помилкою.
+    Кількість MIDI-файлів перевіряється за центральним каталогом архіву, до розпакування.
 
-            midi_data = analyze_simultaneous_pitches(midi_file_path)
-            midi_data_all.append(midi_data)
+    Args:
+        max_files: Скільки MIDI-файлів ще можна прийняти (для пакетного запиту — залишок його ліміту)
+    Returns:
+        list: Кортежі (шлях в архіві, вміст або None, помилка або None)
+    Raises:
+        zipfile.BadZipFile: Якщо вміст не є zip-архівом
+        TooManyFiles: Якщо MIDI-файлів в архіві більше за max_files
+    """
+    entries = []
+    with zipfile.ZipFile(io.BytesIO(archive_bytes)) as archive:
+        infos = [
+            info for info in archive.infolist()
+            if not info.is_dir() and is_midi_filename(info.filename)
+            and not info.filename.startswith('__MACOSX/') and not os.path.basename(info.filename).startswith('.')
+        ]
+        if len(infos) > max_files:
+            raise TooManyFiles(f"Архів містить {len(infos)} MIDI-файлів, дозволено не більше {max_files}")
 
-            song = midi_data
+        for info in infos:
+            too_large = f"Розмір MIDI-файлу перевищує {max_bytes // 1024} КБ"
+            if info.file_size > max_bytes:
+                entries.append((info.filename, None, too_large))
+                continue
+            # Розмір у заголовку може не відповідати вмісту, тому читання теж обмежене
+            with archive.open(info) as entry:
+                data = entry.read(max_bytes + 1)
+            entries.append((info.filename, None, too_large) if len(data) > max_bytes else (info.filename, data, None))
+    return entries
 
-            for voice in voices.values():
-                one_hot_encoding = get_to_one_hot_encoding(song, voice)
-                sequences_split = split_into_sequences(one_hot_encoding)
-                sequence_data[voice.name] += sequences_split
 
-        return (
-            midi_data_all,
-            ChoralesDataset(sequence_data)
-        )
+def load_soprano_melody(midi_bytes: bytes):
+    """
+    Розбирає MIDI-файл і повертає всю мелодію сопрано як індекси нот.
 
+    Returns:
+        np.ndarray: Масив uint8 довжини (кількість сегментів)
+    Raises:
+        EmptyMelody: Якщо у файлі немає жодного сегмента
+    """
+    song = analyze_simultaneous_pitches(io.BytesIO(midi_bytes))
+    if len(song) == 0:
+        raise EmptyMelody("Мелодія не містить жодного сегмента")
+    return get_voice_indexes(song, voices['soprano'])
 
-from mido import MidiFile
-import numpy as np
-from collections import defaultdict
 
-def analyze_simultaneous_pitches(midi_file_path):
+# Скільки найнижчих одночасних висот потрапляє в сегмент пісні
+SEGMENT_VOICES = 4
+
+
+def extract_note_events(mid: MidiFile):
     """
-    Аналізує MIDI-файл і визначає pitch-значення нот, які звучать одночасно.
-    
-    Args:
-        midi_file_path (str): Шлях до MIDI-файлу.
-        
+    Виділяє завершені ноти MIDI-файлу в масиви подій.
+
+    Нота, увімкнена повторно до вимкнення, починається з останнього note_on; ноти без
+    note_off відкидаються. Події впорядковано за часом, а в межах одного моменту — за
+    порядком вимкнення нот (увімкнення ноти йде безпосередньо перед її вимкненням).
+
     Returns:
-        list: Список масивів з 4 елементів, що представляють одночасні pitch-значення.
+        tuple: Масиви однакової довжини (time, pitch, channel, delta), де delta дорівнює
+        1 для увімкнення і -1 для вимкнення ноти
     """
-    # Завантаження MIDI-файлу
-    mid = MidiFile(midi_file_path)
-    
-    # Створюємо словник для зберігання нот (активних і вимкнених) за часом
-    note_events = defaultdict(list)
-    
-    # Поточний час у тіках
-    current_time = 0
-    
-    # Словник для відстеження активних нот по каналах
     active_notes = {}
-    
-    # Обробка повідомлень MIDI
+    starts, ends, pitches, channels = [], [], [], []
+
     for track in mid.tracks:
         current_time = 0
         for msg in track:
             current_time += msg.time
-            
-            # Перевіряємо, чи це повідомлення note_on або note_off
             if msg.type == 'note_on' and msg.velocity > 0:
-                # Нота включена
-                channel_note = (msg.channel, msg.note)
-                active_notes[channel_note] = (msg.note, current_time)  # Зберігаємо pitch замість назви
-                
-            elif (msg.type == 'note_off') or (msg.type == 'note_on' and msg.velocity == 0):
-                # Нота виключена
-                channel_note = (msg.channel, msg.note)
-                if channel_note in active_notes:
-                    note_pitch, start_time = active_notes[channel_note]
-                    
-                    # Додаємо подію включення ноти з pitch
-                    note_events[start_time].append({"event": "note_on", "pitch": note_pitch, "channel": msg.channel})
-                    
-                    # Додаємо подію виключення ноти з pitch
-                    note_events[current_time].append({"event": "note_off", "pitch": note_pitch, "channel": msg.channel})
-                    
-                    # Видаляємо ноту з активних
-                    del active_notes[channel_note]
-    
-    # Знаходимо всі унікальні часові точки подій
-    time_points = sorted(note_events.keys())
-    
-    # Створюємо словник для зберігання активних нот у кожен момент часу
-    active_notes_at_time = {}
-    currently_active = set()
-    
-    # Проходимо через всі часові точки
-    for t in time_points:
-        # Обробляємо події в цій часовій точці
-        for event in note_events[t]:
-            if event["event"] == "note_on":
-                currently_active.add((event["pitch"], event["channel"]))
-            elif event["event"] == "note_off":
-                if (event["pitch"], event["channel"]) in currently_active:
-                    currently_active.remove((event["pitch"], event["channel"]))
-        
-        # Зберігаємо поточний набір активних pitch
-        active_notes_at_time[t] = [pitch for pitch, _ in currently_active]
-    
-    # Фільтруємо, щоб залишити лише точки з унікальними наборами нот
-    unique_combinations = {}
-    prev_pitches = None
-    
-    for t in sorted(active_notes_at_time.keys()):
-        current_pitches = tuple(sorted(active_notes_at_time[t]))
-        if current_pitches != prev_pitches and len(current_pitches) > 0:
-            unique_combinations[t] = list(current_pitches)
-        prev_pitches = current_pitches
-    
-    # Формуємо результат як список масивів по 4 елементи
-    result_arrays = []
-    
-    for t in sorted(unique_combinations.keys()):
-        pitches = unique_combinations[t]
-        
-        # Якщо кількість нот менше 4, доповнюємо нулями
-        while len(pitches) < 4:
-            pitches.append(0)
-        
-        # Якщо кількість нот більше 4, обрізаємо до 4
-        if len(pitches) > 4:
-            pitches = pitches[:4]
-        
-        result_arrays.append(pitches)
-    
-    return result_arrays
\ No newline at end of file
+                active_notes[(msg.channel, msg.note)] = current_time
+            elif msg.type == 'note_off' or msg.type == 'note_on':
+                start_time = active_notes.pop((msg.channel, msg.note), None)
+                if start_time is not None:
+                    starts.append(start_time)
+                    ends.append(current_time)
+                    pitches.append(msg.note)
+                    channels.append(msg.channel)
+
+    notes_count = len(starts)
+    time = np.empty(2 * notes_count, dtype=np.int64)
+    time[0::2] = starts
+    time[1::2] = ends
+    pitch = np.repeat(np.array(pitches, dtype=np.int64), 2)
+    channel = np.repeat(np.array(channels, dtype=np.int64), 2)
+    delta = np.tile(np.array([1, -1], dtype=np.int8), notes_count)
+
+    # Стабільне сортування зберігає порядок подій в одному моменті
+    order = np.argsort(time, kind='stable')
+    return time[order], pitch[order], channel[order], delta[order]
+
+
+def analyze_simultaneous_pitches(midi_file):
+    """
+    Аналізує MIDI-файл і визначає pitch-значення нот, які звучать одночасно.
+
+    Для кожного моменту початку чи кінця ноти обчислюється набір висот, що звучать
+    (кожна пара висота–канал враховується один раз). Зберігаються лише моменти, де
+    набір непорожній і відрізняється від попереднього.
+
+    Args:
+        midi_file (str | BinaryIO): Шлях до MIDI-файлу або файлоподібний об'єкт з його вмістом.
+
+    Returns:
+        np.ndarray: Масив форми (T, 4) з чотирма найнижчими висотами кожного набору
+        за зростанням, доповнений нулями.
+    """
+    mid = MidiFile(file=midi_file) if hasattr(midi_file, 'read') else MidiFile(midi_file)
+    time, pitch, channel, delta = extract_note_events(mid)
+    if len(time) == 0:
+        return np.zeros((0, SEGMENT_VOICES), dtype=np.int64)
+
+    # Пара висота–канал звучить, якщо її остання подія — увімкнення, тому зміна
+    # стану дорівнює різниці між поточною та попередньою подією тієї ж пари
+    key = channel * 128 + pitch
+    by_key = np.argsort(key, kind='stable')
+    is_on = (delta[by_key] > 0).astype(np.int8)
+    was_on = np.zeros_like(is_on)
+    same_key = key[by_key][1:] == key[by_key][:-1]
+    was_on[1:][same_key] = is_on[:-1][same_key]
+    state_change = np.empty_like(is_on)
+    state_change[by_key] = is_on - was_on
+
+    time_points, time_index = np.unique(time, return_inverse=True)
+    counts = np.zeros((len(time_points), 128), dtype=np.int8)
+    np.add.at(counts, (time_index, pitch), state_change)
+    np.cumsum(counts, axis=0, out=counts)
+
+    # Момент потрапляє в результат, якщо набір висот змінився і не порожній
+    changed = np.ones(len(time_points), dtype=bool)
+    changed[1:] = np.any(counts[1:] != counts[:-1], axis=1)
+    totals = counts.sum(axis=1, dtype=np.int64)
+    kept = changed & (totals > 0)
+    counts = counts[kept]
+    totals = totals[kept]
+
+    # k-та найнижча висота — перша, на якій накопичена кількість висот перевищує k
+    cumulative = np.cumsum(counts, axis=1, dtype=np.int16)
+    result = np.zeros((len(counts), SEGMENT_VOICES), dtype=np.int64)
+    for voice_index in range(SEGMENT_VOICES):
+        present = totals > voice_index
+        result[present, voice_index] = np.argmax(cumulative[present] > voice_index, axis=1)
+    return result
@@ -0,0 +1,80 @@
+import io
+import zipfile
+
+import mido
+import numpy as np
+import pytest
+
+from utils.ffn_utils.data_midi_loader import (
+    EmptyMelody,
+    TooManyFiles,
+    UploadTooLarge,
+    analyze_simultaneous_pitches,
+    load_soprano_melody,
+    read_midi_archive,
+    read_midi_upload
+)
+
+
+def make_midi_bytes(chords, ticks=240):
+    track = mido.MidiTrack()
+    for chord in chords:
+        for note in chord:
+            track.append(mido.Message('note_on', note=note, velocity=80, time=0))
+        for index, note in enumerate(chord):
+            track.append(mido.Message('note_off', note=note, velocity=0, time=ticks if index == 0 else 0))
+    midi = mido.MidiFile()
+    midi.tracks.append(track)
+    data = io.BytesIO()
+    midi.save(file=data)
+    return data.getvalue()
+
+
+CHORDS = [(72, 64, 55, 48), (74, 65, 57, 50), (76, 67, 60, 48), (72, 64, 55, 43)] * 20
+
+
+def test_file_like_parse_matches_path(tmp_path):
+    data = make_midi_bytes(CHORDS)
+    path = tmp_path / 'song.mid'
+    path.write_bytes(data)
+
+    assert np.array_equal(analyze_simultaneous_pitches(io.BytesIO(data)), analyze_simultaneous_pitches(str(path)))
+
+
+def test_file_without_notes_has_no_melody():
+    with pytest.raises(EmptyMelody):
+        load_soprano_melody(make_midi_bytes([]))
+
+
+def test_upload_is_read_under_size_cap():
+    data = make_midi_bytes(CHORDS)
+    stream = io.BytesIO(data)
+    assert read_midi_upload(stream, max_bytes=len(data)) == data
+    assert stream.tell() == 0
+
+    with pytest.raises(UploadTooLarge):
+        read_midi_upload(io.BytesIO(data), max_bytes=len(data) - 1)
+
+
+def make_archive(entries):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+    return data.getvalue()
+
+
+def test_archive_yields_midi_entries_and_flags_oversized_ones():
+    song = make_midi_bytes(CHORDS)
+    archive = make_archive([
+        ('book/a.mid', song), ('book/readme.txt', b'text'), ('__MACOSX/book/._a.mid', b'meta'),
+        ('book/b.MID', make_midi_bytes(CHORDS * 3)), ('c.mid', song)
+    ])
+
+    entries = read_midi_archive(archive, max_files=3, max_bytes=len(song))
+
+    assert [name for name, _, _ in entries] == ['book/a.mid', 'book/b.MID', 'c.mid']
+    assert entries[0] == ('book/a.mid', song, None)
+    assert entries[1][1] is None and entries[1][2]
+    with pytest.raises(TooManyFiles):
+        read_midi_archive(archive, max_files=2, max_bytes=len(song))
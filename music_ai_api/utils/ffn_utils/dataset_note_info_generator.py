@@ -1,4 +1,6 @@
 from typing import List
+
+import utils.ffn_utils.constants as constants
 from utils.ffn_models.note_info import NoteInfo
 
 
@@ -28,7 +30,7 @@ def get_track_notes(dataset_song, track_number: int) -> List[NoteInfo]:
 
     for pos, note_length, note_number in get_next_note_duration_and_note(dataset_song, track_number):
 
-        if note_number == None:
+        if note_number is None or note_number == constants.SILENCE_NOTE:
             continue
 
         note_info = NoteInfo.create(pos, note_length, note_number)
@@ -1,22 +1,22 @@
 import numpy as np
 import utils.ffn_utils.constants as constants
-from utils.ffn_models.song_note_range_tracker import SongNoteRangeTracker
+from utils.ffn_models.song_note_range_tracker import assign_voice_notes
 from utils.ffn_models.voice import Voice
 
 
-def get_to_one_hot_encoding(song: list, voice: Voice):
-    one_hot_encoding = np.zeros((len(song), voice.range.range_and_silence_length()))
-    note_range_tracker = SongNoteRangeTracker(voice)
+def notes_to_indexes(notes: np.ndarray, min_notes) -> np.ndarray:
+    """Нота голосу → позиція в діапазоні (нота - min_note + 1), пауза (-1) → SILENCE_INDEX."""
+    return np.where(notes == -1, constants.SILENCE_INDEX, notes - min_notes + 1).astype(np.uint8)
 
-    for song_position, song_segment in enumerate(song):
-        voice_note = note_range_tracker.get_next_note(song_segment)
 
-        if voice_note == -1:
-            one_hot_encoding[song_position][constants.SILENCE_INDEX] = 1
-            continue
+def get_voice_indexes(song, voice: Voice):
+    """
+    Кодує партію голосу як позиції нот у діапазоні голосу: SILENCE_INDEX для паузи,
+    інакше нота - min_note + 1. One-hot формується лише на вході мережі.
 
-        hot_encoding_note_pos = voice_note - voice.range.min_note + 1
-        one_hot_encoding[song_position][hot_encoding_note_pos] = 1
+    Returns:
+        np.ndarray: Масив uint8 довжини len(song)
+    """
+    notes = assign_voice_notes(song, [voice])[:, 0]
+    return notes_to_indexes(notes, voice.range.min_note)
 
-
-    return one_hot_encoding
\ No newline at end of file
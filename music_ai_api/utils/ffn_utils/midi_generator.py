@@ -1,6 +1,7 @@
+import io
 from typing import List
 from mido import Message, MetaMessage, MidiFile, MidiTrack
-from utils.ffn_utils.cloudinary_utils import upload_mido_midi
+from utils.ffn_utils.cloudinary_utils import upload_midi_bytes
 from utils.ffn_utils.midi_message_generator import MidiMessageGenerator
 from utils.ffn_models.note_info import NoteInfo
 
@@ -27,7 +28,12 @@ def get_tempo_track(qpm):
     tempo_track.append(MetaMessage('set_tempo', tempo=tempo_in_microseconds, time=0))
     return tempo_track
 
-def generate_midi(name, track_note_infos: List[List[NoteInfo]], qpm: int = 120):
-    midi_file = get_midi_file(track_note_infos, qpm)
-    upload_mido_midi(mid=midi_file, out_file=name)
-    midi_file.save(name)
+def get_midi_bytes(track_note_infos: List[List[NoteInfo]], qpm: int = 120) -> bytes:
+    midi_io = io.BytesIO()
+    get_midi_file(track_note_infos, qpm).save(file=midi_io)
+    return midi_io.getvalue()
+
+def save_midi_bytes(name, data: bytes):
+    upload_midi_bytes(data, out_file=name)
+    with open(name, 'wb') as f:
+        f.write(data)
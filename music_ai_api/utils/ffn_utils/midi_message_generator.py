@@ -1,7 +1,9 @@
 from typing import List
-from utils.ffn_models.note_info import NoteInfo
+
+import numpy as np
 from mido import Message
-from ordered_set import OrderedSet
+
+from utils.ffn_models.note_info import NoteInfo
 
 # Дефолтний темп 120 BPM.
 # (500000 microseconds per beat (четвертна нота).)
@@ -11,82 +13,42 @@ PULSE_PER_QUARTE_NOTE = 480
 beat_length_ms = PULSE_PER_QUARTE_NOTE
 
 
-def get_event_positions(note_infos: List[NoteInfo]):
-    event_positions = list()
-
-    for note_info in note_infos:
-        event_positions.append(note_info.starting_beat)
-        event_positions.append(note_info.starting_beat + note_info.length)
-
-    event_positions.sort()
-
-    return OrderedSet(event_positions)
-
-def get_position_delta_from_previous_notes(position: float, previous_notes: List[NoteInfo]):
-    if len(previous_notes) == 0:
-        return position
-
-    smallest_distance_from_position = 999999
-    for note in previous_notes:
-        note_start = note.starting_beat
-        if note_start > position:
-            continue
-
-        smallest_distance_from_position = min(smallest_distance_from_position, position - note_start)
-
-        note_end = note.starting_beat + note.length
-        if note_end >= position:
-            continue
-
-        smallest_distance_from_position = min(smallest_distance_from_position, position - note_end)
-
+def get_note_events(note_infos: List[NoteInfo]):
+    """
+    Будує впорядкований індекс подій доріжки.
 
-    return smallest_distance_from_position
+    Кожна нота дає дві події: увімкнення на початку і вимкнення в кінці (нота нульової
+    довжини — два увімкнення). Події впорядковано за позицією, а в межах однієї позиції —
+    за порядком нот у note_infos, увімкнення ноти перед її вимкненням.
 
-def get_notes_for_position(position: float, note_infos: List[NoteInfo]):
-    for note in note_infos:
-        note_start = note.starting_beat
-        note_end = note.starting_beat + note.length
+    Returns:
+        tuple: Масиви однакової довжини (позиція в долях, увімкнення, висота)
+    """
+    starts = np.array([note.starting_beat for note in note_infos], dtype=np.float64)
+    ends = starts + np.array([note.length for note in note_infos], dtype=np.float64)
+    pitches = np.array([note.pitch for note in note_infos], dtype=np.int64)
 
-        if note_end > position and note_start > position:
-            break
+    positions = np.empty(2 * len(note_infos), dtype=np.float64)
+    positions[0::2] = starts
+    positions[1::2] = ends
+    is_on = np.empty(2 * len(note_infos), dtype=bool)
+    is_on[0::2] = True
+    is_on[1::2] = ends == starts
 
-        if note_start == position:
-            yield note
+    # Стабільне сортування зберігає порядок нот і подій однієї ноти в кожній позиції
+    order = np.argsort(positions, kind='stable')
+    return positions[order], is_on[order], np.repeat(pitches, 2)[order]
 
-        if note_end == position:
-            yield note
-
-
-def get_notes_and_midi_events_for_position(position: float,
-                                           previous_notes: List[NoteInfo],
-                                           note_infos: List[NoteInfo],
-                                           track_number):
-    exhausted_delta = False
-    position_delta = get_position_delta_from_previous_notes(position, previous_notes)
-
-    used_notes = []
-    midi_events = []
-
-    for note in get_notes_for_position(position, note_infos):
-        used_notes.append(note)
-
-        note_start = note.starting_beat
-
-        relative_position = int(position_delta * beat_length_ms) if not exhausted_delta else 0
-        message_type = 'note_on' if note_start == position else 'note_off'
-        note_pitch = note.pitch
-        velocity = 64 if note_start == position else 0
-
-        exhausted_delta = True
-
-        message = Message(message_type, note=note_pitch, velocity=velocity, time=relative_position, channel=track_number)
-        midi_events.append(message)
-
-
-
-    return used_notes, midi_events
 
+def get_event_times(positions: np.ndarray):
+    """
+    Час кожної події в тіках від попередньої: перша подія позиції отримує відстань
+    до попередньої позиції (до нуля для першої), решта подій тієї ж позиції — 0.
+    """
+    first_at_position = np.ones(len(positions), dtype=bool)
+    first_at_position[1:] = positions[1:] != positions[:-1]
+    position_deltas = np.diff(positions, prepend=0.0)
+    return np.where(first_at_position, (position_deltas * beat_length_ms).astype(np.int64), 0)
 
 
 class MidiMessageGenerator():
@@ -95,14 +57,10 @@ class MidiMessageGenerator():
         self.track_number = track_number
 
     def get_midi_note_messages(self):
+        positions, is_on, pitches = get_note_events(self.note_infos)
+        times = get_event_times(positions)
 
-        event_positions = get_event_positions(self.note_infos)
-        previous_notes = []
-
-        for cur_pos in event_positions:
-            used_notes, midi_events = get_notes_and_midi_events_for_position(cur_pos, previous_notes, self.note_infos,
-            self.track_number)
-
-            previous_notes = used_notes
-            for midi_event in midi_events:
-                yield midi_event
+        for note_on, note_pitch, relative_position in zip(is_on.tolist(), pitches.tolist(), times.tolist()):
+            message_type = 'note_on' if note_on else 'note_off'
+            velocity = 64 if note_on else 0
+            yield Message(message_type, note=note_pitch, velocity=velocity, time=relative_position, channel=self.track_number)
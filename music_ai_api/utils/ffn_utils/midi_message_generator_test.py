@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from utils.ffn_models.note_info import NoteInfo
+from utils.ffn_utils.dataset_note_info_generator import generate_note_info
+from utils.ffn_utils.midi_message_generator import MidiMessageGenerator
+
+
+def reference_midi_note_messages(note_infos, track_number):
+    """Попередня реалізація з повним переглядом нот для кожної позиції."""
+    event_positions = sorted(
+        [note.starting_beat for note in note_infos] + [note.starting_beat + note.length for note in note_infos]
+    )
+    previous_notes = []
+    for position in dict.fromkeys(event_positions):
+        if len(previous_notes) == 0:
+            position_delta = position
+        else:
+            position_delta = 999999
+            for note in previous_notes:
+                if note.starting_beat > position:
+                    continue
+                position_delta = min(position_delta, position - note.starting_beat)
+                if note.starting_beat + note.length >= position:
+                    continue
+                position_delta = min(position_delta, position - (note.starting_beat + note.length))
+
+        used_notes = []
+        for note in note_infos:
+            note_end = note.starting_beat + note.length
+            if note_end > position and note.starting_beat > position:
+                break
+            for matches in (note.starting_beat == position, note_end == position):
+                if not matches:
+                    continue
+                is_on = note.starting_beat == position
+                time = int(position_delta * 480) if not used_notes else 0
+                used_notes.append(note)
+                yield ('note_on' if is_on else 'note_off', note.pitch, 64 if is_on else 0, time, track_number)
+        previous_notes = used_notes
+
+
+def as_tuples(messages):
+    return [(m.type, m.note, m.velocity, m.time, m.channel) for m in messages]
+
+
+def random_song(seed, length):
+    rng = np.random.default_rng(seed)
+    song = rng.integers(36, 82, (length, 4))
+    song[rng.random((length, 4)) < 0.2] = -1
+    # Довгі ноти: сегмент повторює попередній
+    repeat = rng.random(length) < 0.5
+    for position in np.flatnonzero(repeat[1:]) + 1:
+        song[position] = song[position - 1]
+    return song
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_harmony_tracks_match_reference(seed):
+    for track_number, note_infos in enumerate(generate_note_info(random_song(seed, 400))):
+        assert as_tuples(MidiMessageGenerator(note_infos, track_number).get_midi_note_messages()) == \
+            list(reference_midi_note_messages(note_infos, track_number))
+
+
+def test_overlapping_chords_and_zero_length_notes_match_reference():
+    note_infos = [
+        NoteInfo.create(0, 1, 60), NoteInfo.create(0, 0.5, 64), NoteInfo.create(0.5, 0, 67),
+        NoteInfo.create(0.5, 1.5, 67), NoteInfo.create(1, 1, 72), NoteInfo.create(3.25, 0.25, 48)
+    ]
+    assert as_tuples(MidiMessageGenerator(note_infos, 2).get_midi_note_messages()) == \
+        list(reference_midi_note_messages(note_infos, 2))
+
+
+def test_empty_track_has_no_messages():
+    assert list(MidiMessageGenerator([], 1).get_midi_note_messages()) == []
@@ -18,4 +18,18 @@ def split_into_sequences(one_hot_encoding: npt.ArrayLike):
         sequence = one_hot_encoding[seq_start:seq_end]
         sequences.append(sequence)
 
-    return sequences
\ No newline at end of file
+    return sequences
+
+
+def get_window_starts(length: int):
+    """
+    Початки вікон по SEQUENCE_LENGTH сегментів, що разом покривають усю мелодію.
+    Останнє вікно, як і в split_into_sequences, зсувається назад і перекриває попереднє,
+    але закінчується на останньому сегменті мелодії.
+    """
+    if length <= constants.SEQUENCE_LENGTH:
+        return [0]
+
+    starts = list(range(0, length - constants.SEQUENCE_LENGTH, constants.SEQUENCE_LENGTH))
+    starts.append(length - constants.SEQUENCE_LENGTH)
+    return starts
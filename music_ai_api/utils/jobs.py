@@ -0,0 +1,210 @@
+import math
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Optional
+
+from common.constants import JOB_QUEUE_MAX_SIZE, JOB_RESULT_TTL_SECONDS, JOB_WORKERS
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """Черга завдань заповнена; клієнту варто повторити запит пізніше."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Черга завдань заповнена, повторіть через {retry_after} с")
+        self.retry_after = retry_after
+
+
+class JobStore(ABC):
+    """
+    Сховище завдань і обмежена черга очікування.
+
+    Записи завдань — словники з простими значеннями, тому інтерфейс можна реалізувати
+    поверх Redis (хеш на завдання, список для черги, TTL для завершених записів).
+    """
+
+    @abstractmethod
+    def enqueue(self, kind: str, payload: dict, max_pending: int) -> Optional[str]:
+        """Створює завдання і ставить його в чергу; None, якщо в черзі вже max_pending завдань."""
+
+    @abstractmethod
+    def dequeue(self, timeout: float) -> Optional[tuple[str, str, dict]]:
+        """Бере найстаріше завдання з черги і позначає його виконуваним: (id, тип, дані)."""
+
+    @abstractmethod
+    def update(self, job_id: str, **fields) -> None:
+        """Оновлює поля запису завдання."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        """Запис завдання без вхідних даних або None, якщо його немає чи він застарів."""
+
+    @abstractmethod
+    def pending_count(self) -> int:
+        """Кількість завдань, що очікують у черзі."""
+
+
+class InMemoryJobStore(JobStore):
+    """Сховище завдань у пам'яті процесу API."""
+
+    def __init__(self, result_ttl_seconds: float):
+        self.result_ttl_seconds = result_ttl_seconds
+        self._jobs = {}
+        self._payloads = {}
+        self._pending = deque()
+        self._condition = threading.Condition()
+
+    def enqueue(self, kind: str, payload: dict, max_pending: int) -> Optional[str]:
+        with self._condition:
+            self._purge_expired()
+            if len(self._pending) >= max_pending:
+                return None
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'kind': kind,
+                'status': JOB_QUEUED,
+                'created_at': time.time(),
+                'progress': None,
+                'result': None,
+                'error': None,
+            }
+            self._payloads[job_id] = payload
+            self._pending.append(job_id)
+            self._condition.notify()
+            return job_id
+
+    def dequeue(self, timeout: float) -> Optional[tuple[str, str, dict]]:
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._pending, timeout):
+                return None
+            job_id = self._pending.popleft()
+            job = self._jobs[job_id]
+            job.update(status=JOB_RUNNING, started_at=time.time())
+            return job_id, job['kind'], self._payloads.pop(job_id)
+
+    def update(self, job_id: str, **fields) -> None:
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._condition:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return None if job is None else dict(job)
+
+    def pending_count(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def _purge_expired(self) -> None:
+        expired_before = time.time() - self.result_ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['status'] in (JOB_DONE, JOB_FAILED) and job['finished_at'] < expired_before
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class JobRunner:
+    """
+    Виконує завдання з черги у фонових потоках.
+
+    Обробник завдання отримує вхідні дані та функцію report_progress(done, total)
+    і повертає словник з результатом, який зберігається в записі завдання.
+    """
+
+    def __init__(self, store: JobStore, num_workers: int, max_pending: int):
+        """
+        Args:
+            store: Сховище завдань
+            num_workers: Кількість потоків, що виконують завдання
+            max_pending: Максимальна кількість завдань в очікуванні
+        """
+        self.store = store
+        self.num_workers = num_workers
+        self.max_pending = max_pending
+        self._handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._average_seconds = None
+
+    def register(self, kind: str, handler: Callable[[dict, Callable[[int, int], None]], dict]) -> None:
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, payload: dict) -> str:
+        """
+        Ставить завдання в чергу.
+        Returns:
+            str: Ідентифікатор завдання
+        Raises:
+            QueueFull: Якщо в черзі вже max_pending завдань
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Невідомий тип завдання: {kind}")
+        self._start()
+        job_id = self.store.enqueue(kind, payload, self.max_pending)
+        if job_id is None:
+            raise QueueFull(self.retry_after())
+        logger.info(f"Завдання {kind} {job_id} додано до черги")
+        return job_id
+
+    def retry_after(self) -> int:
+        """Оцінка часу в секундах, за який звільниться місце в черзі."""
+        average_seconds = self._average_seconds or 1.0
+        waves = (self.store.pending_count() + self.num_workers) / self.num_workers
+        return max(1, math.ceil(average_seconds * waves))
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.num_workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            job = self.store.dequeue(timeout=0.5)
+            if job is None:
+                continue
+            job_id, kind, payload = job
+            started = time.monotonic()
+
+            def report_progress(done: int, total: int) -> None:
+                self.store.update(job_id, progress={'done': done, 'total': total})
+
+            try:
+                result = self._handlers[kind](payload, report_progress)
+                self.store.update(job_id, status=JOB_DONE, result=result, finished_at=time.time())
+                logger.info(f"Завдання {kind} {job_id} виконано")
+            except Exception as e:
+                logger.error(f"Помилка під час виконання завдання {kind} {job_id}: {e}")
+                self.store.update(job_id, status=JOB_FAILED, error=str(e), finished_at=time.time())
+
+            elapsed = time.monotonic() - started
+            self._average_seconds = elapsed if self._average_seconds is None else 0.8 * self._average_seconds + 0.2 * elapsed
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+
+job_store = InMemoryJobStore(JOB_RESULT_TTL_SECONDS)
+job_runner = JobRunner(job_store, JOB_WORKERS, JOB_QUEUE_MAX_SIZE)
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from utils.jobs import JOB_DONE, JOB_FAILED, JOB_QUEUED, InMemoryJobStore, JobRunner, QueueFull
+
+
+def wait_for_status(store, job_id, statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Завдання {job_id} не завершилося: {store.get(job_id)}")
+
+
+def test_job_reports_progress_and_result():
+    store = InMemoryJobStore(result_ttl_seconds=60)
+    runner = JobRunner(store, num_workers=1, max_pending=4)
+    step = threading.Event()
+    resume = threading.Event()
+
+    def handler(payload, report_progress):
+        report_progress(1, payload['total'])
+        step.set()
+        resume.wait(5)
+        report_progress(payload['total'], payload['total'])
+        return {'value': payload['total']}
+
+    runner.register('count', handler)
+    job_id = runner.submit('count', {'total': 3})
+    assert step.wait(5)
+    assert store.get(job_id)['progress'] == {'done': 1, 'total': 3}
+
+    resume.set()
+    job = wait_for_status(store, job_id, (JOB_DONE,))
+    assert job['progress'] == {'done': 3, 'total': 3}
+    assert job['result'] == {'value': 3}
+    runner.shutdown()
+
+
+def test_failed_job_keeps_error():
+    store = InMemoryJobStore(result_ttl_seconds=60)
+    runner = JobRunner(store, num_workers=1, max_pending=4)
+
+    def handler(payload, report_progress):
+        raise ValueError("зламаний файл")
+
+    runner.register('broken', handler)
+    job = wait_for_status(store, runner.submit('broken', {}), (JOB_FAILED,))
+    assert job['error'] == "зламаний файл"
+    runner.shutdown()
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    store = InMemoryJobStore(result_ttl_seconds=60)
+    runner = JobRunner(store, num_workers=1, max_pending=2)
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(payload, report_progress):
+        started.set()
+        release.wait(5)
+        return {}
+
+    runner.register('slow', handler)
+    running = runner.submit('slow', {})
+    assert started.wait(5)
+    queued = [runner.submit('slow', {}) for _ in range(2)]
+    assert [store.get(job_id)['status'] for job_id in queued] == [JOB_QUEUED, JOB_QUEUED]
+
+    with pytest.raises(QueueFull) as error:
+        runner.submit('slow', {})
+    assert error.value.retry_after >= 1
+
+    release.set()
+    for job_id in [running] + queued:
+        wait_for_status(store, job_id, (JOB_DONE,))
+    runner.shutdown()
+
+
+def test_finished_jobs_expire():
+    store = InMemoryJobStore(result_ttl_seconds=0)
+    job_id = store.enqueue('noop', {}, max_pending=1)
+    assert store.dequeue(timeout=1)[0] == job_id
+    store.update(job_id, status=JOB_DONE, finished_at=time.time() - 1)
+    assert store.get(job_id) is None
@@ -0,0 +1,31 @@
+import os
+import resource
+import threading
+
+
+class Metrics:
+    """Лічильники подій сервісу, доступні через /api/metrics."""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+
+metrics = Metrics()
+
+
+def rss_mb() -> float:
+    """Поточна резидентна пам'ять процесу; без /proc — пікова."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -1,71 +1,135 @@
+from functools import lru_cache
+import heapq
+import numpy as np
 import pandas as pd
 import pretty_midi
-from common.constants import ROUND_PRECISION, valid_durations
-from utils.ffn_utils.cloudinary_utils import upload_pm_midi
+from common.constants import DURATION_TABLE_CACHE_SIZE, ROUND_PRECISION, valid_durations
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-def get_note_durations_for_tempo(bpm):
-    if bpm is None:
-        logger.warning("Попередження: Інформацію про темп не знайдено в MIDI файлі. Неможливо обчислити абсолютні тривалості.")
-        return None
-    seconds_per_whole = (60 / bpm) * 4
-    note_durations = {
-        valid_durations[num]: round(seconds_per_whole / num, ROUND_PRECISION)
-        for num in valid_durations if valid_durations[num] is not None
-    }
-    return note_durations
-
-def classify_duration(duration, note_durations):
-      duration = round(duration, ROUND_PRECISION)
-      return min(note_durations, key=lambda note: abs(note_durations[note] - duration))
-
-def find_key_by_value(dict_obj, value):
-    for key, val in dict_obj.items():
-        if val == value:
-            return key
-    return None
-
-def convert_duration_to_seconds(duration_label, bpm):
-    # Тривалість цілої ноти в секундах
-    seconds_per_whole = (60 / bpm) * 4
-    if isinstance(duration_label, pd.Series):
-        duration_label = duration_label.item()
-    key = find_key_by_value(valid_durations, duration_label)
-    duration_in_seconds = seconds_per_whole / key
-    return duration_in_seconds
+# Згенеровані ноти від циклу семплінгу до запису MIDI
+NOTE_DTYPE = np.dtype([
+    ('pitch', np.int64),
+    ('step', np.float64),
+    ('duration_class', np.int64),
+    ('duration', np.float64),
+    ('start', np.float64),
+    ('end', np.float64),
+])
+
+class DurationTable:
+    """
+    Попередньо обчислені таблиці тривалостей для одного темпу.
+
+    Масиви індексуються номером класу тривалості (порядок LabelEncoder), тому
+    перетворення клас → мітка → секунди і класифікація тривалостей у секундах
+    виконуються однією векторною операцією для всіх нот.
+    """
+
+    def __init__(self, bpm, classes: tuple):
+        seconds_per_whole = (60 / bpm) * 4
+        value_by_label = {name: value for value, name in valid_durations.items()}
+        class_by_label = {label: index for index, label in enumerate(classes)}
+
+        self.bpm = bpm
+        self.labels = np.array(classes)
+        self.seconds = np.array([seconds_per_whole / value_by_label[label] for label in classes])
+
+        # Кандидати в порядку valid_durations: при рівних відстанях обирається перша з них
+        self._candidate_seconds = np.array([
+            round(seconds_per_whole / value, ROUND_PRECISION) for value in valid_durations
+        ])
+        self._candidate_classes = np.array([
+            class_by_label.get(name, -1) for name in valid_durations.values()
+        ])
+        # Таблиця спільна для всіх запитів з цим темпом (get_duration_table), тому лише для читання
+        for table in (self.labels, self.seconds, self._candidate_seconds, self._candidate_classes):
+            table.setflags(write=False)
+
+    def classify(self, durations) -> np.ndarray:
+        """Повертає індекси класів найближчих тривалостей для масиву тривалостей у секундах."""
+        durations = np.round(np.asarray(durations, dtype=np.float64), ROUND_PRECISION)
+        distances = np.abs(durations[:, np.newaxis] - self._candidate_seconds[np.newaxis, :])
+        classes = self._candidate_classes[np.argmin(distances, axis=1)]
+        if np.any(classes < 0):
+            raise ValueError("Тривалість не входить до словника класів моделі")
+        return classes
+
+    def to_labels(self, classes) -> np.ndarray:
+        return self.labels[classes]
+
+@lru_cache(maxsize=DURATION_TABLE_CACHE_SIZE)
+def get_duration_table(bpm, classes: tuple) -> DurationTable:
+    """Таблиця тривалостей для темпу з обмеженого LRU-кешу (ключ — BPM і словник класів)."""
+    return DurationTable(bpm, classes)
+
+def transpose_notes(notes: np.ndarray, target_avg_pitch: float) -> np.ndarray:
+    """
+    Зсуває висоти нот так, щоб їх середнє відповідало цільовому, з обмеженням до діапазону MIDI.
+    Args:
+        notes: Структурований масив нот (NOTE_DTYPE)
+        target_avg_pitch: Цільова середня висота
+    Returns:
+        np.ndarray: Копія масиву з транспонованими висотами
+    """
+    transposed = notes.copy()
+    if len(notes) == 0:
+        return transposed
+    pitch_shift = int(round(target_avg_pitch - notes['pitch'].mean()))
+    transposed['pitch'] = np.clip(notes['pitch'] + pitch_shift, 0, 127)
+    return transposed
+
+def limit_polyphony(starts: np.ndarray, ends: np.ndarray, max_active_notes: int) -> np.ndarray:
+    """
+    Маска нот, що залишаються після обмеження кількості одночасно звучних нот.
+    Нота відкидається, якщо на момент її початку вже звучить max_active_notes прийнятих нот.
+    Прохід по нотах з купою кінців прийнятих нот: O(n log k) замість перебору активних нот.
+    """
+    keep = np.zeros(len(starts), dtype=bool)
+    active_ends = []
+    for index, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        while active_ends and active_ends[0] <= start:
+            heapq.heappop(active_ends)
+        if len(active_ends) < max_active_notes:
+            heapq.heappush(active_ends, end)
+            keep[index] = True
+    return keep
+
+def notes_to_dataframe(notes: np.ndarray, duration_table: DurationTable) -> pd.DataFrame:
+    """Таблиця нот для налагодження (у шляху генерації не використовується)."""
+    notes_df = pd.DataFrame({name: notes[name] for name in notes.dtype.names})
+    notes_df.insert(notes_df.columns.get_loc('duration'), 'duration_label', duration_table.to_labels(notes['duration_class']))
+    return notes_df
 
 def notes_to_midi_categorical(
-    notes: pd.DataFrame,
-    out_file: str,
+    notes: np.ndarray,
     instrument_name: str,
     bpm = 120,
     velocity: int = 100,
     max_active_notes: int = 3
 ) -> pretty_midi.PrettyMIDI:
-
+    """
+    Формує MIDI з масиву нот.
+    Args:
+        notes: Структурований масив нот (NOTE_DTYPE), упорядкований за часом початку
+        instrument_name: Назва інструмента General MIDI
+        bpm: Темп
+        velocity: Гучність нот
+        max_active_notes: Максимальна кількість одночасно звучних нот
+    Returns:
+        pretty_midi.PrettyMIDI: MIDI-об'єкт з одним інструментом
+    """
     pm = pretty_midi.PrettyMIDI(initial_tempo=bpm) 
     instrument = pretty_midi.Instrument(
         program=pretty_midi.instrument_name_to_program(
             instrument_name))
 
-    active_notes = []
-
-    for i, note in notes.iterrows():
-        active_notes = [n for n in active_notes if n.end > note['start']]
-
-        if len(active_notes) < max_active_notes:
-            new_note = pretty_midi.Note(
-                velocity=velocity,
-                pitch=int(note['pitch']),
-                start=note['start'],
-                end=note['end'],
-            )
-            instrument.notes.append(new_note)
-            active_notes.append(new_note)
+    kept = notes[limit_polyphony(notes['start'], notes['end'], max_active_notes)]
+    instrument.notes = [
+        pretty_midi.Note(velocity=velocity, pitch=pitch, start=start, end=end)
+        for pitch, start, end in zip(kept['pitch'].tolist(), kept['start'].tolist(), kept['end'].tolist())
+    ]
 
     pm.instruments.append(instrument)
-    url = upload_pm_midi(pm=pm, out_file=out_file)
-    logger.info(f"Завантажено MIDI файл на Cloudinary: {url}")
-    return url
\ No newline at end of file
+    return pm
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from common.constants import ROUND_PRECISION, valid_durations
+from utils.midi_utils_v2 import (
+    NOTE_DTYPE,
+    get_duration_table,
+    limit_polyphony,
+    notes_to_midi_categorical,
+    transpose_notes,
+)
+
+label_encoder = LabelEncoder().fit(list(valid_durations.values()))
+CLASSES = tuple(label_encoder.classes_)
+
+
+def note_durations_for_tempo(bpm):
+    # Еталон: тривалість кожної мітки в секундах, як у ноутбуці навчання
+    return {label: round(240 / bpm / value, ROUND_PRECISION) for value, label in valid_durations.items()}
+
+
+def classify_duration(duration, note_durations):
+    duration = round(duration, ROUND_PRECISION)
+    return min(note_durations, key=lambda label: abs(note_durations[label] - duration))
+
+
+def test_duration_table_matches_per_note_conversion():
+    for bpm in (60, 97, 120, 135, 400):
+        table = get_duration_table(bpm, CLASSES)
+        classes = np.arange(len(CLASSES))
+
+        expected_labels = label_encoder.inverse_transform(classes)
+        value_by_label = {label: value for value, label in valid_durations.items()}
+        expected_seconds = [240 / bpm / value_by_label[label] for label in expected_labels]
+
+        assert table.to_labels(classes).tolist() == expected_labels.tolist()
+        np.testing.assert_allclose(table.seconds[classes], expected_seconds)
+
+
+def test_duration_table_classify_matches_classify_duration():
+    durations = np.random.default_rng(0).uniform(0, 5, 500)
+    for bpm in (60, 97, 120, 135, 400):
+        note_durations = note_durations_for_tempo(bpm)
+        expected = label_encoder.transform([classify_duration(d, note_durations) for d in durations])
+
+        assert get_duration_table(bpm, CLASSES).classify(durations).tolist() == expected.tolist()
+
+
+def test_duration_tables_are_cached_per_tempo():
+    assert get_duration_table(120, CLASSES) is get_duration_table(120, CLASSES)
+    assert get_duration_table(120, CLASSES) is not get_duration_table(121, CLASSES)
+
+
+def test_shared_duration_tables_cannot_be_mutated():
+    table = get_duration_table(120, CLASSES)
+    with pytest.raises(ValueError):
+        table.seconds[0] = 0.0
+
+
+def random_notes(rng, count):
+    notes = np.zeros(count, dtype=NOTE_DTYPE)
+    notes['pitch'] = rng.integers(0, 128, count)
+    notes['step'] = rng.choice([0.0, 0.0, 0.125, 0.25, 0.5], count)
+    notes['duration'] = rng.choice([0.125, 0.25, 0.5, 1.0, 2.0], count)
+    notes['start'] = np.cumsum(notes['step'])
+    notes['end'] = notes['start'] + notes['duration']
+    return notes
+
+
+def test_limit_polyphony_matches_active_note_scan():
+    rng = np.random.default_rng(0)
+    for max_active_notes in (1, 3, 5):
+        notes = random_notes(rng, 300)
+
+        expected, active_ends = [], []
+        for start, end in zip(notes['start'], notes['end']):
+            active_ends = [e for e in active_ends if e > start]
+            expected.append(len(active_ends) < max_active_notes)
+            if expected[-1]:
+                active_ends.append(end)
+
+        assert limit_polyphony(notes['start'], notes['end'], max_active_notes).tolist() == expected
+
+
+def test_transpose_and_midi_assembly():
+    notes = random_notes(np.random.default_rng(1), 100)
+    target = 40.0
+
+    transposed = transpose_notes(notes, target)
+    shift = int(round(target - notes['pitch'].mean()))
+    assert transposed['pitch'].tolist() == [max(0, min(127, p + shift)) for p in notes['pitch'].tolist()]
+
+    pm = notes_to_midi_categorical(transposed, instrument_name="Acoustic Grand Piano", max_active_notes=3)
+    kept = transposed[limit_polyphony(transposed['start'], transposed['end'], 3)]
+    assert [(n.pitch, n.start, n.end) for n in pm.instruments[0].notes] == list(zip(kept['pitch'], kept['start'], kept['end']))
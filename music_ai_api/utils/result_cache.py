@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Awaitable, Callable, Optional
+
+from common.constants import (
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_DISK_MAX_BYTES,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_TTL_SECONDS
+)
+from generation.cancellation import CancellationToken
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Як часто запит, що чекає на чуже обчислення, перевіряє власний токен скасування
+WAIT_CHECK_INTERVAL_SECONDS = 0.1
+
+
+def make_cache_key(namespace: str, payload: bytes | dict) -> str:
+    """
+    Ключ кешу як SHA-256 від канонічного подання запиту.
+    Args:
+        namespace: Простір ключів (модель і тип результату)
+        payload: Байти завантаженого файлу або параметри запиту (JSON-сумісний словник)
+    Returns:
+        str: Шістнадцятковий хеш
+    """
+    if not isinstance(payload, bytes):
+        payload = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    digest = hashlib.sha256(namespace.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Кеш згенерованих MIDI-файлів за хешем вмісту запиту.
+
+    Пам'ятний рівень обмежений сумарним розміром (LRU) і TTL; необов'язковий дисковий
+    рівень переживає перезапуск сервера. Одночасні однакові запити об'єднуються:
+    результат обчислюється один раз, а решта запитів чекає на нього.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_seconds: float,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 0,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            max_bytes: Максимальний сумарний розмір записів у пам'яті
+            ttl_seconds: Час життя запису
+            disk_dir: Каталог дискового рівня (None — лише пам'ять)
+            disk_max_bytes: Максимальний сумарний розмір файлів дискового рівня
+            clock: Джерело поточного часу в секундах
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Результат з пам'яті або з диска; None, якщо його немає чи він застарів."""
+        with self._lock:
+            value = self._get_memory(key)
+        if value is None:
+            value = self._get_disk(key)
+            if value is not None:
+                with self._lock:
+                    self._put_memory(key, value)
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._put_memory(key, value)
+        self._put_disk(key, value)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], bytes],
+        retry_on: type[BaseException] | tuple = (),
+        token: Optional[CancellationToken] = None
+    ) -> bytes:
+        """
+        Повертає закешований результат або обчислює його, об'єднуючи одночасні запити.
+        Args:
+            key: Ключ кешу (make_cache_key)
+            compute: Обчислення результату при промаху
+            retry_on: Помилки, що стосуються лише виклику, який обчислював результат
+                (наприклад, скасування його запиту); об'єднані з ним запити обчислюють заново
+            token: Токен скасування запиту; очікування чужого обчислення перевіряє його
+        Returns:
+            bytes: Результат
+        """
+        while True:
+            value, future, owner = self.claim(key)
+            if value is not None:
+                return value
+            if owner:
+                break
+            try:
+                return self._wait(future, token)
+            except retry_on:
+                continue
+        try:
+            value = compute()
+        except BaseException as e:
+            self.resolve(key, future, error=e)
+            raise
+        self.resolve(key, future, value=value)
+        return value
+
+    async def get_or_compute_async(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[bytes]],
+        retry_on: type[BaseException] | tuple = ()
+    ) -> bytes:
+        """Те саме, що get_or_compute, для асинхронного обчислення."""
+        while True:
+            value, future, owner = self.claim(key)
+            if value is not None:
+                return value
+            if owner:
+                break
+            try:
+                # shield: скасування одного очікувача не скасовує спільний future інших
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except retry_on:
+                continue
+        try:
+            value = await compute()
+        except BaseException as e:
+            self.resolve(key, future, error=e)
+            raise
+        self.resolve(key, future, value=value)
+        return value
+
+    @staticmethod
+    def _wait(future: Future, token: Optional[CancellationToken]) -> bytes:
+        """Чекає на чуже обчислення; скасований запит перестає чекати, не зачіпаючи інших."""
+        if token is None:
+            return future.result()
+        while True:
+            token.check()
+            try:
+                return future.result(timeout=WAIT_CHECK_INTERVAL_SECONDS)
+            except FutureTimeoutError:
+                continue
+
+    def claim(self, key: str) -> tuple[Optional[bytes], Optional[Future], bool]:
+        """
+        Знаходить результат у кеші або реєструє обчислення; (значення, future, чи обчислює цей виклик).
+        Для обчислень одразу кількох ключів (пакетна гармонізація): виклик, що отримав
+        owner=True, мусить завершити обчислення через resolve, інакше очікувачі не дочекаються.
+        """
+        value = self.get(key)
+        with self._lock:
+            if value is None:
+                value = self._get_memory(key)
+            if value is not None:
+                self.hits += 1
+                logger.debug(f"Результат знайдено в кеші: {key[:12]}")
+                return value, None, False
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                logger.debug(f"Запит об'єднано з обчисленням, що вже виконується: {key[:12]}")
+                return None, future, False
+            self.misses += 1
+            future = Future()
+            self._in_flight[key] = future
+            return None, future, True
+
+    def resolve(self, key: str, future: Future, value: Optional[bytes] = None, error: Optional[BaseException] = None) -> None:
+        """Зберігає результат обчислення, зареєстрованого claim, і передає його очікувачам."""
+        if error is None:
+            self.put(key, value)
+        with self._lock:
+            del self._in_flight[key]
+        if future.done():
+            return
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def _get_memory(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            self._remove_memory(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put_memory(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._remove_memory(key)
+        self._entries[key] = (self.clock() + self.ttl_seconds, value)
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            self._remove_memory(next(iter(self._entries)))
+
+    def _remove_memory(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f'{key}.bin')
+
+    def _get_disk(self, key: str) -> Optional[bytes]:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl_seconds <= self.clock():
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _put_disk(self, key: str, value: bytes) -> None:
+        if self.disk_dir is None or len(value) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(value)
+            os.utime(tmp_path, (self.clock(), self.clock()))
+            os.replace(tmp_path, path)
+            self._trim_disk()
+        except OSError as e:
+            logger.warning(f"Не вдалося записати результат у дисковий кеш: {e}")
+
+    def _trim_disk(self) -> None:
+        """Видаляє найстаріші файли, поки дисковий рівень перевищує ліміт розміру."""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.bin'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+result_cache = ResultCache(
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_DISK_MAX_BYTES
+)
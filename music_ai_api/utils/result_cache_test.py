@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from generation.cancellation import CANCEL_DISCONNECTED, CancellationToken, GenerationCancelled
+from utils.result_cache import ResultCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_is_canonical():
+    assert make_cache_key('lstm', {'a': 1, 'b': [0.5, None]}) == make_cache_key('lstm', {'b': [0.5, None], 'a': 1})
+    assert make_cache_key('lstm', {'a': 1}) != make_cache_key('ffn', {'a': 1})
+    assert make_cache_key('ffn', b'MThd') != make_cache_key('ffn', b'MThd\0')
+
+
+def test_memory_tier_is_bounded_by_size_and_ttl():
+    clock = FakeClock()
+    cache = ResultCache(max_bytes=8, ttl_seconds=10, clock=clock)
+
+    cache.put('a', b'1234')
+    cache.put('b', b'5678')
+    assert cache.get('a') == b'1234'
+    cache.put('c', b'90')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234'
+
+    clock.now += 11
+    assert cache.get('a') is None
+    assert cache.get('c') is None
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path):
+    clock = FakeClock()
+    ResultCache(max_bytes=1024, ttl_seconds=10, disk_dir=str(tmp_path), disk_max_bytes=1024, clock=clock).put('k', b'midi')
+
+    restarted = ResultCache(max_bytes=1024, ttl_seconds=10, disk_dir=str(tmp_path), disk_max_bytes=1024, clock=clock)
+    assert restarted.get('k') == b'midi'
+
+    clock.now += 11
+    assert ResultCache(max_bytes=1024, ttl_seconds=10, disk_dir=str(tmp_path), disk_max_bytes=1024, clock=clock).get('k') is None
+
+
+def test_concurrent_identical_requests_are_computed_once():
+    cache = ResultCache(max_bytes=1024, ttl_seconds=60)
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return b'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute))) for _ in range(4)]
+    threads[0].start()
+    started.wait(timeout=5)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert results == [b'result'] * 4
+    assert len(calls) == 1
+    assert cache.coalesced == 3
+
+
+def test_failed_computation_is_not_cached():
+    cache = ResultCache(max_bytes=1024, ttl_seconds=60)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('k', fail)
+    assert cache.get_or_compute('k', lambda: b'ok') == b'ok'
+
+
+def test_waiter_recomputes_when_owner_is_cancelled():
+    cache = ResultCache(max_bytes=1024, ttl_seconds=60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def cancelled():
+        started.set()
+        release.wait(5)
+        raise TimeoutError("скасовано")
+
+    owner = threading.Thread(target=lambda: pytest.raises(TimeoutError, cache.get_or_compute, 'k', cancelled))
+    owner.start()
+    assert started.wait(5)
+    results = []
+    waiter = threading.Thread(
+        target=lambda: results.append(cache.get_or_compute('k', lambda: b'ok', retry_on=TimeoutError))
+    )
+    waiter.start()
+    time.sleep(0.05)
+    release.set()
+    owner.join()
+    waiter.join()
+
+    assert results == [b'ok']
+    assert cache.coalesced == 1
+    assert cache.misses == 2
+
+
+def test_cancelled_async_waiter_does_not_cancel_other_waiters():
+    cache = ResultCache(max_bytes=1024, ttl_seconds=60)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return b'result'
+
+        owner = asyncio.create_task(cache.get_or_compute_async('k', compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_compute_async('k', compute)) for _ in range(2)]
+        await asyncio.sleep(0)
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await owner, await waiters[1], waiters[0].cancelled()
+
+    assert asyncio.run(scenario()) == (b'result', b'result', True)
+    assert cache.coalesced == 2
+
+
+def test_resolve_skips_futures_that_are_already_done():
+    cache = ResultCache(max_bytes=1024, ttl_seconds=60)
+    _, future, owner = cache.claim('k')
+    future.cancel()
+
+    cache.resolve('k', future, value=b'result')
+
+    assert owner
+    assert cache.get_or_compute('k', lambda: b'other') == b'result'
+
+
+def test_cancelled_waiter_stops_waiting_for_owner():
+    cache = ResultCache(max_bytes=1024, ttl_seconds=60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return b'result'
+
+    owner = threading.Thread(target=lambda: cache.get_or_compute('k', compute))
+    owner.start()
+    assert started.wait(5)
+    token = CancellationToken()
+    threading.Timer(0.05, token.cancel, (CANCEL_DISCONNECTED,)).start()
+
+    with pytest.raises(GenerationCancelled):
+        cache.get_or_compute('k', compute, token=token)
+    assert not release.is_set()
+    release.set()
+    owner.join()
+
+    assert cache.get('k') == b'result'
@@ -48,11 +48,27 @@ const LSTMGenerator = () => {
         }
     }, [length]);
 
+    const readGenerationStream = async (response, onEvent) => {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter((line) => line.trim()).forEach((line) => onEvent(JSON.parse(line)));
+        }
+    };
+
     const generateMelody = async () => {
         try {
             loading('Генерація мелодії...');
 
-            const response = await fetch(`${base_server_url}/api/v2/lstm/generate`, {
+            const response = await fetch(`${base_server_url}/api/v2/lstm/generate/stream`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -69,10 +85,19 @@ const LSTMGenerator = () => {
                 throw new Error('Не вдалося згенерувати LSTM мелодію.');
             }
 
-            const data = await response.json();
+            let data = null;
+            await readGenerationStream(response, (event) => {
+                if (event.event === 'note') {
+                    loading(`Генерація мелодії... ${event.index + 1}/${length}`);
+                } else if (event.event === 'error') {
+                    throw new Error(event.detail);
+                } else if (event.event === 'done') {
+                    data = event;
+                }
+            });
             console.log('LSTM generating melody response:', data);
 
-            setGeneratedMidiFile(data.midi_file || 'output.mid');
+            setGeneratedMidiFile(data?.midi_file || 'output.mid');
             success('Мелодія згенерована!');
         } catch (error) {
             console.error('Generation error:', error);